@@ -0,0 +1,37 @@
+"""add attendance table version
+
+Revision ID: 1a3faff76724
+Revises: 5f79cd93f9c5
+Create Date: 2026-10-18 11:24:05.913327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a3faff76724'
+down_revision: Union[str, Sequence[str], None] = '5f79cd93f9c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Statement triggers of the partitioned table fire for the statements on it,
+    # not on its partitions
+    op.execute("INSERT INTO tableversion (table_name) VALUES ('attendance')")
+    op.execute(
+        'CREATE TRIGGER attendance_version '
+        'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON attendance '
+        'FOR EACH STATEMENT EXECUTE FUNCTION increment_table_version()'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER attendance_version ON attendance')
+    op.execute("DELETE FROM tableversion WHERE table_name = 'attendance'")
@@ -0,0 +1,59 @@
+"""add table versions
+
+Revision ID: 5f79cd93f9c5
+Revises: 4ce2640f1d7f
+Create Date: 2026-10-18 10:02:17.381044
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f79cd93f9c5'
+down_revision: Union[str, Sequence[str], None] = '4ce2640f1d7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables served with conditional GETs
+VERSIONED_TABLES = ('appconfig', 'role', 'dayoff', 'user', 'shift')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tableversion',
+    sa.Column('table_name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute('''
+        CREATE FUNCTION increment_table_version() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE tableversion
+            SET version = version + 1, updated_at = now()
+            WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$
+    ''')
+    for table in VERSIONED_TABLES:
+        op.execute(f"INSERT INTO tableversion (table_name) VALUES ('{table}')")
+        op.execute(
+            f'CREATE TRIGGER {table}_version '
+            f'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{table}" '
+            'FOR EACH STATEMENT EXECUTE FUNCTION increment_table_version()'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in VERSIONED_TABLES:
+        op.execute(f'DROP TRIGGER {table}_version ON "{table}"')
+    op.execute('DROP FUNCTION increment_table_version()')
+    op.drop_table('tableversion')
@@ -0,0 +1,96 @@
+"""partition attendance by month
+
+Revision ID: 8129e13776c2
+Revises: 7a782ee7808f
+Create Date: 2026-10-18 01:21:26.220221
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8129e13776c2'
+down_revision: Union[str, Sequence[str], None] = '7a782ee7808f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = (
+    'id, timestamp, minutes_late, attendance_type, shift_id, '
+    'created_at, updated_at, deleted_at'
+)
+MONTHS_AHEAD = 3
+
+
+def next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def create_attendance_table(name: str, *args, **kwargs) -> None:
+    op.create_table(name,
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('attendance_id_seq'::regclass)"), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('minutes_late', sa.Integer(), nullable=False),
+    sa.Column('attendance_type', postgresql.ENUM('CLOCK_IN', 'CLOCK_OUT', name='attendancetype', create_type=False), nullable=False),
+    sa.Column('shift_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['shift_id'], ['shift.id'], ondelete='CASCADE'),
+    *args,
+    **kwargs
+    )
+    op.create_index('ix_attendance_shift_id_timestamp', name, ['shift_id', 'timestamp'], unique=False)
+    op.create_index('ix_attendance_timestamp_brin', name, ['timestamp'], unique=False, postgresql_using='brin')
+
+
+def release_attendance_table(name: str) -> None:
+    """Renames the attendance table and frees the names of its objects."""
+    op.rename_table('attendance', name)
+    op.execute('ALTER SEQUENCE attendance_id_seq OWNED BY NONE')
+    op.drop_index('ix_attendance_shift_id_timestamp', table_name=name)
+    op.drop_index('ix_attendance_timestamp_brin', table_name=name, postgresql_using='brin')
+    op.execute(f'ALTER TABLE {name} DROP CONSTRAINT attendance_pkey')
+    op.execute(f'ALTER TABLE {name} DROP CONSTRAINT attendance_shift_id_fkey')
+
+
+def copy_attendances(source: str) -> None:
+    op.execute(f'INSERT INTO attendance ({COLUMNS}) SELECT {COLUMNS} FROM {source}')
+    op.drop_table(source)
+    op.execute('ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    release_attendance_table('attendance_old')
+    create_attendance_table('attendance', sa.PrimaryKeyConstraint('id', 'timestamp'), postgresql_partition_by='RANGE (timestamp)')
+    op.execute('CREATE TABLE attendance_default PARTITION OF attendance DEFAULT')
+
+    # A partition for every month with attendances, up to a few months ahead.
+    # Later months are created by `app.core.partitions`.
+    first_timestamp = op.get_bind().execute(sa.text('SELECT min(timestamp) FROM attendance_old')).scalar()
+    month = (first_timestamp.date() if first_timestamp else date.today()).replace(day=1)
+    last_month = date.today().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last_month = next_month(last_month)
+    while month <= last_month:
+        op.execute(
+            f"CREATE TABLE attendance_{month:%Y_%m} PARTITION OF attendance "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        )
+        month = next_month(month)
+
+    copy_attendances('attendance_old')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    release_attendance_table('attendance_partitioned')
+    create_attendance_table('attendance', sa.PrimaryKeyConstraint('id'))
+    copy_attendances('attendance_partitioned')
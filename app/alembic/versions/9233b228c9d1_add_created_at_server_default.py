@@ -0,0 +1,35 @@
+"""add created_at server default
+
+Revision ID: 9233b228c9d1
+Revises: 1a3faff76724
+Create Date: 2026-10-18 12:51:37.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9233b228c9d1'
+down_revision: Union[str, Sequence[str], None] = '1a3faff76724'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables of the models that inherit `ModelBase`
+TABLES = ('role', 'user', 'shift', 'attendance', 'dayoff', 'appconfig', 'absence')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.alter_column(table, 'created_at', server_default=sa.text('now()'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.alter_column(table, 'created_at', server_default=None)
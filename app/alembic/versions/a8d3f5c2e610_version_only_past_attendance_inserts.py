@@ -0,0 +1,73 @@
+"""version only past attendance inserts
+
+Revision ID: a8d3f5c2e610
+Revises: e52b0c8f1a47
+Create Date: 2026-10-18 15:48:09.226417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d3f5c2e610'
+down_revision: Union[str, Sequence[str], None] = 'e52b0c8f1a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Clock-ins no longer update, and lock until they commit, the version row of
+    # the attendances. New attendances since yesterday in the time zone of the
+    # app config are versioned by the absences cache itself (see RECENT_DAYS in
+    # app.api.records.cache).
+    op.execute('''
+        CREATE FUNCTION increment_attendance_version() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM new_rows
+                WHERE timestamp < COALESCE(
+                    (
+                        SELECT date_trunc('day', clock_timestamp() AT TIME ZONE zone_info)
+                        FROM appconfig ORDER BY id DESC LIMIT 1
+                    ),
+                    'infinity'
+                ) - interval '1 day'
+            ) THEN
+                UPDATE tableversion
+                SET version = version + 1,
+                    updated_at = GREATEST(updated_at, clock_timestamp())
+                WHERE table_name = 'attendance';
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    ''')
+    op.execute('DROP TRIGGER attendance_version ON attendance')
+    op.execute(
+        'CREATE TRIGGER attendance_version '
+        'AFTER UPDATE OR DELETE OR TRUNCATE ON attendance '
+        'FOR EACH STATEMENT EXECUTE FUNCTION increment_table_version()'
+    )
+    op.execute(
+        'CREATE TRIGGER attendance_insert_version '
+        'AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows '
+        'FOR EACH STATEMENT EXECUTE FUNCTION increment_attendance_version()'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER attendance_insert_version ON attendance')
+    op.execute('DROP TRIGGER attendance_version ON attendance')
+    op.execute(
+        'CREATE TRIGGER attendance_version '
+        'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON attendance '
+        'FOR EACH STATEMENT EXECUTE FUNCTION increment_table_version()'
+    )
+    op.execute('DROP FUNCTION increment_attendance_version()')
@@ -0,0 +1,36 @@
+"""add absences closed from
+
+Revision ID: c41f7e2a9d03
+Revises: 9233b228c9d1
+Create Date: 2026-10-18 14:02:11.418273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7e2a9d03'
+down_revision: Union[str, Sequence[str], None] = '9233b228c9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('appconfig', sa.Column('absences_closed_from', sa.Date(), nullable=True))
+    # The first synced day wasn't recorded, the first day with absences is the
+    # closest estimate
+    op.execute(
+        'UPDATE appconfig SET absences_closed_from = '
+        'COALESCE((SELECT min(day) FROM absence), absences_closed_until) '
+        'WHERE absences_closed_until IS NOT NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('appconfig', 'absences_closed_from')
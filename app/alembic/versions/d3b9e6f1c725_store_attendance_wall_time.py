@@ -0,0 +1,59 @@
+"""store attendance wall time
+
+Revision ID: d3b9e6f1c725
+Revises: a8d3f5c2e610
+Create Date: 2026-10-18 18:21:37.502914
+
+Attendances used to be written with an aware datetime, which Postgres stored as
+the wall time of the session time zone (UTC by default). They are now stored as
+the wall time of the time zone of the app config, like the absences expect, so
+the existing rows are converted. The migration must run before the new version
+of the app writes attendances.
+
+The absences in the ledger were computed from the old timestamps, so the ledger
+is emptied. Run `python -m app.close_absences --start YYYY-MM-DD` to rebuild it.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3b9e6f1c725'
+down_revision: Union[str, Sequence[str], None] = 'a8d3f5c2e610'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ZONE_INFO = '(SELECT zone_info FROM appconfig ORDER BY id DESC LIMIT 1)'
+
+
+def reset_ledger() -> None:
+    op.execute('DELETE FROM absence')
+    op.execute(
+        'UPDATE appconfig SET absences_closed_from = NULL, '
+        'absences_closed_until = NULL'
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "UPDATE attendance SET timestamp = "
+        "(timestamp AT TIME ZONE current_setting('TimeZone')) "
+        f"AT TIME ZONE {ZONE_INFO} "
+        f"WHERE {ZONE_INFO} IS NOT NULL"
+    )
+    reset_ledger()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        f"UPDATE attendance SET timestamp = (timestamp AT TIME ZONE {ZONE_INFO}) "
+        "AT TIME ZONE current_setting('TimeZone') "
+        f"WHERE {ZONE_INFO} IS NOT NULL"
+    )
+    reset_ledger()
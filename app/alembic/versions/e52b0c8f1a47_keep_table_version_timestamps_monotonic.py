@@ -0,0 +1,45 @@
+"""keep table version timestamps monotonic
+
+Revision ID: e52b0c8f1a47
+Revises: c41f7e2a9d03
+Create Date: 2026-10-18 15:20:43.702518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e52b0c8f1a47'
+down_revision: Union[str, Sequence[str], None] = 'c41f7e2a9d03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def create_function(updated_at: str) -> None:
+    op.execute(f'''
+        CREATE OR REPLACE FUNCTION increment_table_version() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE tableversion
+            SET version = version + 1, updated_at = {updated_at}
+            WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$
+    ''')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # now() is the start of the transaction, so a transaction that started
+    # earlier but commits later would move Last-Modified backwards
+    create_function('GREATEST(updated_at, clock_timestamp())')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    create_function('now()')
@@ -0,0 +1,110 @@
+"""
+In-process cache of the app config.
+
+The last app config is read on every clock-in, but rarely changes. Each process
+keeps a detached copy of it, with its parsed `ZoneInfo`, for at most
+`APP_CONFIG_CACHE_SECONDS`. Updates invalidate the copy of the process that made
+them and send a notification on the `app_config` channel, which invalidates the
+copies of the other processes (see `app.core.notifications`). The expiration
+covers notifications missed while a listener is disconnected.
+
+The cached copy is read-only: updates must load the app config with
+`crud.get_last_app_config`.
+"""
+
+import threading
+import time as timer
+from dataclasses import dataclass
+from zoneinfo import ZoneInfo
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.app_config import crud
+from app.core import notifications
+from app.core.config import settings
+from app.core.models import AppConfig
+
+CHANNEL = "app_config"
+
+
+@dataclass(frozen=True)
+class CachedAppConfig:
+    app_config: AppConfig
+    zone_info: ZoneInfo
+    expires_at: float
+
+
+_cached: CachedAppConfig | None = None
+# Incremented by every invalidation, so that a load that started before an
+# invalidation doesn't store a stale app config
+_version = 0
+_lock = threading.Lock()
+
+
+def _get_valid():
+    cached = _cached
+    if cached and cached.expires_at > timer.monotonic():
+        return cached
+    return None
+
+
+def _store(app_config: AppConfig, version: int):
+    global _cached
+
+    cached = CachedAppConfig(
+        app_config=AppConfig.model_validate(app_config.model_dump()),
+        zone_info=ZoneInfo(app_config.zone_info),
+        expires_at=timer.monotonic() + settings.APP_CONFIG_CACHE_SECONDS,
+    )
+    with _lock:
+        if version == _version:
+            _cached = cached
+    return cached
+
+
+def get_app_config(session: Session) -> CachedAppConfig | None:
+    """
+    Returns the last app config, from the cache if it was loaded recently.
+    """
+    cached = _get_valid()
+    if cached:
+        return cached
+
+    version = _version
+    app_config = crud.get_last_app_config(session)
+    if not app_config:
+        return None
+    return _store(app_config, version)
+
+
+async def get_app_config_async(session: AsyncSession) -> CachedAppConfig | None:
+    cached = _get_valid()
+    if cached:
+        return cached
+
+    version = _version
+    app_config = await crud.get_last_app_config_async(session)
+    if not app_config:
+        return None
+    return _store(app_config, version)
+
+
+def invalidate():
+    global _cached, _version
+
+    with _lock:
+        _cached = None
+        _version += 1
+
+
+def notify_change(session: Session):
+    """
+    Notifies the other processes that the app config changed. The notification is
+    only sent when the session's transaction is committed.
+    """
+    notifications.notify(session, CHANNEL)
+
+
+def handle_notification(_: str | None):
+    invalidate()
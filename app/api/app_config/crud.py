@@ -1,8 +1,12 @@
-from datetime import UTC, date, datetime
+import functools
+from datetime import UTC, date, datetime, timedelta
 from zoneinfo import ZoneInfo, available_timezones
 
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, desc, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.api.app_config import cache
 from app.api.app_config.schemas import (
     AppConfigUpdate,
     DayOffCreate,
@@ -10,16 +14,32 @@ from app.api.app_config.schemas import (
     RoleUpdate,
     TimezoneResponse,
 )
-from app.core.crud import db_insert, db_update, paginate
+from app.api.records import ledger
+from app.core import token_versions
+from app.core.crud import db_delete, db_insert, db_update, paginate
+from app.core.exceptions import BadRequest
 from app.core.models import AppConfig, DayOff, Role
+from app.core.schemas import CountMode
 
 
 def create_day_off(session: Session, day_off_create: DayOffCreate):
     day_off = DayOff.model_validate(day_off_create)
-    db_insert(session, day_off)
+    try:
+        db_insert(session, day_off)
+    except IntegrityError as e:
+        # Created by a concurrent request since the day was checked
+        session.rollback()
+        raise BadRequest("Já existe um dia livre nesta data.") from e
+    ledger.refresh_day(session, day_off.day)
     return day_off
 
 
+def delete_day_off(session: Session, day_off: DayOff):
+    day = day_off.day
+    db_delete(session, day_off)
+    ledger.refresh_day(session, day)
+
+
 def create_role(session: Session, role_create: RoleCreate):
     role = Role.model_validate(role_create)
     db_insert(session, role)
@@ -40,18 +60,31 @@ def get_day_off_by_id(session: Session, id: int):
     return session.get(DayOff, id)
 
 
+def get_day_off_by_day(session: Session, day: date):
+    statement = select(DayOff).where(DayOff.day == day)
+    return session.exec(statement).first()
+
+
 def get_last_app_config(session: Session):
     statement = select(AppConfig).order_by(desc(AppConfig.id))
     session_app_config = session.exec(statement).first()
     return session_app_config
 
 
+async def get_last_app_config_async(session: AsyncSession):
+    statement = select(AppConfig).order_by(desc(AppConfig.id))
+    session_app_config = (await session.exec(statement)).first()
+    return session_app_config
+
+
 def list_days_off(
     session: Session,
     start_date: date | None = None,
     end_date: date | None = None,
     page: int | None = None,
     page_size: int | None = None,
+    cursor: str | None = None,
+    count: CountMode = "exact",
 ):
     statement = select(DayOff)
 
@@ -60,49 +93,88 @@ def list_days_off(
     if end_date is not None:
         statement = statement.where(DayOff.day <= end_date)
 
-    return paginate(query=statement, session=session, page=page, page_size=page_size)
+    return paginate(
+        query=statement,
+        session=session,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count=count,
+        filtered=start_date is not None or end_date is not None,
+        keyset=(DayOff.id,),
+    )
 
 
 def list_roles(session: Session):
     return list(session.exec(select(Role)).all())
 
 
-def list_timezones() -> list[TimezoneResponse]:
-    reference_dt = datetime.now(UTC)
-    timezones_with_offsets: list[TimezoneResponse] = []
-
+@functools.cache
+def get_timezone_names() -> list[str]:
+    """
+    Returns the names of the available timezones. Listing them scans the tzdata
+    files, so it's done once per process.
+    """
+    names = []
     for tz_name in sorted(available_timezones()):
         try:
-            tz = ZoneInfo(tz_name)
-            offset_timedelta = reference_dt.astimezone(tz).utcoffset()
-            if offset_timedelta is not None:
-                total_minutes = int(offset_timedelta.total_seconds() / 60)
-                hours, minutes = divmod(abs(total_minutes), 60)
-                sign = "+" if total_minutes >= 0 else "-"
-                offset_str = f"{sign}{hours:02}:{minutes:02}"
-            else:
-                offset_str = "±00:00"
-
-            timezones_with_offsets.append(
-                TimezoneResponse(zone_info=tz_name, offset=offset_str)
-            )
+            ZoneInfo(tz_name)
         except Exception:
             continue
+        names.append(tz_name)
+    return names
+
+
+def format_offset(offset: timedelta | None) -> str:
+    if offset is None:
+        return "±00:00"
+    total_minutes = int(offset.total_seconds() / 60)
+    hours, minutes = divmod(abs(total_minutes), 60)
+    sign = "+" if total_minutes >= 0 else "-"
+    return f"{sign}{hours:02}:{minutes:02}"
+
 
-    return timezones_with_offsets
+def list_timezones(reference_dt: datetime | None = None) -> list[TimezoneResponse]:
+    if reference_dt is None:
+        reference_dt = datetime.now(UTC)
+
+    return [
+        TimezoneResponse(
+            zone_info=tz_name,
+            offset=format_offset(
+                reference_dt.astimezone(ZoneInfo(tz_name)).utcoffset()
+            ),
+        )
+        for tz_name in get_timezone_names()
+    ]
 
 
 def update_role(session: Session, role: Role, role_update: RoleUpdate):
     role_data = role_update.model_dump(exclude_unset=True)
+    # Renaming a role may change which users are admins
+    renamed = "name" in role_data and role_data["name"] != role.name
+    if renamed and role.id is not None:
+        token_versions.revoke_role_tokens(session, role.id)
     db_update(session, role, role_data)
+    if renamed:
+        token_versions.invalidate()
     return role
 
 
+def delete_role(session: Session, role: Role):
+    if role.id is not None:
+        token_versions.revoke_role_tokens(session, role.id)
+    db_delete(session, role)
+    token_versions.invalidate()
+
+
 def update_app_config(
     session: Session, app_config: AppConfig, app_config_update: AppConfigUpdate
 ):
     app_config_data = app_config_update.model_dump(exclude_unset=True)
     if app_config_update.zone_info:
         app_config_data["zone_info"] = app_config_data["zone_info"].key
+    cache.notify_change(session)
     db_update(session, app_config, app_config_data)
+    cache.invalidate()
     return app_config
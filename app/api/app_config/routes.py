@@ -1,9 +1,9 @@
 from datetime import date
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 
-from app.api.app_config import crud
+from app.api.app_config import cache, crud, timezones
 from app.api.app_config.schemas import (
     AppConfigResponse,
     AppConfigUpdate,
@@ -14,10 +14,18 @@ from app.api.app_config.schemas import (
     RoleUpdate,
     TimezoneResponse,
 )
-from app.core.crud import db_delete
-from app.core.deps import PaginationDep, SessionDep, check_admin, get_current_user
+from app.core.deps import (
+    PaginationDep,
+    SessionDep,
+    check_admin,
+    check_not_modified,
+    get_token_user,
+)
 from app.core.exceptions import BadRequest, InternalServerError, NotFound
+from app.core.models import AppConfig, DayOff, Role
+from app.core.responses import cached_json_response, model_json_response
 from app.core.schemas import Message, Page
+from app.core.table_versions import TableVersions
 
 router = APIRouter(prefix="/config", tags=["config"])
 
@@ -62,6 +70,9 @@ def create_new_day_off(session: SessionDep, body: DayOffCreate):
     """
     Create new day off
     """
+    if crud.get_day_off_by_day(session, body.day):
+        raise BadRequest("Já existe um dia livre nesta data.")
+
     day_off_create = DayOffCreate.model_validate(body)
     day_off = crud.create_day_off(session, day_off_create)
     return day_off
@@ -93,7 +104,7 @@ def delete_day_off(session: SessionDep, day_off_id: int) -> Message:
     day_off = crud.get_day_off_by_id(session, day_off_id)
     if not day_off:
         raise NotFound("Dia livre não encontrado.")
-    db_delete(session, day_off)
+    crud.delete_day_off(session, day_off)
     return Message(message="Dia livre deletado com sucesso")
 
 
@@ -105,34 +116,40 @@ def delete_role(session: SessionDep, role_id: int) -> Message:
     role = crud.get_role_by_id(session, role_id)
     if not role:
         raise NotFound("Cargo não encontrado.")
-    db_delete(session, role)
+    crud.delete_role(session, role)
     return Message(message="Cargo deletado com sucesso")
 
 
 @router.get(
-    "/", response_model=AppConfigResponse, dependencies=[Depends(get_current_user)]
+    "/", response_model=AppConfigResponse, dependencies=[Depends(get_token_user)]
 )
-def get_app_config(session: SessionDep):
+def get_app_config(
+    session: SessionDep,
+    versions: Annotated[TableVersions, Depends(check_not_modified(AppConfig))],
+):
     """
     Get settings
     """
-    app_config = crud.get_last_app_config(session)
-    if not app_config:
+    cached = cache.get_app_config(session)
+    if not cached:
         raise InternalServerError(
             message="Ocorreu um erro no servidor e "
             "não foi possível encontrar as configurações.",
         )
-    return app_config
+    return model_json_response(
+        AppConfigResponse, cached.app_config, headers=versions.headers()
+    )
 
 
 @router.get(
     "/days-off",
     response_model=Page[DayOffResponse],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(get_token_user)],
 )
 def list_days_off(
     session: SessionDep,
     pagination: PaginationDep,
+    versions: Annotated[TableVersions, Depends(check_not_modified(DayOff))],
     start_date: Annotated[
         date | None, Query(description="Filter by start date")
     ] = None,
@@ -147,26 +164,36 @@ def list_days_off(
         end_date=end_date,
         page=pagination.page,
         page_size=pagination.page_size,
+        cursor=pagination.cursor,
+        count=pagination.count,
+    )
+    return model_json_response(
+        Page[DayOffResponse], days_off, headers=versions.headers()
     )
-    return days_off
 
 
 @router.get(
     "/roles",
     response_model=list[RoleResponse],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(get_token_user)],
 )
-def list_roles(session: SessionDep):
+def list_roles(
+    session: SessionDep,
+    versions: Annotated[TableVersions, Depends(check_not_modified(Role))],
+):
     """
     Get all roles
     """
     roles = crud.list_roles(session)
-    return roles
+    return model_json_response(list[RoleResponse], roles, headers=versions.headers())
 
 
-@router.get("/timezones")
-def list_timezones() -> list[TimezoneResponse]:
+@router.get("/timezones", response_model=list[TimezoneResponse])
+def list_timezones(request: Request):
     """
     Get all timezones
     """
-    return crud.list_timezones()
+    catalogue = timezones.get_catalogue()
+    return cached_json_response(
+        request, catalogue.content, catalogue.etag, catalogue.max_age()
+    )
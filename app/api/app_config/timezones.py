@@ -0,0 +1,88 @@
+"""
+Catalogue of the timezones served by `GET /config/timezones`.
+
+The offsets of the timezones only change at their daylight saving transitions,
+so the catalogue is built once, serialized, and only rebuilt after the next
+transition of any timezone, or a day later if none happens before that.
+"""
+
+import threading
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from pydantic import TypeAdapter
+
+from app.api.app_config import crud
+from app.api.app_config.schemas import TimezoneResponse
+from app.core.responses import make_etag
+
+# Longest time a catalogue is kept, also the window searched for transitions
+MAX_CATALOGUE_AGE = timedelta(days=1)
+
+timezones_adapter = TypeAdapter(list[TimezoneResponse])
+
+
+@dataclass(frozen=True)
+class TimezoneCatalogue:
+    content: bytes
+    etag: str
+    expires_at: datetime
+
+    def max_age(self) -> int:
+        """
+        Returns the number of seconds until the catalogue expires.
+        """
+        seconds = (self.expires_at - datetime.now(UTC)).total_seconds()
+        return max(int(seconds), 0)
+
+
+_catalogue: TimezoneCatalogue | None = None
+_lock = threading.Lock()
+
+
+def next_transition(zone: ZoneInfo, start: datetime, end: datetime) -> datetime | None:
+    """
+    Returns the first moment between `start` and `end` when the offset of the
+    timezone changes, to the second. Assumes there's at most one transition.
+    """
+    offset = start.astimezone(zone).utcoffset()
+    if end.astimezone(zone).utcoffset() == offset:
+        return None
+
+    while end - start > timedelta(seconds=1):
+        middle = start + (end - start) / 2
+        if middle.astimezone(zone).utcoffset() == offset:
+            start = middle
+        else:
+            end = middle
+    return end
+
+
+def build_catalogue(now: datetime) -> TimezoneCatalogue:
+    timezones = crud.list_timezones(now)
+    content = timezones_adapter.dump_json(timezones, by_alias=True)
+
+    expires_at = now + MAX_CATALOGUE_AGE
+    for tz_name in crud.get_timezone_names():
+        transition = next_transition(ZoneInfo(tz_name), now, expires_at)
+        if transition:
+            expires_at = transition
+
+    return TimezoneCatalogue(
+        content=content, etag=make_etag(content), expires_at=expires_at
+    )
+
+
+def get_catalogue() -> TimezoneCatalogue:
+    global _catalogue
+
+    now = datetime.now(UTC)
+    catalogue = _catalogue
+    if catalogue and catalogue.expires_at > now:
+        return catalogue
+
+    with _lock:
+        if _catalogue is None or _catalogue.expires_at <= now:
+            _catalogue = build_catalogue(now)
+        return _catalogue
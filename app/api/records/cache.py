@@ -0,0 +1,124 @@
+"""
+In-process cache of computed absences.
+
+The same absences are often requested again, e.g. looked up by several
+managers. Each process keeps the last `ABSENCES_CACHE_SIZE` results of the JSON
+endpoint, evicting the least recently used, stamped with the versions of the
+tables the absences are computed from (see `app.core.table_versions`). A result
+is only served while none of those tables changed since it was computed.
+
+The results held are also limited to `ABSENCES_CACHE_MAX_ROWS` absences in total,
+and larger results are not cached. The CSV export streams its absences instead.
+
+Clock-ins would change the version of the attendance table all day long, so new
+attendances since yesterday don't increment it. Results that include those days
+are also stamped with their count and last id instead, and results of earlier
+days stay cached.
+
+The cached lists are shared by every request and must not be modified.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+
+from sqlmodel import Session, col, func, select
+
+from app.api.app_config import cache as app_config_cache
+from app.api.records import crud
+from app.api.records.schemas import AbsenceFilters, AbsenceResponse
+from app.core.config import settings
+from app.core.metrics import CacheStats
+from app.core.models import AppConfig, Attendance, DayOff, Role, Shift, User
+from app.core.table_versions import get_table_versions
+
+# Tables read by the absence backends or included in the responses
+VERSIONED_MODELS = (Attendance, Shift, User, DayOff, Role, AppConfig)
+# Days whose new attendances don't increment the attendance version, counted
+# back from today. Kept in sync with the `increment_attendance_version` trigger.
+RECENT_DAYS = 2
+
+type AbsencesKey = tuple[int | None, date, date, int | None]
+
+stats = CacheStats()
+# Data version and absences of each key, from the least recently used
+_entries: OrderedDict[AbsencesKey, tuple[str, list[AbsenceResponse]]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_recent_attendances_version(session: Session, since: datetime):
+    statement = select(func.count(), func.max(Attendance.id)).where(
+        col(Attendance.timestamp) >= since
+    )
+    count, last_id = session.exec(statement).one()
+    return f"{count}:{last_id}"
+
+
+def get_version(session: Session, end_date: date):
+    """
+    Returns the version of the data of the absences up to `end_date`.
+    """
+    version = get_table_versions(session, VERSIONED_MODELS).etag
+
+    cached = app_config_cache.get_app_config(session)
+    if not cached:
+        raise ValueError(
+            "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
+        )
+    today = datetime.now(cached.zone_info).date()
+    recent_start = today - timedelta(days=RECENT_DAYS - 1)
+    if end_date >= recent_start:
+        since = datetime.combine(recent_start, time())
+        version += f",{get_recent_attendances_version(session, since)}"
+    return version
+
+
+def get_absences(session: Session, filters: AbsenceFilters) -> list[AbsenceResponse]:
+    """
+    Returns the absences of the filters, from the cache if none of their data
+    changed since they were computed.
+    """
+    # Read before the absences, so that a write committed in between makes the
+    # stored result outdated instead of stale
+    version = get_version(session, filters.end_date)
+    key = (
+        filters.user_id,
+        filters.start_date,
+        filters.end_date,
+        filters.absence_type,
+    )
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry and entry[0] == version:
+            _entries.move_to_end(key)
+            stats.record_hit()
+            return entry[1]
+    stats.record_miss()
+
+    absences = crud.list_absences(
+        session=session,
+        user_id=filters.user_id,
+        absence_type=filters.absence_type,
+        start_date=filters.start_date,
+        end_date=filters.end_date,
+    )
+    store(key, version, absences)
+    return absences
+
+
+def store(key: AbsencesKey, version: str, absences: list[AbsenceResponse]):
+    with _lock, stats.lock:
+        _entries.pop(key, None)
+        if len(absences) <= settings.ABSENCES_CACHE_MAX_ROWS:
+            _entries[key] = (version, absences)
+
+        rows = sum(len(entry[1]) for entry in _entries.values())
+        while (
+            len(_entries) > settings.ABSENCES_CACHE_SIZE
+            or rows > settings.ABSENCES_CACHE_MAX_ROWS
+        ):
+            _, (_, evicted) = _entries.popitem(last=False)
+            rows -= len(evicted)
+            stats.evictions += 1
+        stats.size = len(_entries)
@@ -1,21 +1,60 @@
 from collections import defaultdict
+from collections.abc import Callable, Collection, Iterable, Iterator, Sequence
 from datetime import date, datetime, time, timedelta
+from typing import Any
 from zoneinfo import ZoneInfo
 
-from sqlmodel import Session, desc, select
+from sqlalchemy import Date, DateTime, Integer, Interval, String, union_all
+from sqlalchemy.orm import contains_eager, selectinload
+from sqlmodel import (
+    Session,
+    case,
+    cast,
+    col,
+    desc,
+    exists,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    select,
+)
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import Select, SelectOfScalar
 
+from app.api.app_config import cache as app_config_cache
 from app.api.app_config import crud as app_config_crud
-from app.api.records.schemas import AbsenceResponse, AttendanceUpdate, ShiftDate
+from app.api.app_config.schemas import RoleResponse
+from app.api.records import group_commit, ledger
+from app.api.records.schemas import (
+    AbsenceResponse,
+    AbsenceRow,
+    AttendanceEvent,
+    AttendanceEventResult,
+    AttendanceUpdate,
+    CompactAbsenceResponse,
+    CompactAbsences,
+    CompactAttendancePage,
+    CompactAttendanceResponse,
+    Included,
+    IncludedShift,
+    IncludedUser,
+)
 from app.api.shifts import crud as shifts_crud
-from app.core.crud import db_insert, db_update, paginate
+from app.api.shifts.schemas import ShiftResponse
+from app.core.config import settings
+from app.core.crud import db_delete, db_insert, db_insert_async, db_update, paginate
+from app.core.fields import load_fields
 from app.core.models import (
     AppConfig,
     Attendance,
     AttendanceType,
+    DayOff,
     Shift,
     User,
-    WeekdayEnum,
 )
+from app.core.schemas import CountMode, Page
 
 
 def get_minutes_late(
@@ -45,24 +84,180 @@ def get_minutes_late(
 
 
 def create_attendance(session: Session, shift: Shift, attendance_type: AttendanceType):
-    app_config = app_config_crud.get_last_app_config(session)
-    if not app_config:
+    cached = app_config_cache.get_app_config(session)
+    if not cached:
         raise ValueError(
             "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
         )
 
-    now = datetime.now(ZoneInfo(app_config.zone_info))
-    minutes_late = get_minutes_late(app_config, shift, attendance_type, now)
+    now = datetime.now(cached.zone_info)
+    minutes_late = get_minutes_late(cached.app_config, shift, attendance_type, now)
     attendance = Attendance(
-        timestamp=now,
+        # The column has no time zone, attendances are in the one of the app config
+        timestamp=now.replace(tzinfo=None),
         minutes_late=minutes_late,
         attendance_type=attendance_type,
         shift_id=shift.id,
     )
     db_insert(session, attendance)
+    ledger.refresh_day(session, attendance.timestamp.date(), shift.user_id)
+    return attendance
+
+
+async def create_attendance_async(
+    session: AsyncSession, shift: Shift, attendance_type: AttendanceType
+):
+    """
+    Same as `create_attendance`, for async routes. The shift must be loaded with
+    its user and the user's role, as they are returned with the attendance. With
+    `ATTENDANCE_GROUP_COMMIT`, the attendance is inserted together with those of
+    concurrent requests (see `app.api.records.group_commit`).
+    """
+    cached = await app_config_cache.get_app_config_async(session)
+    if not cached:
+        raise ValueError(
+            "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
+        )
+
+    now = datetime.now(cached.zone_info)
+    minutes_late = get_minutes_late(cached.app_config, shift, attendance_type, now)
+    attendance = Attendance(
+        timestamp=now.replace(tzinfo=None),
+        minutes_late=minutes_late,
+        attendance_type=attendance_type,
+        shift_id=shift.id,
+    )
+    if settings.ATTENDANCE_GROUP_COMMIT:
+        # Releases the connection of the session while the batch is inserted
+        await session.commit()
+        attendance.id, attendance.timestamp = await group_commit.insert_attendance(
+            attendance.model_dump(
+                include={"timestamp", "minutes_late", "attendance_type", "shift_id"}
+            )
+        )
+    else:
+        await db_insert_async(session, attendance)
+    # The shift can't be lazy loaded
+    attendance.shift = shift
+    await session.run_sync(
+        ledger.refresh_day,  # type: ignore[arg-type]
+        attendance.timestamp.date(),
+        shift.user_id,
+    )
     return attendance
 
 
+def list_event_shifts(session: Session, events: Sequence[AttendanceEvent]):
+    """
+    Returns the shifts referenced by the events and every shift of their users.
+    """
+    shift_ids = {event.shift_id for event in events if event.shift_id is not None}
+    user_ids = {event.user_id for event in events if event.user_id is not None}
+    statement = select(Shift).where(
+        or_(col(Shift.id).in_(shift_ids), col(Shift.user_id).in_(user_ids))
+    )
+    return session.exec(statement).all()
+
+
+def find_event_shift(
+    shifts: Iterable[Shift], attendance_type: AttendanceType, dt: datetime
+):
+    """
+    Returns the shift whose start (for clock ins) or end (for clock outs) is the
+    closest to the datetime, among the shifts of its weekday.
+    """
+
+    def distance(shift: Shift):
+        boundary = (
+            shift.start_time
+            if attendance_type == AttendanceType.CLOCK_IN
+            else shift.end_time
+        )
+        return abs(datetime.combine(dt.date(), boundary, tzinfo=dt.tzinfo) - dt)
+
+    return min(
+        (shift for shift in shifts if shift.weekday == dt.weekday()),
+        key=distance,
+        default=None,
+    )
+
+
+def create_attendances(session: Session, events: Sequence[AttendanceEvent]):
+    """
+    Records many attendances at once, e.g. uploaded by a clock terminal, and
+    returns the result of each event in the same order. The shifts are resolved
+    with a single query and the attendances are inserted in a single
+    transaction, with multi-row INSERTs. Events whose shift can't be resolved
+    are not recorded and their result has the error instead.
+    """
+    cached = app_config_cache.get_app_config(session)
+    if not cached:
+        raise ValueError(
+            "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
+        )
+
+    shifts = list_event_shifts(session, events)
+    shifts_by_id = {shift.id: shift for shift in shifts}
+    user_shifts: dict[int, list[Shift]] = defaultdict(list)
+    for shift in shifts:
+        user_shifts[shift.user_id].append(shift)
+
+    now = datetime.now(cached.zone_info)
+    results: list[AttendanceEventResult] = []
+    rows: list[dict[str, Any]] = []
+    recorded: list[tuple[AttendanceEventResult, Shift]] = []
+    for event in events:
+        dt = event.timestamp.astimezone(cached.zone_info)
+        if event.user_id is None:
+            shift = shifts_by_id.get(event.shift_id)
+            error = "Turno não encontrado."
+        else:
+            shift = find_event_shift(
+                user_shifts[event.user_id], event.attendance_type, dt
+            )
+            error = "O usuário não tem turno no dia do registro."
+
+        result = AttendanceEventResult()
+        results.append(result)
+        if dt > now:
+            result.error = "O horário do registro não pode estar no futuro."
+            continue
+        if not shift:
+            result.error = error
+            continue
+
+        rows.append(
+            {
+                # The column has no time zone, attendances are in the one of the
+                # app config
+                "timestamp": dt.replace(tzinfo=None),
+                "minutes_late": get_minutes_late(
+                    cached.app_config, shift, event.attendance_type, dt
+                ),
+                "attendance_type": event.attendance_type,
+                "shift_id": shift.id,
+            }
+        )
+        recorded.append((result, shift))
+
+    if not rows:
+        return results
+
+    statement = insert(Attendance).returning(
+        col(Attendance.id), sort_by_parameter_order=True
+    )
+    ids = session.scalars(statement, rows).all()
+    session.commit()
+
+    days = set()
+    for (result, shift), row, attendance_id in zip(recorded, rows, ids, strict=True):
+        result.attendance = CompactAttendanceResponse(id=attendance_id, **row)
+        days.add((row["timestamp"].date(), shift.user_id))
+    for day, user_id in sorted(days):
+        ledger.refresh_day(session, day, user_id)
+    return results
+
+
 def get_attendance_by_id(session: Session, id: int):
     return session.get(Attendance, id)
 
@@ -70,11 +265,39 @@ def get_attendance_by_id(session: Session, id: int):
 def update_attendance(
     session: Session, attendance: Attendance, attendance_update: AttendanceUpdate
 ):
+    previous_day = attendance.timestamp.date()
+    previous_user_id = attendance.shift.user_id
+
     attendance_data = attendance_update.model_dump(exclude_unset=True)
+    timestamp = attendance_data.get("timestamp")
+    if timestamp is not None and timestamp.tzinfo is not None:
+        cached = app_config_cache.get_app_config(session)
+        if not cached:
+            raise ValueError(
+                "Ocorreu um erro no servidor e "
+                "não foi possível encontrar as configurações."
+            )
+        # Stored as the wall time of the app config, like new attendances
+        attendance_data["timestamp"] = timestamp.astimezone(cached.zone_info).replace(
+            tzinfo=None
+        )
     db_update(session, attendance, attendance_data)
+
+    shift = shifts_crud.get_shift_by_id(session, attendance.shift_id)
+    user_id = shift.user_id if shift else previous_user_id
+    ledger.refresh_day(session, previous_day, previous_user_id)
+    if (attendance.timestamp.date(), user_id) != (previous_day, previous_user_id):
+        ledger.refresh_day(session, attendance.timestamp.date(), user_id)
     return attendance
 
 
+def delete_attendance(session: Session, attendance: Attendance):
+    day = attendance.timestamp.date()
+    user_id = attendance.shift.user_id
+    db_delete(session, attendance)
+    ledger.refresh_day(session, day, user_id)
+
+
 def list_attendances(
     session: Session,
     user_id: int | None = None,
@@ -83,10 +306,129 @@ def list_attendances(
     end_timestamp: datetime | None = None,
     page: int | None = None,
     page_size: int | None = None,
+    cursor: str | None = None,
+    count: CountMode = "exact",
+    fields: Collection[str] | None = None,
 ):
-    statement = select(Attendance).join(Shift).join(User)
+    # Loads the relationships serialized by `AttendanceResponse` with the page,
+    # reusing the joins of the filters
+    keyset = (Attendance.timestamp, Attendance.id)
+    options = load_fields(
+        Attendance,
+        fields,
+        {
+            "shift": contains_eager(Attendance.shift)  # type: ignore[arg-type]
+            .contains_eager(Shift.user)  # type: ignore[arg-type]
+            .joinedload(User.role)  # type: ignore[arg-type]
+        },
+        required=keyset,
+    )
+    statement = select(Attendance).join(Shift).join(User).options(*options)
+    statement = filter_attendances(
+        statement,
+        user_id=user_id,
+        attendance_type=attendance_type,
+        start_timestamp=start_timestamp,
+        end_timestamp=end_timestamp,
+    )
+
+    return paginate(
+        query=statement,
+        session=session,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count=count,
+        filtered=any(
+            value is not None
+            for value in (user_id, attendance_type, start_timestamp, end_timestamp)
+        ),
+        keyset=keyset,
+        descending=True,
+    )
+
+
+def include_shifts(shifts: Iterable[Shift | ShiftResponse]) -> Included:
+    """
+    Returns each of the shifts, with their users and roles, once.
+    """
+    included = Included(shifts={}, users={}, roles={})
+    for shift in shifts:
+        if shift.id in included.shifts:
+            continue
+        user = shift.user
+        role = user.role
+        included_shift = IncludedShift(
+            id=shift.id,
+            weekday=shift.weekday,
+            start_time=shift.start_time,
+            end_time=shift.end_time,
+            user_id=user.id,
+        )
+        included.shifts[included_shift.id] = included_shift
+
+        if user.id not in included.users:
+            included_user = IncludedUser(
+                id=user.id,
+                active=user.active,
+                email=user.email,
+                name=user.name,
+                role_id=role.id if role else None,
+            )
+            included.users[included_user.id] = included_user
+
+        if role and role.id not in included.roles:
+            included_role = RoleResponse(id=role.id, name=role.name)
+            included.roles[included_role.id] = included_role
+    return included
+
+
+def compact_attendances(page: Page[Attendance]) -> CompactAttendancePage:
+    """
+    Returns the page with the attendances referencing their shifts by id.
+    """
+    return CompactAttendancePage(
+        items=page.items,
+        total_items=page.total_items,
+        total_pages=page.total_pages,
+        current_page=page.current_page,
+        current_page_size=page.current_page_size,
+        next_cursor=page.next_cursor,
+        included=include_shifts(attendance.shift for attendance in page.items),
+    )
+
+
+def compact_absences(absences: Sequence[AbsenceResponse]) -> CompactAbsences:
+    """
+    Returns the absences referencing their shifts by id.
+    """
+    items = [
+        CompactAbsenceResponse(
+            shift_id=absence.shift.id,
+            day=absence.day,
+            absence_type=absence.absence_type,
+            minutes_late=absence.minutes_late,
+            attendance_timestamp=absence.attendance_timestamp,
+        )
+        for absence in absences
+    ]
+    return CompactAbsences(
+        items=items, included=include_shifts(absence.shift for absence in absences)
+    )
+
 
-    statement = statement.where(User.active)
+def filter_attendances[S: (Select, SelectOfScalar)](
+    statement: S,
+    user_id: int | None = None,
+    attendance_type: AttendanceType | None = None,
+    start_timestamp: datetime | None = None,
+    end_timestamp: datetime | None = None,
+) -> S:
+    """
+    Applies the attendance filters to a statement that joins Attendance, Shift and
+    User. Attendances of inactive users are always filtered out.
+    """
+    statement = statement.where(col(User.active))
     if user_id is not None:
         statement = statement.where(Shift.user_id == user_id)
     if attendance_type is not None:
@@ -95,10 +437,47 @@ def list_attendances(
         statement = statement.where(Attendance.timestamp >= start_timestamp)
     if end_timestamp is not None:
         statement = statement.where(Attendance.timestamp <= end_timestamp)
+    return statement
+
+
+def stream_attendance_csv_rows(
+    session: Session,
+    user_id: int | None = None,
+    attendance_type: AttendanceType | None = None,
+    start_timestamp: datetime | None = None,
+    end_timestamp: datetime | None = None,
+    chunk_size: int = 1000,
+):
+    """
+    Yields lists of at most `chunk_size` rows, in the column order of
+    `AttendanceCsvLine`. The rows are read with a server-side cursor and the user
+    and shift columns come from the same query, so memory use does not depend on
+    the number of attendances.
+    """
+    statement = filter_attendances(
+        select(  # type: ignore[call-overload]
+            User.name,
+            Shift.weekday,
+            Shift.start_time,
+            Shift.end_time,
+            Attendance.attendance_type,
+            Attendance.minutes_late,
+            Attendance.timestamp,
+        )
+        .select_from(Attendance)
+        .join(Shift)
+        .join(User),
+        user_id=user_id,
+        attendance_type=attendance_type,
+        start_timestamp=start_timestamp,
+        end_timestamp=end_timestamp,
+    )
 
-    statement = statement.order_by(desc(Attendance.timestamp))
+    statement = statement.order_by(desc(Attendance.timestamp)).execution_options(
+        yield_per=chunk_size
+    )
 
-    return paginate(query=statement, session=session, page=page, page_size=page_size)
+    yield from session.exec(statement).partitions()
 
 
 def list_dates(start_date: date, end_date: date):
@@ -114,35 +493,52 @@ def list_absences(
     user_id: int | None = None,
     absence_type: AttendanceType | None = None,
 ):
-    shifts = shifts_crud.list_shifts(session, user_id)
+    absences = iter_absences(
+        session=session,
+        start_date=start_date,
+        end_date=end_date,
+        user_id=user_id,
+        absence_type=absence_type,
+    )
+    return [AbsenceResponse(**absence._asdict()) for absence in absences]
 
-    shifts_by_weekday: defaultdict[WeekdayEnum, list[Shift]] = defaultdict(list[Shift])
-    for shift in shifts:
-        shifts_by_weekday[shift.weekday].append(shift)
 
-    days_off = app_config_crud.list_days_off(
-        session=session, start_date=start_date, end_date=end_date
-    ).items
+def iter_absences(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    user_id: int | None = None,
+    absence_type: AttendanceType | None = None,
+) -> Iterator[AbsenceRow]:
+    """
+    Yields the absences between two dates using the configured backend.
+    """
+    backends: dict[str, Callable[..., Iterator[AbsenceRow]]] = {
+        "python": iter_absences_python,
+        "sql": iter_absences_sql,
+        "ledger": ledger.iter_absences_ledger,
+    }
+    return backends[settings.ABSENCES_BACKEND](
+        session=session,
+        start_date=start_date,
+        end_date=end_date,
+        user_id=user_id,
+        absence_type=absence_type,
+    )
 
-    dates = [
-        dt
-        for dt in list_dates(start_date, end_date)
-        if dt not in [day_off.day for day_off in days_off]
-    ]
 
-    shift_dates: list[ShiftDate] = []
+def iter_absences_python(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    user_id: int | None = None,
+    absence_type: AttendanceType | None = None,
+):
+    shifts = shifts_crud.list_shifts(session, user_id)
 
-    for dt in dates:
-        for shift in shifts:
-            if (
-                dt.weekday() == shift.weekday
-                and dt >= shift.user.created_at.date()
-                and (
-                    shift.user.updated_shifts_at is None
-                    or dt >= shift.user.updated_shifts_at.date()
-                )
-            ):
-                shift_dates.append(ShiftDate(day=dt, shift=shift))
+    days_off = app_config_crud.list_days_off(
+        session=session, start_date=start_date, end_date=end_date
+    ).items
 
     attendances = list_attendances(
         session=session,
@@ -152,54 +548,232 @@ def list_absences(
         user_id=user_id,
     ).items
 
-    absences: list[AbsenceResponse] = []
-    for entry in shift_dates:
-        clock_in_ids = [
-            attendance.shift_id
-            for attendance in attendances
-            if entry.day == attendance.timestamp.date()
-            and attendance.attendance_type == AttendanceType.CLOCK_IN
-        ]
-        clock_out_ids = [
-            attendance.shift_id
-            for attendance in attendances
-            if entry.day == attendance.timestamp.date()
-            and attendance.attendance_type == AttendanceType.CLOCK_OUT
-        ]
-
-        if entry.shift.id not in clock_in_ids and absence_type in (
-            None,
-            AttendanceType.CLOCK_IN,
-        ):
-            absences.append(
-                AbsenceResponse(
-                    shift=entry.shift,
-                    day=entry.day,
-                    absence_type=AttendanceType.CLOCK_IN,
-                )
-            )
-        if entry.shift.id not in clock_out_ids and absence_type in (
-            None,
-            AttendanceType.CLOCK_OUT,
-        ):
-            absences.append(
-                AbsenceResponse(
-                    shift=entry.shift,
-                    day=entry.day,
-                    absence_type=AttendanceType.CLOCK_OUT,
-                )
-            )
+    yield from compute_absences(
+        start_date=start_date,
+        end_date=end_date,
+        shifts=shifts,
+        days_off=days_off,
+        attendances=attendances,
+        absence_type=absence_type,
+    )
+
+
+def get_shifts_start(user: User):
+    """
+    Returns the first day the shifts of a user are expected on: after the user was
+    created and after the last time the user's shifts were changed.
+    """
+    first_day = user.created_at.date()
+    if user.updated_shifts_at is not None:
+        first_day = max(first_day, user.updated_shifts_at.date())
+    return first_day
+
+
+def compute_absences(
+    start_date: date,
+    end_date: date,
+    shifts: Sequence[Shift],
+    days_off: Sequence[DayOff],
+    attendances: Sequence[Attendance],
+    absence_type: AttendanceType | None = None,
+) -> Iterator[AbsenceRow]:
+    """
+    Computes the absences between two dates from already loaded data.
+
+    Shifts are bucketed by weekday and days off and recorded attendances are kept
+    in sets, so the cost grows with days + shifts + attendances instead of their
+    product.
+    """
+    shift_responses: dict[int | None, ShiftResponse] = {}
+
+    def get_shift_response(shift: Shift):
+        shift_response = shift_responses.get(shift.id)
+        if shift_response is None:
+            shift_response = ShiftResponse.model_validate(shift)
+            shift_responses[shift.id] = shift_response
+        return shift_response
+
+    shifts_by_weekday: defaultdict[int, list[tuple[Shift, date]]] = defaultdict(list)
+    for shift in shifts:
+        shifts_by_weekday[shift.weekday].append((shift, get_shifts_start(shift.user)))
+
+    days_off_set = {day_off.day for day_off in days_off}
+
+    recorded = {
+        (attendance.timestamp.date(), attendance.shift_id, attendance.attendance_type)
+        for attendance in attendances
+    }
+
+    absence_types = [
+        attendance_type
+        for attendance_type in AttendanceType
+        if absence_type in (None, attendance_type)
+    ]
+
+    for dt in list_dates(start_date, end_date):
+        if dt in days_off_set:
+            continue
+
+        for shift, first_day in shifts_by_weekday[dt.weekday()]:
+            if dt < first_day:
+                continue
+
+            for attendance_type in absence_types:
+                if (dt, shift.id, attendance_type) not in recorded:
+                    yield AbsenceRow(get_shift_response(shift), dt, attendance_type)
 
     for attendance in attendances:
         if attendance.minutes_late > 0:
-            absences.append(
-                AbsenceResponse(
-                    shift=attendance.shift,
-                    day=attendance.timestamp.date(),
-                    absence_type=attendance.attendance_type,
-                    attendance_timestamp=attendance.timestamp,
-                    minutes_late=attendance.minutes_late,
-                )
+            yield AbsenceRow(
+                shift=get_shift_response(attendance.shift),
+                day=attendance.timestamp.date(),
+                absence_type=attendance.attendance_type,
+                minutes_late=attendance.minutes_late,
+                attendance_timestamp=attendance.timestamp,
+            )
+
+
+def iter_absences_sql(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    user_id: int | None = None,
+    absence_type: AttendanceType | None = None,
+    chunk_size: int = 1000,
+):
+    """
+    Computes the absences between two dates in a single query.
+
+    The date range is expanded with `generate_series` and joined to the shifts on
+    the weekday, and an anti-join against the attendances keeps only the missing
+    clock-ins and clock-outs. Late attendances are appended to the same query, so
+    only the absence rows are sent to the application.
+    """
+    start_timestamp = datetime.combine(start_date, time())
+    end_timestamp = datetime.combine(end_date, time())
+    attendance_type_column = Attendance.__table__.c.attendance_type  # type: ignore[attr-defined]
+
+    days = select(
+        cast(
+            func.generate_series(
+                cast(start_date, DateTime),
+                cast(end_date, DateTime),
+                literal(timedelta(days=1), Interval),
+            ),
+            Date,
+        ).label("day")
+    ).subquery("days")
+
+    user_filters: list[Any] = [col(User.active)]
+    if user_id is not None:
+        user_filters.append(Shift.user_id == user_id)
+
+    attendance_window = [
+        Attendance.timestamp >= start_timestamp,
+        Attendance.timestamp <= end_timestamp,
+    ]
+
+    missing_statements = []
+    for attendance_type in AttendanceType:
+        if absence_type not in (None, attendance_type):
+            continue
+
+        recorded = select(Attendance.id).where(
+            Attendance.shift_id == Shift.id,
+            Attendance.attendance_type == attendance_type,
+            Attendance.timestamp >= days.c.day,
+            Attendance.timestamp < days.c.day + timedelta(days=1),
+            *attendance_window,
+        )
+        day_off = select(DayOff.id).where(DayOff.day == days.c.day)
+
+        missing_statements.append(
+            select(  # type: ignore[call-overload]
+                literal(0).label("kind"),
+                days.c.day,
+                col(Shift.id).label("shift_id"),
+                cast(
+                    literal(attendance_type, attendance_type_column.type),
+                    attendance_type_column.type,
+                ).label("absence_type"),
+                cast(null(), Integer).label("minutes_late"),
+                cast(null(), DateTime).label("attendance_timestamp"),
+            )
+            .select_from(days)
+            .join(
+                Shift,
+                func.to_char(days.c.day, "FMDAY") == cast(Shift.weekday, String),
+            )
+            .join(User)
+            .where(
+                *user_filters,
+                days.c.day >= cast(User.created_at, Date),
+                or_(
+                    col(User.updated_shifts_at).is_(None),
+                    days.c.day >= cast(User.updated_shifts_at, Date),
+                ),
+                ~exists(recorded),
+                ~exists(day_off),
             )
+        )
 
-    return absences
+    late_statement = (
+        select(  # type: ignore[call-overload]
+            literal(1).label("kind"),
+            cast(Attendance.timestamp, Date).label("day"),
+            col(Attendance.shift_id).label("shift_id"),
+            attendance_type_column.label("absence_type"),
+            col(Attendance.minutes_late).label("minutes_late"),
+            col(Attendance.timestamp).label("attendance_timestamp"),
+        )
+        .join(Shift)
+        .join(User)
+        .where(*user_filters, *attendance_window, Attendance.minutes_late > 0)
+    )
+    if absence_type is not None:
+        late_statement = late_statement.where(
+            Attendance.attendance_type == absence_type
+        )
+
+    rows = union_all(*missing_statements, late_statement).subquery("absences")
+
+    statement = (
+        select(  # type: ignore[call-overload]
+            Shift,
+            rows.c.day,
+            rows.c.absence_type,
+            rows.c.minutes_late,
+            rows.c.attendance_timestamp,
+        )
+        .join(rows, rows.c.shift_id == Shift.id)
+        .options(selectinload(Shift.user).selectinload(User.role))  # type: ignore[arg-type]
+        .order_by(
+            rows.c.kind,
+            case((rows.c.kind == 0, rows.c.day)),
+            desc(rows.c.attendance_timestamp),
+            rows.c.shift_id,
+            rows.c.absence_type,
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+
+    shift_responses: dict[int | None, ShiftResponse] = {}
+    for (
+        shift,
+        day,
+        row_absence_type,
+        minutes_late,
+        attendance_timestamp,
+    ) in session.exec(statement):
+        shift_response = shift_responses.get(shift.id)
+        if shift_response is None:
+            shift_response = ShiftResponse.model_validate(shift)
+            shift_responses[shift.id] = shift_response
+
+        yield AbsenceRow(
+            shift=shift_response,
+            day=day,
+            absence_type=row_absence_type,
+            minutes_late=minutes_late,
+            attendance_timestamp=attendance_timestamp,
+        )
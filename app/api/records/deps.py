@@ -3,18 +3,26 @@ from typing import Annotated
 
 from fastapi import Depends, Query
 
-from app.api.records import crud
-from app.api.records.schemas import AbsenceResponse
+from app.api.records import cache
+from app.api.records.schemas import AbsenceFilters, AbsenceResponse
 from app.api.users import crud as users_crud
 from app.core.config import settings
-from app.core.deps import CurrentUserDep, SessionDep
+from app.core.deps import SessionDep, TokenUserDep
 from app.core.exceptions import BadRequest, Forbidden, NotFound
 from app.core.models import AttendanceType
 
+CompactQuery = Annotated[
+    bool,
+    Query(
+        description="Return the items referencing their shift by id, with each "
+        "shift, user and role once in `included`."
+    ),
+]
 
-def get_absences(
+
+def get_absence_filters(
     session: SessionDep,
-    current_user: CurrentUserDep,
+    current_user: TokenUserDep,
     start_date: Annotated[
         date,
         Query(description="The initial date that will be used to search for absences"),
@@ -33,15 +41,10 @@ def get_absences(
     ] = None,
 ):
     """
-    Returns absences between two dates.
-    Absences of inactive users or days off will not be shown.
+    Validates the absence filters and checks if the current user can see them.
     """
 
-    is_admin = (
-        current_user.role is not None
-        and current_user.role.name == settings.ADMIN_ROLE_NAME
-    )
-    is_allowed = user_id == current_user.id or is_admin
+    is_allowed = user_id == current_user.id or current_user.is_admin
 
     if not is_allowed:
         raise Forbidden()
@@ -55,18 +58,34 @@ def get_absences(
         raise BadRequest("A data inicial deve ser menor ou igual a data final.")
 
     diff_days = (end_date - start_date).days
+    max_days = (
+        settings.ABSENCES_LEDGER_MAX_DAYS
+        if settings.ABSENCES_BACKEND == "ledger"
+        else settings.ABSENCES_MAX_DAYS
+    )
 
-    if diff_days > 90:
-        raise BadRequest("O período entre as datas deve ser menor que 90 dias.")
+    if diff_days > max_days:
+        raise BadRequest(
+            f"O período entre as datas deve ser menor que {max_days} dias."
+        )
 
-    absences = crud.list_absences(
-        session=session,
-        user_id=user_id,
-        absence_type=absence_type,
+    return AbsenceFilters(
         start_date=start_date,
         end_date=end_date,
+        user_id=user_id,
+        absence_type=absence_type,
     )
-    return absences
+
+
+AbsenceFiltersDep = Annotated[AbsenceFilters, Depends(get_absence_filters)]
+
+
+def get_absences(session: SessionDep, filters: AbsenceFiltersDep):
+    """
+    Returns absences between two dates.
+    Absences of inactive users or days off will not be shown.
+    """
+    return cache.get_absences(session, filters)
 
 
 GetAbsencesDep = Annotated[list[AbsenceResponse], Depends(get_absences)]
@@ -0,0 +1,136 @@
+"""
+Group commit of new attendances.
+
+At the start of a shift many users clock in at once, and committing each
+attendance in its own transaction makes the database flush its log for every
+one of them. When `ATTENDANCE_GROUP_COMMIT` is enabled, the attendances queued
+by concurrent requests within `ATTENDANCE_GROUP_COMMIT_WINDOW` seconds are
+inserted together, with a single multi-row INSERT ... RETURNING in a single
+transaction, and each request gets its own row back. A batch is inserted early
+once it reaches `ATTENDANCE_GROUP_COMMIT_MAX_SIZE` attendances.
+
+If a batch fails because of its data, it's split in halves that are inserted
+again, so that only the requests whose attendance can't be inserted get the
+error, in a few transactions instead of one per attendance. Other errors, like
+a lost connection, fail the whole batch.
+
+The batches are inserted in the event loop of the app, with connections of the
+async engine. Requests must release their own connection before queuing an
+attendance, or a full pool would never give one to the batch.
+"""
+
+import asyncio
+import time as timer
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import Row
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlmodel import col, insert
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.metrics import GroupCommitStats
+from app.core.models import Attendance
+
+type Pending = tuple[dict[str, Any], asyncio.Future[Row[Any]]]
+
+stats = GroupCommitStats()
+_pending: list[Pending] = []
+_timer: asyncio.TimerHandle | None = None
+# Keeps a reference to the running batches, which the event loop doesn't
+_tasks: set[asyncio.Task[None]] = set()
+
+
+async def insert_attendance(values: dict[str, Any]) -> Row[Any]:
+    """
+    Queues the values of an attendance and returns its id and timestamp once its
+    batch is committed.
+    """
+    global _timer
+
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[Row[Any]] = loop.create_future()
+    _pending.append((values, future))
+    if len(_pending) >= settings.ATTENDANCE_GROUP_COMMIT_MAX_SIZE:
+        flush()
+    elif _timer is None:
+        _timer = loop.call_later(settings.ATTENDANCE_GROUP_COMMIT_WINDOW, flush)
+
+    start = timer.perf_counter()
+    try:
+        return await future
+    finally:
+        stats.record_latency(timer.perf_counter() - start)
+
+
+def flush():
+    """
+    Starts inserting the queued attendances.
+    """
+    global _timer
+
+    if _timer is not None:
+        _timer.cancel()
+        _timer = None
+    if not _pending:
+        return
+
+    batch = _pending.copy()
+    _pending.clear()
+    task = asyncio.create_task(insert_batch(batch))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def drain():
+    """
+    Inserts the queued attendances and waits for the running batches.
+    """
+    flush()
+    await asyncio.gather(*_tasks)
+
+
+async def insert_rows(rows: Sequence[dict[str, Any]]):
+    statement = insert(Attendance).returning(
+        col(Attendance.id), col(Attendance.timestamp), sort_by_parameter_order=True
+    )
+    async with async_engine.begin() as connection:
+        result = await connection.execute(statement, rows)
+        return result.all()
+
+
+def set_result(future: asyncio.Future[Row[Any]], row: Row[Any]):
+    # Requests cancelled while waiting don't need their row
+    if not future.done():
+        future.set_result(row)
+
+
+def set_exception(future: asyncio.Future[Row[Any]], exception: Exception):
+    stats.record_failure()
+    if not future.done():
+        future.set_exception(exception)
+
+
+async def insert_batch(batch: list[Pending]):
+    stats.record_batch(len(batch))
+    await insert_split(batch)
+
+
+async def insert_split(batch: list[Pending]):
+    try:
+        rows = await insert_rows([values for values, _ in batch])
+    except Exception as e:
+        if len(batch) == 1 or not isinstance(e, IntegrityError | DataError):
+            for _, future in batch:
+                set_exception(future, e)
+            return
+
+        # Bisects the batch to isolate the attendances that can't be inserted
+        middle = len(batch) // 2
+        await insert_split(batch[:middle])
+        await insert_split(batch[middle:])
+        return
+
+    for (_, future), row in zip(batch, rows, strict=True):
+        set_result(future, row)
@@ -0,0 +1,206 @@
+"""
+Import of historical attendances from CSV files.
+
+The files have the columns of `AttendanceCsvLine`, as written by the attendances
+export. They are read as a stream and validated `CSV_CHUNK_SIZE` lines at a time:
+each line is matched to its shift by the user's name, the weekday and the shift
+times through an in-memory index of every shift, and the valid lines of each
+chunk are loaded with a single `COPY` into a temporary staging table. Rejected
+lines are reported without aborting the import.
+
+The missing monthly partitions are created as the chunks are read, each time in a
+short transaction of their own, and the staged rows are inserted into the
+attendances by a single statement once the whole file is read. The import is
+still all or nothing, but the partitions lock and the version of the attendances
+are only held for that last statement.
+
+Timestamps without an offset are in the time zone of the app config, as in the
+export. An empty "Minutos de Atraso" is computed like for new attendances.
+"""
+
+import csv
+from collections.abc import Iterable, Sequence
+from datetime import date, datetime, time
+from itertools import batched
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from pydantic import ValidationError
+from sqlmodel import Session, select
+
+from app.api.app_config import cache as app_config_cache
+from app.api.records import crud, ledger
+from app.api.records.schemas import (
+    AttendanceCsvLine,
+    AttendanceImportResult,
+    RejectedCsvLine,
+)
+from app.core import partitions
+from app.core.config import settings
+from app.core.exceptions import BadRequest
+from app.core.models import AppConfig, Shift, User, WeekdayEnum
+
+# Number of rejected lines returned with their errors, the others are only counted
+MAX_REJECTED_LINES = 1000
+
+COLUMNS = [
+    field.alias or name for name, field in AttendanceCsvLine.model_fields.items()
+]
+STAGING_TABLE = "attendance_import"
+# Declared without referencing the attendance table, which would be locked until
+# the end of the import, blocking the creation of its partitions
+CREATE_STAGING_STATEMENT = (
+    f"CREATE TEMPORARY TABLE {STAGING_TABLE} ("
+    "timestamp timestamp NOT NULL, minutes_late integer NOT NULL, "
+    "attendance_type attendancetype NOT NULL, shift_id integer NOT NULL"
+    ") ON COMMIT DROP"
+)
+COPY_STATEMENT = (
+    f"COPY {STAGING_TABLE} (timestamp, minutes_late, attendance_type, shift_id) "
+    "FROM STDIN"
+)
+INSERT_STATEMENT = (
+    "INSERT INTO attendance (timestamp, minutes_late, attendance_type, shift_id) "
+    f"SELECT timestamp, minutes_late, attendance_type, shift_id FROM {STAGING_TABLE}"
+)
+
+type ShiftKey = tuple[str, WeekdayEnum, time, time]
+
+
+class InvalidLine(Exception):
+    pass
+
+
+def get_shift_index(session: Session) -> dict[ShiftKey, Shift | None]:
+    """
+    Returns every shift by its user's name, weekday, start and end. Keys shared by
+    users with the same name map to None, as their lines can't be imported.
+    """
+    index: dict[ShiftKey, Shift | None] = {}
+    for name, shift in session.exec(select(User.name, Shift).join(Shift)):
+        key = (name, shift.weekday, shift.start_time, shift.end_time)
+        index[key] = None if key in index else shift
+    return index
+
+
+def parse_line(
+    row: Sequence[str],
+    shift_index: dict[ShiftKey, Shift | None],
+    app_config: AppConfig,
+    zone_info: ZoneInfo,
+    now: datetime,
+):
+    """
+    Returns the values of an attendance row, in the column order of
+    `COPY_STATEMENT`. `now` is the current local time, without offset.
+    """
+    if len(row) != len(COLUMNS):
+        raise InvalidLine(f"A linha deve ter {len(COLUMNS)} colunas.")
+
+    try:
+        line = AttendanceCsvLine.model_validate(
+            dict(zip(COLUMNS, [value or None for value in row], strict=True))
+        )
+    except ValidationError as e:
+        columns = dict.fromkeys(str(error["loc"][0]) for error in e.errors())
+        raise InvalidLine(f"Valores inválidos: {', '.join(columns)}.") from e
+
+    if line.attendance_timestamp is None:
+        raise InvalidLine("A data/hora da presença é obrigatória.")
+
+    key = (line.user_name, line.weekday, line.shift_start, line.shift_end)
+    if key not in shift_index:
+        raise InvalidLine("Turno não encontrado.")
+    shift = shift_index[key]
+    if shift is None:
+        raise InvalidLine("Há mais de um usuário com esse nome e turno.")
+
+    # Kept without the offset, which the timestamp column would ignore
+    timestamp = line.attendance_timestamp
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(zone_info).replace(tzinfo=None)
+    if timestamp > now:
+        raise InvalidLine("O horário do registro não pode estar no futuro.")
+
+    minutes_late = line.minutes_late
+    if minutes_late is None:
+        minutes_late = crud.get_minutes_late(
+            app_config, shift, line.attendance_type, timestamp.replace(tzinfo=zone_info)
+        )
+    return (timestamp, minutes_late, line.attendance_type.name, shift.id)
+
+
+def copy_attendances(session: Session, rows: Iterable[Sequence[Any]]):
+    connection = session.connection().connection.driver_connection
+    if connection is None:
+        raise ValueError("The session is not connected to the database.")
+    with connection.cursor() as cursor, cursor.copy(COPY_STATEMENT) as copy:
+        for row in rows:
+            copy.write_row(row)
+
+
+def import_attendances(session: Session, lines: Iterable[str]):
+    """
+    Imports the attendances of a CSV file, given as an iterable of lines, e.g. a
+    text file opened with `newline=""`. The missing monthly partitions of the
+    attendances are created and the closed days of the ledger are refreshed.
+
+    The partitions are created through another session, so the transaction of
+    `session` must not have read the attendances yet.
+    """
+    cached = app_config_cache.get_app_config(session)
+    if not cached:
+        raise ValueError(
+            "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
+        )
+
+    result = AttendanceImportResult(imported=0, rejected=0, rejected_lines=[])
+    now = datetime.now(cached.zone_info).replace(tzinfo=None)
+    days: set[date] = set()
+
+    try:
+        reader = csv.reader(lines)
+        if next(reader, None) != COLUMNS:
+            raise BadRequest(
+                f"O cabeçalho do arquivo CSV deve ter as colunas: {', '.join(COLUMNS)}."
+            )
+
+        shift_index = get_shift_index(session)
+        session.connection().exec_driver_sql(CREATE_STAGING_STATEMENT)
+        months: set[date] = set()
+
+        numbered_rows = ((reader.line_num, row) for row in reader)
+        for chunk in batched(numbered_rows, settings.CSV_CHUNK_SIZE):
+            attendances = []
+            for line_num, row in chunk:
+                try:
+                    attendance = parse_line(
+                        row, shift_index, cached.app_config, cached.zone_info, now
+                    )
+                    attendances.append(attendance)
+                except InvalidLine as e:
+                    result.rejected += 1
+                    if len(result.rejected_lines) < MAX_REJECTED_LINES:
+                        result.rejected_lines.append(
+                            RejectedCsvLine(line=line_num, error=str(e))
+                        )
+
+            chunk_days = {attendance[0].date() for attendance in attendances}
+            chunk_months = {partitions.month_start(day) for day in chunk_days}
+            if chunk_months - months:
+                # Committed at once, as the rows are only inserted at the end
+                with Session(session.get_bind()) as partitions_session:
+                    partitions.create_partitions(partitions_session, chunk_months)
+                months |= chunk_months
+
+            copy_attendances(session, attendances)
+            result.imported += len(attendances)
+            days |= chunk_days
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise BadRequest("O arquivo CSV é inválido ou não está em UTF-8.") from e
+
+    session.connection().exec_driver_sql(INSERT_STATEMENT)
+    session.commit()
+    if days:
+        ledger.refresh_period(session, min(days), max(days))
+    return result
@@ -0,0 +1,338 @@
+"""
+Persisted absence ledger.
+
+Past days are "closed" by `close_absences` (run nightly by `app.close_absences`)
+and their absences are stored in the `absence` table. Writes that can change the
+absences of a closed day refresh only the affected days and users, so reading
+absences becomes an indexed range scan. Days outside of the closed period, i.e.
+before the first day the ledger was synced from or after the last closed day,
+are still computed on demand.
+
+The ledger is only maintained when `ABSENCES_BACKEND` is "ledger".
+"""
+
+from collections.abc import Iterator
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, col, delete, desc, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.api.app_config import crud as app_config_crud
+from app.api.records import crud
+from app.api.records.schemas import AbsenceRow
+from app.api.shifts.schemas import ShiftResponse
+from app.core.config import settings
+from app.core.models import (
+    Absence,
+    AppConfig,
+    Attendance,
+    AttendanceType,
+    DayOff,
+    Shift,
+    User,
+)
+
+# Number of days recomputed at once when closing or rebuilding a long period.
+SYNC_CHUNK_DAYS = 31
+
+
+def ledger_enabled():
+    return settings.ABSENCES_BACKEND == "ledger"
+
+
+def get_closed_period(session: Session) -> tuple[date, date] | None:
+    """
+    Returns the first and the last closed days, if any day was closed.
+    """
+    statement = select(
+        col(AppConfig.absences_closed_from), col(AppConfig.absences_closed_until)
+    ).order_by(desc(AppConfig.id))
+    row = session.exec(statement).first()
+    if row is None or row[0] is None or row[1] is None:
+        return None
+    return row[0], row[1]
+
+
+def lock_absences(session: Session, user_id: int | None = None):
+    """
+    Locks the ledger rows of a user, or of every user, until the end of the
+    transaction. Refreshes of the same rows would otherwise both delete them and
+    then both insert their absences, duplicating them.
+    """
+    # Refreshes of a user share the lock of every user, so they only wait for
+    # refreshes of the same user and of every user
+    if user_id is None:
+        statement = "SELECT pg_advisory_xact_lock(hashtext(%(table)s), 0)"
+    else:
+        statement = (
+            "SELECT pg_advisory_xact_lock_shared(hashtext(%(table)s), 0), "
+            "pg_advisory_xact_lock(hashtext(%(table)s), %(user_id)s)"
+        )
+    session.connection().exec_driver_sql(
+        statement, {"table": Absence.__tablename__, "user_id": user_id}
+    )
+
+
+def sync_absences(
+    session: Session, start_date: date, end_date: date, user_id: int | None = None
+):
+    """
+    Recomputes the ledger rows between two dates, optionally for a single user.
+    Each day is computed with all of its attendances.
+    """
+    # Taken before reading the attendances, so the rows written are computed from
+    # the writes committed by the refreshes that held it before
+    lock_absences(session, user_id)
+
+    delete_statement = delete(Absence).where(
+        col(Absence.day) >= start_date, col(Absence.day) <= end_date
+    )
+
+    shifts_statement = select(Shift).options(
+        selectinload(Shift.user).selectinload(User.role)  # type: ignore[arg-type]
+    )
+    attendances_statement = (
+        select(Attendance)
+        .join(Shift)
+        .where(
+            Attendance.timestamp >= datetime.combine(start_date, time()),
+            Attendance.timestamp
+            < datetime.combine(end_date + timedelta(days=1), time()),
+        )
+        .order_by(desc(Attendance.timestamp))
+    )
+
+    if user_id is not None:
+        delete_statement = delete_statement.where(col(Absence.user_id) == user_id)
+        shifts_statement = shifts_statement.where(Shift.user_id == user_id)
+        attendances_statement = attendances_statement.where(Shift.user_id == user_id)
+
+    days_off = session.exec(
+        select(DayOff).where(DayOff.day >= start_date, DayOff.day <= end_date)
+    ).all()
+
+    absences = crud.compute_absences(
+        start_date=start_date,
+        end_date=end_date,
+        shifts=session.exec(shifts_statement).all(),
+        days_off=days_off,
+        attendances=session.exec(attendances_statement).all(),
+    )
+
+    session.exec(delete_statement)  # type: ignore[call-overload]
+    session.add_all(
+        Absence(
+            day=absence.day,
+            absence_type=absence.absence_type,
+            minutes_late=absence.minutes_late,
+            attendance_timestamp=absence.attendance_timestamp,
+            shift_id=absence.shift.id,
+            user_id=absence.shift.user.id,
+        )
+        for absence in absences
+    )
+    session.commit()
+
+
+def sync_period(session: Session, start_date: date, end_date: date):
+    """
+    Recomputes the ledger rows between two dates, `SYNC_CHUNK_DAYS` at a time.
+    """
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=SYNC_CHUNK_DAYS - 1), end_date)
+        sync_absences(session, chunk_start, chunk_end)
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+def close_absences(
+    session: Session, start_date: date | None = None, end_date: date | None = None
+):
+    """
+    Closes every day up to `end_date` (yesterday by default) that was not closed
+    yet. If `start_date` is given, the ledger is rebuilt from that day on, and the
+    closed period is extended back to it.
+    """
+    if end_date is None:
+        app_config = app_config_crud.get_last_app_config(session)
+        if not app_config:
+            raise ValueError(
+                "Ocorreu um erro no servidor e "
+                "não foi possível encontrar as configurações."
+            )
+        today = datetime.now(ZoneInfo(app_config.zone_info)).date()
+        end_date = today - timedelta(days=1)
+
+    period = get_closed_period(session)
+    if start_date is None:
+        start_date = period[1] + timedelta(days=1) if period else end_date
+
+    sync_period(session, start_date, end_date)
+
+    app_config = app_config_crud.get_last_app_config(session)
+    if app_config:
+        if period is None or start_date < period[0]:
+            app_config.absences_closed_from = start_date
+        if period is None or end_date > period[1]:
+            app_config.absences_closed_until = end_date
+        session.add(app_config)
+        session.commit()
+
+    return end_date
+
+
+def refresh_day(session: Session, day: date, user_id: int | None = None):
+    """
+    Refreshes the ledger rows of a day, if that day is already closed.
+    """
+    if not ledger_enabled():
+        return
+
+    period = get_closed_period(session)
+    if period is None or not period[0] <= day <= period[1]:
+        return
+
+    sync_absences(session, day, day, user_id)
+
+
+def refresh_period(session: Session, start_date: date, end_date: date):
+    """
+    Refreshes the ledger rows of the closed days between two dates, for writes
+    spanning many days, such as imports.
+    """
+    if not ledger_enabled():
+        return
+
+    period = get_closed_period(session)
+    if period is None:
+        return
+
+    start_date, end_date = max(start_date, period[0]), min(end_date, period[1])
+    if start_date <= end_date:
+        sync_period(session, start_date, end_date)
+
+
+def refresh_user(session: Session, user_id: int):
+    """
+    Refreshes the closed days of a user after their shifts changed. The shifts are
+    only expected from the day they changed on, usually today, so the user's rows
+    before that day are deleted and only the closed days after it are recomputed.
+    """
+    if not ledger_enabled():
+        return
+
+    period = get_closed_period(session)
+    user = session.get(User, user_id)
+    if period is None or user is None:
+        return
+
+    first_day = crud.get_shifts_start(user)
+    lock_absences(session, user_id)
+    session.exec(
+        delete(Absence).where(  # type: ignore[call-overload]
+            col(Absence.user_id) == user_id, col(Absence.day) < first_day
+        )
+    )
+    start_date = max(first_day, period[0])
+    if start_date > period[1]:
+        session.commit()
+        return
+
+    sync_absences(session, start_date, period[1], user_id)
+
+
+def iter_absences_ledger(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    user_id: int | None = None,
+    absence_type: AttendanceType | None = None,
+    chunk_size: int = 1000,
+) -> Iterator[AbsenceRow]:
+    period = get_closed_period(session)
+    if period is None or start_date > period[1] or end_date < period[0]:
+        yield from crud.iter_absences_python(
+            session, start_date, end_date, user_id, absence_type
+        )
+        return
+
+    # Days outside of the closed period are computed on demand, and split so the
+    # rows keep the order of the other backends: the missed clock-ins and
+    # clock-outs by day, then the late ones, the last first
+    closed_from, closed_until = period
+    before: list[AbsenceRow] = []
+    if start_date < closed_from:
+        before = list(
+            crud.iter_absences_python(
+                session,
+                start_date,
+                closed_from - timedelta(days=1),
+                user_id,
+                absence_type,
+            )
+        )
+    after: list[AbsenceRow] = []
+    if end_date > closed_until:
+        after = list(
+            crud.iter_absences_python(
+                session,
+                closed_until + timedelta(days=1),
+                end_date,
+                user_id,
+                absence_type,
+            )
+        )
+
+    statement = (
+        select(Absence)
+        .join(User)
+        .where(
+            col(User.active),
+            Absence.day >= max(start_date, closed_from),
+            Absence.day <= min(end_date, closed_until),
+        )
+        .options(
+            selectinload(Absence.shift)  # type: ignore[arg-type]
+            .selectinload(Shift.user)  # type: ignore[arg-type]
+            .selectinload(User.role)  # type: ignore[arg-type]
+        )
+    )
+    if user_id is not None:
+        statement = statement.where(Absence.user_id == user_id)
+    if absence_type is not None:
+        statement = statement.where(Absence.absence_type == absence_type)
+
+    missed_statement = statement.where(col(Absence.minutes_late).is_(None)).order_by(
+        col(Absence.day), col(Absence.shift_id), col(Absence.absence_type)
+    )
+    late_statement = statement.where(col(Absence.minutes_late).is_not(None)).order_by(
+        desc(Absence.attendance_timestamp),
+        col(Absence.shift_id),
+        col(Absence.absence_type),
+    )
+
+    shift_responses: dict[int, ShiftResponse] = {}
+
+    def iter_rows(statement: SelectOfScalar[Absence]):
+        for absence in session.exec(statement.execution_options(yield_per=chunk_size)):
+            shift_response = shift_responses.get(absence.shift_id)
+            if shift_response is None:
+                shift_response = ShiftResponse.model_validate(absence.shift)
+                shift_responses[absence.shift_id] = shift_response
+
+            yield AbsenceRow(
+                shift=shift_response,
+                day=absence.day,
+                absence_type=absence.absence_type,
+                minutes_late=absence.minutes_late,
+                attendance_timestamp=absence.attendance_timestamp,
+            )
+
+    yield from (row for row in before if row.minutes_late is None)
+    yield from iter_rows(missed_statement)
+    yield from (row for row in after if row.minutes_late is None)
+    yield from (row for row in after if row.minutes_late is not None)
+    yield from iter_rows(late_statement)
+    yield from (row for row in before if row.minutes_late is not None)
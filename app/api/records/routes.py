@@ -1,59 +1,125 @@
 import csv
 import io
+from collections.abc import Iterable, Sequence
 from datetime import datetime
-from typing import Annotated
+from itertools import batched
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Body, Depends, Query, UploadFile
 from fastapi.responses import StreamingResponse
+from sqlmodel import Session
 
-from app.api.records import crud
-from app.api.records.deps import GetAbsencesDep
+from app.api.records import crud, imports
+from app.api.records.deps import AbsenceFiltersDep, CompactQuery, GetAbsencesDep
 from app.api.records.schemas import (
     AbsenceCsvLine,
     AbsenceResponse,
     AttendanceCreate,
     AttendanceCsvLine,
+    AttendanceEvent,
+    AttendanceEventResult,
+    AttendanceImportResult,
     AttendanceResponse,
     AttendanceUpdate,
+    CompactAbsences,
+    CompactAttendancePage,
 )
 from app.api.shifts import crud as shifts_crud
 from app.api.users import crud as users_crud
 from app.core.config import settings
-from app.core.crud import db_delete
-from app.core.deps import CurrentUserDep, PaginationDep, SessionDep, check_admin
-from app.core.exceptions import Forbidden, NotFound
+from app.core.db import engine
+from app.core.deps import (
+    AsyncSessionDep,
+    FieldsQuery,
+    PaginationDep,
+    SessionDep,
+    TokenUserDep,
+    check_admin,
+)
+from app.core.exceptions import BadRequest, Forbidden, NotFound
+from app.core.fields import partial_model, select_fields
 from app.core.models import AttendanceType
-from app.core.schemas import Message, Page
+from app.core.responses import model_json_response
+from app.core.schemas import BaseSchema, Message, Page
 
 router = APIRouter(prefix="/records", tags=["records"])
 
 
+def iter_csv(schema: type[BaseSchema], chunks: Iterable[Sequence[Sequence[Any]]]):
+    """
+    Yields a CSV file chunk by chunk. The header comes from the aliases of the
+    schema and each row must follow the order of the schema fields.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([field.alias for field in schema.model_fields.values()])
+
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
 @router.post("/attendances", response_model=AttendanceResponse)
-def create_new_attendance(
-    session: SessionDep, body: AttendanceCreate, current_user: CurrentUserDep
+async def create_new_attendance(
+    session: AsyncSessionDep, body: AttendanceCreate, current_user: TokenUserDep
 ):
     """
     Create new attendance (Clock in or Clock out)
     """
-    shift = shifts_crud.get_shift_by_id(session, body.shift_id)
+    shift = await shifts_crud.get_shift_by_id_async(session, body.shift_id)
     if not shift:
         raise NotFound("Turno não encontrado.")
 
-    is_admin = (
-        current_user.role is not None
-        and current_user.role.name == settings.ADMIN_ROLE_NAME
-    )
-    is_allowed = shift.user_id == current_user.id or is_admin
+    is_allowed = shift.user_id == current_user.id or current_user.is_admin
 
     if not is_allowed:
         raise Forbidden()
 
-    attendance = crud.create_attendance(
+    attendance = await crud.create_attendance_async(
         session=session, shift=shift, attendance_type=body.attendance_type
     )
     return attendance
 
 
+@router.post(
+    "/attendances/batch",
+    response_model=list[AttendanceEventResult],
+    dependencies=[Depends(check_admin)],
+)
+def create_new_attendances(
+    session: SessionDep,
+    body: Annotated[list[AttendanceEvent], Body(min_length=1, max_length=5000)],
+):
+    """
+    Record many attendances at once, e.g. uploaded by a clock terminal.
+    Each event references its shift, or its user, in which case the shift is the
+    user's shift on that weekday closest to the timestamp. The results are in
+    the order of the events; events that could not be recorded have an error.
+    """
+    results = crud.create_attendances(session=session, events=body)
+    return model_json_response(list[AttendanceEventResult], results)
+
+
+@router.post(
+    "/attendances/import",
+    response_model=AttendanceImportResult,
+    dependencies=[Depends(check_admin)],
+)
+def import_attendances_from_csv(session: SessionDep, file: UploadFile):
+    """
+    Import attendances from a CSV file with the columns of the attendances export.
+    Lines that can't be imported are skipped and reported, the others are
+    imported.
+    """
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    return imports.import_attendances(session=session, lines=lines)
+
+
 @router.patch(
     "/attendances/{attendance_id}",
     response_model=AttendanceResponse,
@@ -83,11 +149,13 @@ def delete_attendance(session: SessionDep, attendance_id: int) -> Message:
     attendance = crud.get_attendance_by_id(session, attendance_id)
     if not attendance:
         raise NotFound("Registro não encontrado.")
-    db_delete(session, attendance)
+    crud.delete_attendance(session, attendance)
     return Message(message="Registro deletado com sucesso")
 
 
-@router.get("/attendances", response_model=Page[AttendanceResponse])
+@router.get(
+    "/attendances", response_model=Page[AttendanceResponse] | CompactAttendancePage
+)
 def list_attendances(
     session: SessionDep,
     pagination: PaginationDep,
@@ -105,11 +173,17 @@ def list_attendances(
     end_timestamp: Annotated[
         datetime | None, Query(description="Filter by a end datetime")
     ] = None,
+    compact: CompactQuery = False,
+    fields: FieldsQuery = None,
 ):
     """
     List attendances.
     Attendances of inactive users will not be shown.
     """
+    if compact and fields:
+        raise BadRequest("Os parâmetros compact e fields não podem ser usados juntos.")
+    selected = select_fields(AttendanceResponse, fields)
+
     if user_id is not None:
         user = users_crud.get_user_by_id(session=session, id=user_id)
         if not user:
@@ -123,13 +197,23 @@ def list_attendances(
         end_timestamp=end_timestamp,
         page=pagination.page,
         page_size=pagination.page_size,
+        cursor=pagination.cursor,
+        count=pagination.count,
+        fields=selected,
     )
-    return attendances
+    if compact:
+        return model_json_response(
+            CompactAttendancePage, crud.compact_attendances(attendances)
+        )
+    item_type = partial_model(AttendanceResponse, selected)
+    return model_json_response(Page[item_type], attendances)  # type: ignore[valid-type]
 
 
-@router.get("/absences")
-def list_absences(absences: GetAbsencesDep) -> list[AbsenceResponse]:
-    return absences
+@router.get("/absences", response_model=list[AbsenceResponse] | CompactAbsences)
+def list_absences(absences: GetAbsencesDep, compact: CompactQuery = False):
+    if compact:
+        return model_json_response(CompactAbsences, crud.compact_absences(absences))
+    return model_json_response(list[AbsenceResponse], absences)
 
 
 @router.post(
@@ -142,32 +226,34 @@ def list_absences(absences: GetAbsencesDep) -> list[AbsenceResponse]:
         }
     },
 )
-def export_absences_to_csv(absences: GetAbsencesDep):
-    data = [
-        AbsenceCsvLine(
-            user_name=absence.shift.user.name,
-            day=absence.day,
-            shift_start=absence.shift.start_time,
-            shift_end=absence.shift.end_time,
-            absence_type=absence.absence_type,
-            minutes_late=absence.minutes_late,
-            attendance_timestamp=absence.attendance_timestamp,
-        ).model_dump(by_alias=True)
-        for absence in absences
-    ]
-
-    fieldnames = list(data[0].keys()) if data else []
-
-    buffer = io.StringIO()
-
-    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(data)
-
-    buffer.seek(0)
+def export_absences_to_csv(filters: AbsenceFiltersDep):
+    def generate_csv():
+        # The request session is closed before the response is streamed, so the
+        # absences are read with a session that lives as long as the stream.
+        with Session(engine) as stream_session:
+            absences = crud.iter_absences(
+                session=stream_session,
+                user_id=filters.user_id,
+                absence_type=filters.absence_type,
+                start_date=filters.start_date,
+                end_date=filters.end_date,
+            )
+            rows = (
+                (
+                    absence.shift.user.name,
+                    absence.day,
+                    absence.shift.start_time,
+                    absence.shift.end_time,
+                    absence.absence_type,
+                    absence.minutes_late,
+                    absence.attendance_timestamp,
+                )
+                for absence in absences
+            )
+            yield from iter_csv(AbsenceCsvLine, batched(rows, settings.CSV_CHUNK_SIZE))
 
     return StreamingResponse(
-        iter([buffer.getvalue()]),
+        generate_csv(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=absences.csv"},
     )
@@ -205,39 +291,22 @@ def export_attendances_to_csv(
         if not user:
             raise NotFound("Usuário não encontrado.")
 
-    attendances = crud.list_attendances(
-        session=session,
-        user_id=user_id,
-        attendance_type=attendance_type,
-        start_timestamp=start_timestamp,
-        end_timestamp=end_timestamp,
-    )
-
-    data = [
-        AttendanceCsvLine(
-            user_name=attendance.shift.user.name,
-            weekday=attendance.shift.weekday,
-            shift_start=attendance.shift.start_time,
-            shift_end=attendance.shift.end_time,
-            attendance_type=attendance.attendance_type,
-            minutes_late=attendance.minutes_late,
-            attendance_timestamp=attendance.timestamp,
-        ).model_dump(by_alias=True)
-        for attendance in attendances.items
-    ]
-
-    fieldnames = list(data[0].keys()) if data else []
-
-    buffer = io.StringIO()
-
-    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(data)
-
-    buffer.seek(0)
+    def generate_csv():
+        # The request session is closed before the response is streamed, so the
+        # rows are read with a session that lives as long as the stream.
+        with Session(engine) as stream_session:
+            rows = crud.stream_attendance_csv_rows(
+                session=stream_session,
+                user_id=user_id,
+                attendance_type=attendance_type,
+                start_timestamp=start_timestamp,
+                end_timestamp=end_timestamp,
+                chunk_size=settings.CSV_CHUNK_SIZE,
+            )
+            yield from iter_csv(AttendanceCsvLine, rows)
 
     return StreamingResponse(
-        iter([buffer.getvalue()]),
+        generate_csv(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=attendances.csv"},
     )
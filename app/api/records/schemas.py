@@ -1,10 +1,12 @@
 from datetime import date, datetime, time
+from typing import NamedTuple, Self
 
-from pydantic import Field
+from pydantic import AwareDatetime, Field, field_serializer, model_validator
 
-from app.api.shifts.schemas import ShiftResponse
+from app.api.app_config.schemas import RoleResponse
+from app.api.shifts.schemas import ShiftBase, ShiftResponse
 from app.core.models import AttendanceType, WeekdayEnum
-from app.core.schemas import BaseSchema
+from app.core.schemas import BaseSchema, Page, ResponseEmail
 
 
 class AttendanceBase(BaseSchema):
@@ -19,6 +21,33 @@ class AttendanceCreate(AttendanceBase):
     pass
 
 
+class AttendanceEvent(BaseSchema):
+    attendance_type: AttendanceType = Field(
+        description="The type of attendance. "
+        "It can be 0 for clock in, or 1 for clock out."
+    )
+    timestamp: AwareDatetime = Field(
+        description="The datetime the attendance was recorded, with its offset."
+    )
+    shift_id: int | None = Field(
+        default=None,
+        description="The ID corresponding to the attendance's shift. "
+        "Required if user_id is not given.",
+    )
+    user_id: int | None = Field(
+        default=None,
+        description="The ID of the user, whose shift on the weekday of the "
+        "timestamp closest to it is the attendance's shift. "
+        "Required if shift_id is not given.",
+    )
+
+    @model_validator(mode="after")
+    def check_shift_or_user(self) -> Self:
+        if (self.shift_id is None) == (self.user_id is None):
+            raise ValueError("Informe apenas um entre o turno e o usuário do registro.")
+        return self
+
+
 class AttendanceResponse(AttendanceBase):
     id: int = Field(description="The attendance id.")
     timestamp: datetime = Field(description="The datetime of the attendance.")
@@ -68,9 +97,107 @@ class AbsenceResponse(BaseSchema):
     )
 
 
-class ShiftDate(BaseSchema):
-    day: date
+class IncludedShift(ShiftBase):
+    id: int = Field(description="The shift id.")
+    user_id: int = Field(description="The ID corresponding to the shift's user.")
+
+    @field_serializer("start_time", "end_time")
+    def serialize_time(self, value: time):
+        return value.replace(microsecond=0).isoformat()
+
+
+class IncludedUser(BaseSchema):
+    id: int = Field(description="The user id.")
+    active: bool = Field(
+        description="False if the user should be hidden when returning absences."
+    )
+    email: ResponseEmail = Field(
+        description="The user's email, also used as the username when logging in."
+    )
+    name: str = Field(description="The user's full name.")
+    role_id: int | None = Field(
+        default=None, description="The ID corresponding to the user's role."
+    )
+
+
+class Included(BaseSchema):
+    shifts: dict[int, IncludedShift] = Field(
+        description="The shifts referenced by the items, by id."
+    )
+    users: dict[int, IncludedUser] = Field(
+        description="The users of the shifts, by id."
+    )
+    roles: dict[int, RoleResponse] = Field(description="The roles of the users, by id.")
+
+
+class CompactAttendanceResponse(AttendanceBase):
+    id: int = Field(description="The attendance id.")
+    timestamp: datetime = Field(description="The datetime of the attendance.")
+    minutes_late: int = Field(
+        description="The minutes the user was late clocking in or out. "
+        "If it's less than the AppConfig setting (mintues_late for clock in "
+        "and minutes_early for clock out), the value is saved as 0."
+    )
+
+
+class AttendanceEventResult(BaseSchema):
+    attendance: CompactAttendanceResponse | None = Field(
+        default=None, description="The recorded attendance, or null if it failed."
+    )
+    error: str | None = Field(
+        default=None, description="Why the attendance was not recorded."
+    )
+
+
+class CompactAttendancePage(Page[CompactAttendanceResponse]):
+    included: Included = Field(
+        description="The shifts, users and roles referenced by the items."
+    )
+
+
+class CompactAbsenceResponse(BaseSchema):
+    shift_id: int = Field(description="The ID corresponding to the absence's shift.")
+    day: date = Field(description="The date that attendance should have been recorded.")
+    absence_type: AttendanceType = Field(
+        description="The type of absence. It can be 0 for clock in, or 1 for clock out."
+    )
+    minutes_late: int | None = Field(
+        default=None,
+        description="The minutes the user was late clocking in or out. "
+        "If the value is different from null, the presence was recorded, but late.",
+    )
+    attendance_timestamp: datetime | None = Field(
+        default=None,
+        description="The time the attendance was recorded. "
+        "If the value is different from null, the presence was recorded, but late.",
+    )
+
+
+class CompactAbsences(BaseSchema):
+    items: list[CompactAbsenceResponse]
+    included: Included = Field(
+        description="The shifts, users and roles referenced by the items."
+    )
+
+
+class AbsenceRow(NamedTuple):
+    """
+    Lightweight absence, with the same fields as AbsenceResponse. The shift
+    response is shared by all absences of the same shift.
+    """
+
     shift: ShiftResponse
+    day: date
+    absence_type: AttendanceType
+    minutes_late: int | None = None
+    attendance_timestamp: datetime | None = None
+
+
+class AbsenceFilters(BaseSchema):
+    start_date: date
+    end_date: date
+    user_id: int | None = None
+    absence_type: AttendanceType | None = None
 
 
 class AbsenceCsvLine(BaseSchema):
@@ -91,3 +218,16 @@ class AttendanceCsvLine(BaseSchema):
     attendance_type: AttendanceType = Field(alias="Tipo")
     minutes_late: int | None = Field(alias="Minutos de Atraso")
     attendance_timestamp: datetime | None = Field(alias="Data/Hora da Presença")
+
+
+class RejectedCsvLine(BaseSchema):
+    line: int = Field(description="The line of the CSV file.")
+    error: str = Field(description="Why the line was not imported.")
+
+
+class AttendanceImportResult(BaseSchema):
+    imported: int = Field(description="The number of attendances imported.")
+    rejected: int = Field(description="The number of lines rejected.")
+    rejected_lines: list[RejectedCsvLine] = Field(
+        description="The first rejected lines and their errors."
+    )
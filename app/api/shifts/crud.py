@@ -1,13 +1,19 @@
+from collections.abc import Collection
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+from sqlalchemy.orm import contains_eager, selectinload
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.app_config import crud as app_config_crud
+from app.api.app_config import cache as app_config_cache
+from app.api.records import ledger
 from app.api.shifts.schemas import ShiftCreate, ShiftUpdate
 from app.api.users import crud as users_crud
 from app.core.crud import db_update, paginate
+from app.core.fields import load_fields
 from app.core.models import AttendanceType, Shift, User
+from app.core.schemas import CountMode
 
 
 def create_shift(
@@ -26,7 +32,7 @@ def create_shift(
 
     if commit:
         session.commit()
-        session.refresh(shift)
+        ledger.refresh_user(session, shift.user_id)
     return shift
 
 
@@ -34,6 +40,17 @@ def get_shift_by_id(session: Session, id: int):
     return session.get(Shift, id)
 
 
+async def get_shift_by_id_async(session: AsyncSession, id: int):
+    """
+    Gets a shift with its user and the user's role, as needed by `ShiftResponse`.
+    """
+    return await session.get(
+        Shift,
+        id,
+        options=[selectinload(Shift.user).selectinload(User.role)],  # type: ignore[arg-type]
+    )
+
+
 def update_user_timestamp(session: Session, user_id: int):
     user = users_crud.get_user_by_id(session, user_id)
     user.updated_shifts_at = datetime.now()
@@ -41,6 +58,7 @@ def update_user_timestamp(session: Session, user_id: int):
 
 
 def update_shift(session: Session, shift: Shift, shift_update: ShiftUpdate):
+    previous_user_id = shift.user_id
     user_id = shift.user_id
     if shift_update.user_id is not None:
         user_id = shift_update.user_id
@@ -50,6 +68,10 @@ def update_shift(session: Session, shift: Shift, shift_update: ShiftUpdate):
 
     shift_data = shift_update.model_dump(exclude_unset=True)
     db_update(session, shift, shift_data)
+
+    ledger.refresh_user(session, user_id)
+    if previous_user_id != user_id:
+        ledger.refresh_user(session, previous_user_id)
     return shift
 
 
@@ -66,8 +88,19 @@ def list_shifts(
     user_id: int | None = None,
     page: int | None = None,
     page_size: int | None = None,
+    cursor: str | None = None,
+    count: CountMode = "exact",
+    fields: Collection[str] | None = None,
 ):
-    statement = select(Shift).join(User)
+    # Loads the relationships serialized by `ShiftResponse` with the page
+    keyset = (Shift.id,)
+    options = load_fields(
+        Shift,
+        fields,
+        {"user": contains_eager(Shift.user).joinedload(User.role)},  # type: ignore[arg-type]
+        required=keyset,
+    )
+    statement = select(Shift).join(User).options(*options)
 
     statement = statement.where(User.active)
     if user_id is not None:
@@ -76,19 +109,44 @@ def list_shifts(
     if not (page and page_size):
         return list(session.exec(statement).all())
 
-    return paginate(query=statement, session=session, page=page, page_size=page_size)
+    return paginate(
+        query=statement,
+        session=session,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count=count,
+        filtered=user_id is not None,
+        keyset=keyset,
+    )
 
 
 def get_current_shift(
     session: Session, user: User, attendance_type: AttendanceType
 ) -> Shift | None:
-    app_config = app_config_crud.get_last_app_config(session)
-    if not app_config:
+    cached = app_config_cache.get_app_config(session)
+    if not cached:
         raise ValueError(
             "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
         )
+    return find_current_shift(cached.zone_info, user, attendance_type)
 
-    now = datetime.now(ZoneInfo(app_config.zone_info))
+
+async def get_current_shift_async(
+    session: AsyncSession, user: User, attendance_type: AttendanceType
+) -> Shift | None:
+    cached = await app_config_cache.get_app_config_async(session)
+    if not cached:
+        raise ValueError(
+            "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
+        )
+    return find_current_shift(cached.zone_info, user, attendance_type)
+
+
+def find_current_shift(
+    zone_info: ZoneInfo, user: User, attendance_type: AttendanceType
+) -> Shift | None:
+    now = datetime.now(zone_info)
     time_now = now.time()
     weekday = now.weekday()
     shifts = [shift for shift in user.shifts if shift.weekday == weekday]
@@ -10,12 +10,22 @@ from app.api.shifts.schemas import (
     UserCurrentShiftResponse,
 )
 from app.api.users import crud as users_crud
-from app.core.config import settings
 from app.core.crud import db_delete
-from app.core.deps import CurrentUserDep, PaginationDep, SessionDep, check_admin
+from app.core.deps import (
+    AsyncSessionDep,
+    FieldsQuery,
+    PaginationDep,
+    SessionDep,
+    TokenUserDep,
+    check_admin,
+    check_not_modified,
+)
 from app.core.exceptions import Forbidden, InternalServerError, NotFound
-from app.core.models import AttendanceType
+from app.core.fields import partial_model, select_fields
+from app.core.models import AttendanceType, Role, Shift, User
+from app.core.responses import model_json_response
 from app.core.schemas import Message, Page
+from app.core.table_versions import TableVersions
 
 router = APIRouter(prefix="/shifts", tags=["shifts"])
 
@@ -70,22 +80,36 @@ def delete_shift(session: SessionDep, shift_id: int) -> Message:
 def list_shifts(
     session: SessionDep,
     pagination: PaginationDep,
+    versions: Annotated[TableVersions, Depends(check_not_modified(Shift, User, Role))],
     user_id: int | None = None,
+    fields: FieldsQuery = None,
 ):
     """
     Get all shifts. Can be filtered by user id.
     Inactive user shifts will not be shown.
     """
+    selected = select_fields(ShiftResponse, fields)
     shifts = crud.list_shifts(
-        session, user_id=user_id, page=pagination.page, page_size=pagination.page_size
+        session,
+        user_id=user_id,
+        page=pagination.page,
+        page_size=pagination.page_size,
+        cursor=pagination.cursor,
+        count=pagination.count,
+        fields=selected,
+    )
+    item_type = partial_model(ShiftResponse, selected)
+    return model_json_response(
+        Page[item_type],  # type: ignore[valid-type]
+        shifts,
+        headers=versions.headers(),
     )
-    return shifts
 
 
 @router.get("/current", response_model=UserCurrentShiftResponse)
-def get_current_shift(
-    session: SessionDep,
-    current_user: CurrentUserDep,
+async def get_current_shift(
+    session: AsyncSessionDep,
+    current_user: TokenUserDep,
     user_id: int,
     attendance_type: Annotated[
         AttendanceType,
@@ -101,19 +125,15 @@ def get_current_shift(
     It may not return a shift if the user has no more shifts today
     or if they are clocking out without clocking in.
     """
-    is_admin = (
-        current_user.role is not None
-        and current_user.role.name == settings.ADMIN_ROLE_NAME
-    )
-    is_allowed = user_id == current_user.id or is_admin
+    is_allowed = user_id == current_user.id or current_user.is_admin
 
     if not is_allowed:
         raise Forbidden()
 
-    user = users_crud.get_user_by_id(session=session, id=user_id)
+    user = await users_crud.get_user_by_id_async(session=session, id=user_id)
     if not user:
         raise NotFound("Usuário não encontrado.")
-    shift = crud.get_current_shift(session, user, attendance_type)
+    shift = await crud.get_current_shift_async(session, user, attendance_type)
     shift_response = ShiftResponse.model_validate(shift) if shift else None
     if shift:
         return UserCurrentShiftResponse(message="OK", shift=shift_response)
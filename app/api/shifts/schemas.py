@@ -1,10 +1,10 @@
 from datetime import time
 
-from pydantic import EmailStr, Field, field_serializer
+from pydantic import Field, field_serializer
 
 from app.api.app_config.schemas import RoleResponse
 from app.core.models import WeekdayEnum
-from app.core.schemas import BaseSchema
+from app.core.schemas import BaseSchema, ResponseEmail
 
 
 class ShiftBase(BaseSchema):
@@ -25,7 +25,7 @@ class ShiftUserResponse(BaseSchema):
     active: bool = Field(
         description="False if the user should be hidden when returning absences."
     )
-    email: EmailStr = Field(
+    email: ResponseEmail = Field(
         description="The user's email, also used as the username when logging in."
     )
     name: str = Field(max_length=255, description="The user's full name.")
@@ -1,75 +1,178 @@
+from collections.abc import Collection
 from datetime import datetime
-from zoneinfo import ZoneInfo
 
-from sqlmodel import Session, select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.app_config import crud as app_config_crud
+from app.api.app_config import cache as app_config_cache
+from app.api.records import ledger
 from app.api.shifts import crud as shifts_crud
 from app.api.shifts.schemas import ShiftCreate
 from app.api.users.schemas import UserCreate, UserUpdate
-from app.core.crud import db_update, paginate
+from app.core import token_versions
+from app.core.config import settings
+from app.core.crud import db_delete, db_update, paginate
+from app.core.fields import load_fields
 from app.core.models import User
-from app.core.security import get_password_hash, verify_password
-
-
-def authenticate(session: Session, email: str, password: str):
-    db_user = get_user_by_email(session=session, email=email)
+from app.core.schemas import CountMode
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    get_password_hashes,
+    password_needs_rehash,
+    verify_password_async,
+)
+
+
+async def authenticate_async(session: AsyncSession, email: str, password: str):
+    """
+    Returns the user with the given credentials, with their role. Passwords hashed
+    with an outdated cost are rehashed.
+    """
+    db_user = await get_user_by_email_async(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.password):
+    if not await verify_password_async(password, db_user.password):
         return None
+
+    if password_needs_rehash(db_user.password):
+        db_user.password = await get_password_hash_async(password)
+        session.add(db_user)
+        await session.commit()
     return db_user
 
 
+def get_token_claims(user: User):
+    """
+    Returns the claims carried by the tokens of a user.
+    """
+    return {
+        "admin": user.role is not None and user.role.name == settings.ADMIN_ROLE_NAME,
+        "active": user.active,
+        "ver": user.token_version,
+    }
+
+
 def list_users(
     session: Session,
     page: int | None = None,
     page_size: int | None = None,
     search: str | None = None,
+    cursor: str | None = None,
+    count: CountMode = "exact",
+    fields: Collection[str] | None = None,
 ):
-    statement = select(User)
+    # Loads the relationships serialized by `UserResponse` with the page
+    keyset = (User.id,)
+    options = load_fields(
+        User,
+        fields,
+        {
+            "role": joinedload(User.role),  # type: ignore[arg-type]
+            "shifts": selectinload(User.shifts),  # type: ignore[arg-type]
+        },
+        required=keyset,
+    )
+    statement = select(User).options(*options)
     if search:
         statement = statement.where(User.name.ilike(f"%{search}%"))  # type: ignore[attr-defined]
 
-    return paginate(query=statement, session=session, page=page, page_size=page_size)
+    return paginate(
+        query=statement,
+        session=session,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count=count,
+        filtered=bool(search),
+        keyset=keyset,
+    )
 
 
 def get_user_by_id(session: Session, id: int):
     return session.get(User, id)
 
 
+async def get_user_by_id_async(session: AsyncSession, id: int):
+    """
+    Gets a user with its role and shifts, as needed by `ShiftResponse`.
+    """
+    return await session.get(
+        User,
+        id,
+        options=[
+            selectinload(User.role),  # type: ignore[arg-type]
+            selectinload(User.shifts),  # type: ignore[arg-type]
+        ],
+    )
+
+
 def get_user_by_email(session: Session, email: str | None):
     statement = select(User).where(User.email == email)
     session_user = session.exec(statement).first()
     return session_user
 
 
+async def get_user_by_email_async(session: AsyncSession, email: str | None):
+    """
+    Gets a user with its role, as needed by the token claims.
+    """
+    statement = (
+        select(User).where(User.email == email).options(selectinload(User.role))  # type: ignore[arg-type]
+    )
+    return (await session.exec(statement)).first()
+
+
+def list_users_by_emails(session: Session, emails: list[str]):
+    statement = select(User).where(col(User.email).in_(emails))
+    return list(session.exec(statement).all())
+
+
 def create_user(session: Session, user_create: UserCreate):
-    user = User.model_validate(
-        user_create.model_dump(exclude={"shifts"}),
-        update={"password": get_password_hash(user_create.password)},
+    return create_users(session, [user_create])[0]
+
+
+def create_users(session: Session, user_creates: list[UserCreate]):
+    """
+    Creates users in a single transaction, hashing their passwords in parallel.
+    """
+    hashed_passwords = get_password_hashes(
+        [user_create.password for user_create in user_creates]
     )
-    session.add(user)
-    session.flush()
-    session.refresh(user)
 
-    if user.id is None:
-        raise ValueError("User ID is None. Cannot associate shifts without a user ID.")
+    users = []
+    for user_create, hashed_password in zip(
+        user_creates, hashed_passwords, strict=True
+    ):
+        user = User.model_validate(
+            user_create.model_dump(exclude={"shifts"}),
+            update={"password": hashed_password},
+        )
+        session.add(user)
+        session.flush()
 
-    shifts = [
-        ShiftCreate(**shift.model_dump(), user_id=user.id)
-        for shift in user_create.shifts
-    ]
+        if user.id is None:
+            raise ValueError(
+                "User ID is None. Cannot associate shifts without a user ID."
+            )
+
+        shifts = [
+            ShiftCreate(**shift.model_dump(), user_id=user.id)
+            for shift in user_create.shifts
+        ]
+
+        for shift in shifts:
+            shifts_crud.create_shift(session, shift, commit=False)
+        users.append(user)
 
-    for shift in shifts:
-        shifts_crud.create_shift(session, shift, commit=False)
     session.commit()
-    return user
+    return users
 
 
 def update_user(session: Session, user: User, user_update: UserUpdate):
-    app_config = app_config_crud.get_last_app_config(session)
-    if not app_config:
+    cached = app_config_cache.get_app_config(session)
+    if not cached:
         raise ValueError(
             "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
         )
@@ -79,12 +182,11 @@ def update_user(session: Session, user: User, user_update: UserUpdate):
     if "password" in user_data:
         user_data["password"] = get_password_hash(user_data["password"])
 
-    user_data["updated_shifts_at"] = datetime.now(ZoneInfo(app_config.zone_info))
-
     if user.id is None:
         raise ValueError("User ID is None. Cannot associate shifts without a user ID.")
 
     if user_update.shifts:
+        user_data["updated_shifts_at"] = datetime.now(cached.zone_info)
         shifts_crud.delete_shifts(session, user.shifts, commit=False)
         shifts = [
             ShiftCreate(**shift.model_dump(), user_id=user.id)
@@ -93,5 +195,27 @@ def update_user(session: Session, user: User, user_update: UserUpdate):
         for shift in shifts:
             shifts_crud.create_shift(session, shift, commit=False, update_user=False)
 
+    # Changing the password or the claims of the user revokes their tokens
+    revoke_tokens = "password" in user_data or any(
+        field in user_data and user_data[field] != getattr(user, field)
+        for field in ("role_id", "active")
+    )
+    if revoke_tokens:
+        token_versions.revoke_user_tokens(session, user)
+
     db_update(session, user, user_data)
+    if user_update.shifts:
+        # Still holds the deleted shifts, as the session doesn't expire on commit
+        session.expire(user, ["shifts"])
+    if revoke_tokens:
+        token_versions.invalidate(user.id)
+    # Only the shifts change the user's absences, `active` is applied when reading
+    if user_update.shifts:
+        ledger.refresh_user(session, user.id)
     return user
+
+
+def delete_user(session: Session, user: User):
+    token_versions.revoke_user_tokens(session, user)
+    db_delete(session, user)
+    token_versions.invalidate(user.id)
@@ -6,23 +6,30 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from app.api.users import crud
 from app.core.config import settings
-from app.core.deps import SessionDep
+from app.core.deps import AsyncSessionDep
+from app.core.exceptions import Forbidden
 from app.core.schemas import Token
 from app.core.security import create_jwt_token
 
 
-def get_token(
-    session: SessionDep,
+async def get_token(
+    session: AsyncSessionDep,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ):
-    user = crud.authenticate(
+    user = await crud.authenticate_async(
         session=session, email=form_data.username, password=form_data.password
     )
     if not user:
         return None
+    if not user.active:
+        raise Forbidden("Usuário inativo.")
     access_token_expires = timedelta(minutes=settings.JWT_EXPIRATION_MINUTES)
     return Token(
-        access_token=create_jwt_token(user.id, expires_delta=access_token_expires)
+        access_token=create_jwt_token(
+            user.id,
+            expires_delta=access_token_expires,
+            claims=crud.get_token_claims(user),
+        )
     )
 
 
@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Body, Depends, Query
 
 from app.api.app_config import crud as app_config_crud
 from app.api.shifts import crud as shifts_crud
@@ -8,16 +8,27 @@ from app.api.shifts.schemas import ShiftResponse
 from app.api.users import crud
 from app.api.users.deps import TokenDep
 from app.api.users.schemas import UserCreate, UserResponse, UserUpdate
-from app.core.crud import db_delete
-from app.core.deps import CurrentUserDep, PaginationDep, SessionDep, check_admin
+from app.core.deps import (
+    CurrentUserAsyncDep,
+    FieldsQuery,
+    PaginationDep,
+    SessionDep,
+    TokenUserDep,
+    check_admin,
+    check_not_modified,
+)
 from app.core.exceptions import BadRequest, Forbidden, NotFound, Unauthorized
+from app.core.fields import partial_model, select_fields
+from app.core.models import Role, Shift, User
+from app.core.responses import model_json_response
 from app.core.schemas import Message, Page, Token
+from app.core.table_versions import TableVersions
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/login")
-def login(token: TokenDep) -> Token:
+async def login(token: TokenDep) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests.
 
@@ -31,7 +42,7 @@ def login(token: TokenDep) -> Token:
 
 
 @router.post("/login/swagger", include_in_schema=False)
-def login_swagger(token: TokenDep):
+async def login_swagger(token: TokenDep):
     """
     Used only by swagger.
     OAuth2 compatible token login, get an access token for future requests.
@@ -42,7 +53,7 @@ def login_swagger(token: TokenDep):
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user(current_user: CurrentUserDep):
+async def get_current_user(current_user: CurrentUserAsyncDep):
     """
     Get current authenticated user.
     """
@@ -68,6 +79,38 @@ def create_new_user(session: SessionDep, body: UserCreate):
     return user
 
 
+@router.post(
+    "/batch",
+    response_model=list[UserResponse],
+    dependencies=[Depends(check_admin)],
+)
+def create_new_users(
+    session: SessionDep,
+    body: Annotated[list[UserCreate], Body(min_length=1, max_length=500)],
+):
+    """
+    Create many users at once
+    """
+    emails = [user_create.email for user_create in body]
+    if len(set(emails)) < len(emails):
+        raise BadRequest("Há e-mails repetidos na lista de usuários.")
+
+    existing_users = crud.list_users_by_emails(session, emails)
+    if existing_users:
+        raise BadRequest(
+            f"Já existe um usuário com o e-mail {existing_users[0].email} no sistema."
+        )
+
+    role_ids = {
+        user_create.role_id for user_create in body if user_create.role_id is not None
+    }
+    for role_id in role_ids:
+        if not app_config_crud.get_role_by_id(session, role_id):
+            raise NotFound("Cargo não encontrado.")
+
+    return crud.create_users(session=session, user_creates=body)
+
+
 @router.get("/", response_model=Page[UserResponse], dependencies=[Depends(check_admin)])
 def list_users(
     session: SessionDep,
@@ -79,11 +122,23 @@ def list_users(
             "Enter part of the name to get matching results."
         ),
     ] = None,
+    fields: FieldsQuery = None,
 ):
     """
     Get a list with all users.
     """
-    return crud.list_users(session, pagination.page, pagination.page_size, search)
+    selected = select_fields(UserResponse, fields)
+    users = crud.list_users(
+        session,
+        pagination.page,
+        pagination.page_size,
+        search,
+        pagination.cursor,
+        pagination.count,
+        fields=selected,
+    )
+    item_type = partial_model(UserResponse, selected)
+    return model_json_response(Page[item_type], users)  # type: ignore[valid-type]
 
 
 @router.get(
@@ -91,28 +146,43 @@ def list_users(
     response_model=list[ShiftResponse],
     dependencies=[Depends(check_admin)],
 )
-def list_user_shifts(session: SessionDep, user_id: int):
+def list_user_shifts(
+    session: SessionDep,
+    user_id: int,
+    versions: Annotated[TableVersions, Depends(check_not_modified(Shift, User, Role))],
+    fields: FieldsQuery = None,
+):
     """
     Get user shifts
     """
+    selected = select_fields(ShiftResponse, fields)
     user = crud.get_user_by_id(session, user_id)
     if not user:
         raise NotFound("Usuário não encontrado.")
-    shifts = shifts_crud.list_shifts(session, user_id)
-    return shifts
+    shifts = shifts_crud.list_shifts(session, user_id, fields=selected)
+    item_type = partial_model(ShiftResponse, selected)
+    return model_json_response(
+        list[item_type],  # type: ignore[valid-type]
+        shifts,
+        headers=versions.headers(),
+    )
 
 
 @router.get(
     "/{user_id}", response_model=UserResponse, dependencies=[Depends(check_admin)]
 )
-def get_user(session: SessionDep, user_id: int):
+def get_user(
+    session: SessionDep,
+    user_id: int,
+    versions: Annotated[TableVersions, Depends(check_not_modified(User, Role, Shift))],
+):
     """
     Get user by id
     """
     user = crud.get_user_by_id(session, user_id)
     if not user:
         raise NotFound("Usuário não encontrado.")
-    return user
+    return model_json_response(UserResponse, user, headers=versions.headers())
 
 
 @router.patch(
@@ -141,7 +211,7 @@ def update_user(session: SessionDep, user_id: int, body: UserUpdate):
 
 @router.delete("/{user_id}", dependencies=[Depends(check_admin)])
 def delete_user(
-    session: SessionDep, user_id: int, current_user: CurrentUserDep
+    session: SessionDep, user_id: int, current_user: TokenUserDep
 ) -> Message:
     """
     Delete a user.
@@ -151,5 +221,5 @@ def delete_user(
         raise NotFound("Usuário não encontrado.")
     if user.id == current_user.id:
         raise Forbidden("Não é possível deletar a si mesmo")
-    db_delete(session, user)
+    crud.delete_user(session, user)
     return Message(message="Usuário deletado com sucesso")
@@ -4,7 +4,7 @@ from pydantic import EmailStr, Field, field_serializer
 
 from app.api.app_config.schemas import RoleResponse
 from app.api.shifts.schemas import ShiftBase
-from app.core.schemas import BaseSchema
+from app.core.schemas import BaseSchema, ResponseEmail
 
 
 class UserBase(BaseSchema):
@@ -28,6 +28,10 @@ class UserShiftResponse(ShiftBase):
 
 class UserResponse(UserBase):
     id: int = Field(description="The user id.")
+    email: ResponseEmail = Field(
+        description="The user's email, also used as the username when logging in.",
+        json_schema_extra={"maxLength": 255},
+    )
     shifts: list[UserShiftResponse] = Field(
         description="A list of UserShiftResponse schema, containing the user's shifts.",
     )
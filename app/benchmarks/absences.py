@@ -0,0 +1,215 @@
+"""
+Benchmark of the absence engine (`app.api.records.crud.compute_absences`).
+
+It runs against in-memory data, so no database is needed:
+
+    python -m app.benchmarks.absences --users 100 --days 30
+
+The previous implementation, which rescanned every attendance for each expected
+shift-day, is kept here as a reference to check that the output is identical and
+to measure the speedup.
+"""
+
+import argparse
+import random
+import time as timer
+from collections.abc import Callable, Sequence
+from datetime import date, datetime, time, timedelta
+
+from app.api.records.crud import compute_absences, list_dates
+from app.api.records.schemas import AbsenceResponse
+from app.core.models import (
+    Attendance,
+    AttendanceType,
+    DayOff,
+    Shift,
+    User,
+    WeekdayEnum,
+)
+
+
+def legacy_compute_absences(
+    start_date: date,
+    end_date: date,
+    shifts: Sequence[Shift],
+    days_off: Sequence[DayOff],
+    attendances: Sequence[Attendance],
+    absence_type: AttendanceType | None = None,
+):
+    dates = [
+        dt
+        for dt in list_dates(start_date, end_date)
+        if dt not in [day_off.day for day_off in days_off]
+    ]
+
+    shift_dates: list[tuple[date, Shift]] = []
+    for dt in dates:
+        for shift in shifts:
+            if (
+                dt.weekday() == shift.weekday
+                and dt >= shift.user.created_at.date()
+                and (
+                    shift.user.updated_shifts_at is None
+                    or dt >= shift.user.updated_shifts_at.date()
+                )
+            ):
+                shift_dates.append((dt, shift))
+
+    absences: list[AbsenceResponse] = []
+    for day, shift in shift_dates:
+        clock_in_ids = [
+            attendance.shift_id
+            for attendance in attendances
+            if day == attendance.timestamp.date()
+            and attendance.attendance_type == AttendanceType.CLOCK_IN
+        ]
+        clock_out_ids = [
+            attendance.shift_id
+            for attendance in attendances
+            if day == attendance.timestamp.date()
+            and attendance.attendance_type == AttendanceType.CLOCK_OUT
+        ]
+        for attendance_type, ids in (
+            (AttendanceType.CLOCK_IN, clock_in_ids),
+            (AttendanceType.CLOCK_OUT, clock_out_ids),
+        ):
+            if shift.id not in ids and absence_type in (None, attendance_type):
+                absences.append(
+                    AbsenceResponse.model_validate(
+                        {"shift": shift, "day": day, "absence_type": attendance_type}
+                    )
+                )
+
+    for attendance in attendances:
+        if attendance.minutes_late > 0:
+            absences.append(
+                AbsenceResponse.model_validate(
+                    {
+                        "shift": attendance.shift,
+                        "day": attendance.timestamp.date(),
+                        "absence_type": attendance.attendance_type,
+                        "attendance_timestamp": attendance.timestamp,
+                        "minutes_late": attendance.minutes_late,
+                    }
+                )
+            )
+
+    return absences
+
+
+def generate_data(users: int, shifts_per_user: int, days: int, presence: float):
+    """
+    Builds transient users, shifts, days off and attendances.
+    """
+    rng = random.Random(42)
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days - 1)
+
+    shifts: list[Shift] = []
+    shift_id = 0
+    for user_id in range(1, users + 1):
+        user = User(
+            id=user_id,
+            email=f"user{user_id}@example.com",
+            password="",
+            name=f"User {user_id}",
+            created_at=datetime.combine(start_date - timedelta(days=365), time()),
+        )
+        for weekday in rng.sample(range(7), k=min(shifts_per_user, 7)):
+            shift_id += 1
+            shift = Shift(
+                id=shift_id,
+                weekday=WeekdayEnum(weekday),
+                start_time=time(8),
+                end_time=time(12),
+                user_id=user_id,
+            )
+            shift.user = user
+            shifts.append(shift)
+
+    days_off = [
+        DayOff(id=i, day=day, description="")
+        for i, day in enumerate(list_dates(start_date, end_date))
+        if rng.random() < 0.05
+    ]
+
+    attendances: list[Attendance] = []
+    for day in list_dates(start_date, end_date):
+        for shift in shifts:
+            if shift.weekday != day.weekday():
+                continue
+            for attendance_type in AttendanceType:
+                if rng.random() < presence:
+                    attendance = Attendance(
+                        id=len(attendances) + 1,
+                        timestamp=datetime.combine(day, time(8)),
+                        minutes_late=rng.choice([0, 0, 0, 20]),
+                        attendance_type=attendance_type,
+                        shift_id=shift.id,
+                    )
+                    attendance.shift = shift
+                    attendances.append(attendance)
+
+    return start_date, end_date, shifts, days_off, attendances
+
+
+def measure[T](function: Callable[[], list[T]], repeat: int):
+    best = float("inf")
+    result: list[T] = []
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        result = function()
+        best = min(best, timer.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--shifts-per-user", type=int, default=5)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--presence", type=float, default=0.9)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="Only measure the current engine (the legacy one is very slow).",
+    )
+    args = parser.parse_args()
+
+    start_date, end_date, shifts, days_off, attendances = generate_data(
+        args.users, args.shifts_per_user, args.days, args.presence
+    )
+    print(
+        f"{len(shifts)} shifts, {len(days_off)} days off, "
+        f"{len(attendances)} attendances, {args.days} days"
+    )
+
+    elapsed, absences = measure(
+        lambda: list(
+            compute_absences(start_date, end_date, shifts, days_off, attendances)
+        ),
+        args.repeat,
+    )
+    print(f"indexed: {elapsed * 1000:10.1f} ms ({len(absences)} absences)")
+
+    if args.skip_legacy:
+        return
+
+    legacy_elapsed, legacy_absences = measure(
+        lambda: legacy_compute_absences(
+            start_date, end_date, shifts, days_off, attendances
+        ),
+        1,
+    )
+    print(f"legacy:  {legacy_elapsed * 1000:10.1f} ms")
+    print(f"speedup: {legacy_elapsed / elapsed:10.1f}x")
+
+    identical = [
+        AbsenceResponse(**absence._asdict()).model_dump() for absence in absences
+    ] == [absence.model_dump() for absence in legacy_absences]
+    print(f"identical output: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark of sync and async routes under concurrent requests.
+
+It serves an in-process copy of `GET /users/me` as a sync route, run in the
+threadpool, and as an async route, run in the event loop, against the database
+configured in the environment (the first admin must exist):
+
+    python -m app.benchmarks.async_routes --requests 2000 --concurrency 80
+
+`--db-latency` adds a `pg_sleep` to each request to simulate a slower database,
+which is when the threadpool saturates first. Both variants use their own pool
+with a connection per concurrent request: the sync route checks out a connection
+in one worker thread and waits for another one to run, so a smaller pool can
+starve the threadpool. With little database latency both variants are bound by
+the CPU, where the sync route is usually faster.
+"""
+
+import argparse
+import asyncio
+import time as timer
+from datetime import timedelta
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.users import crud as users_crud
+from app.api.users.schemas import UserResponse
+from app.core.config import settings
+from app.core.db import get_async_session, get_session
+from app.core.deps import (
+    AsyncSessionDep,
+    CurrentUserAsyncDep,
+    CurrentUserDep,
+    SessionDep,
+)
+from app.core.models import User
+from app.core.security import create_jwt_token
+
+
+def create_app(db_latency: float, pool_size: int):
+    app = FastAPI()
+    url = str(settings.SQLALCHEMY_DATABASE_URI)
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+    async_engine = create_async_engine(url, pool_size=pool_size, max_overflow=0)
+
+    def get_benchmark_session():
+        with Session(engine) as session:
+            yield session
+
+    async def get_benchmark_async_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_benchmark_session
+    app.dependency_overrides[get_async_session] = get_benchmark_async_session
+
+    @app.get("/sync", response_model=UserResponse)
+    def sync_route(session: SessionDep, current_user: CurrentUserDep):
+        if db_latency:
+            session.exec(select(func.pg_sleep(db_latency)))
+        return current_user
+
+    @app.get("/async", response_model=UserResponse)
+    async def async_route(session: AsyncSessionDep, current_user: CurrentUserAsyncDep):
+        if db_latency:
+            await session.exec(select(func.pg_sleep(db_latency)))
+        return current_user
+
+    return app, engine, async_engine
+
+
+async def measure(
+    client: httpx.AsyncClient,
+    path: str,
+    requests: int,
+    concurrency: int,
+    headers: dict[str, str],
+):
+    """
+    Returns the number of requests per second.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    start = timer.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    return requests / (timer.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace):
+    app, engine, async_engine = create_app(args.db_latency, args.concurrency)
+
+    with Session(engine) as session:
+        admin = session.exec(
+            select(User).where(User.email == settings.FIRST_ADMIN_EMAIL)
+        ).first()
+        if not admin:
+            raise ValueError(
+                "The first admin was not found, run `app.init_data` first."
+            )
+        token = create_jwt_token(
+            admin.id,
+            expires_delta=timedelta(minutes=10),
+            claims=users_crud.get_token_claims(admin),
+        )
+
+    headers = {"Authorization": f"Bearer {token}"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Warm up both pools
+        await measure(client, "/sync", args.concurrency, args.concurrency, headers)
+        sync_rate = await measure(
+            client, "/sync", args.requests, args.concurrency, headers
+        )
+        print(f"sync:    {sync_rate:10.1f} requests/s")
+        # Only one pool is open at a time, to stay within `max_connections`
+        engine.dispose()
+
+        await measure(client, "/async", args.concurrency, args.concurrency, headers)
+        async_rate = await measure(
+            client, "/async", args.requests, args.concurrency, headers
+        )
+        print(f"async:   {async_rate:10.1f} requests/s")
+        print(f"speedup: {async_rate / sync_rate:10.1f}x")
+
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=80)
+    parser.add_argument(
+        "--db-latency",
+        type=float,
+        default=0.01,
+        help="Seconds slept in the database by each request.",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Load test of clock-ins with and without the group commit of attendances.
+
+It sends concurrent `POST /records/attendances` requests for a shift of the first
+admin to the app, in process, against the database configured in the
+environment (the first admin must exist):
+
+    python -m app.benchmarks.group_commit --requests 2000 --concurrency 100
+
+Each variant reports the sustained clock-ins per second, and the group commit
+also its number of batches, their mean size and the mean time an attendance
+waited for its batch. The shift and its attendances are deleted at the end.
+"""
+
+import argparse
+import asyncio
+import time as timer
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import httpx
+from sqlmodel import Session, select
+
+from app.api.app_config import crud as app_config_crud
+from app.api.records import group_commit
+from app.api.users import crud as users_crud
+from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.models import AttendanceType, Shift, User, WeekdayEnum
+from app.core.security import create_jwt_token
+from app.main import app
+
+
+async def measure(
+    client: httpx.AsyncClient,
+    requests: int,
+    concurrency: int,
+    headers: dict[str, str],
+    shift_id: int,
+):
+    """
+    Returns the number of clock-ins per second.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    data = {"attendanceType": AttendanceType.CLOCK_IN, "shiftId": shift_id}
+
+    async def request():
+        async with semaphore:
+            response = await client.post(
+                "/records/attendances", json=data, headers=headers
+            )
+            response.raise_for_status()
+
+    start = timer.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    return requests / (timer.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace, shift_id: int, headers: dict[str, str]):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        rates = {}
+        for enabled in (False, True):
+            settings.ATTENDANCE_GROUP_COMMIT = enabled
+            # Warm up the pool
+            await measure(client, args.concurrency, args.concurrency, headers, shift_id)
+            batches, rows = group_commit.stats.batches, group_commit.stats.rows
+            queued = group_commit.stats.queued
+            latency = group_commit.stats.latency_seconds
+
+            name = "group commit" if enabled else "commit each"
+            rates[name] = await measure(
+                client, args.requests, args.concurrency, headers, shift_id
+            )
+            print(f"{name + ':':14}{rates[name]:10.1f} clock-ins/s")
+            if enabled:
+                batches = group_commit.stats.batches - batches
+                rows = group_commit.stats.rows - rows
+                queued = group_commit.stats.queued - queued
+                latency = group_commit.stats.latency_seconds - latency
+                print(
+                    f"{'':14}{batches} batches of {rows / batches:.1f} attendances, "
+                    f"{latency / queued * 1000:.1f}ms waited per attendance"
+                )
+
+        print(f"{'speedup:':14}{rates['group commit'] / rates['commit each']:10.1f}x")
+
+    await group_commit.drain()
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        admin = session.exec(
+            select(User).where(User.email == settings.FIRST_ADMIN_EMAIL)
+        ).first()
+        app_config = app_config_crud.get_last_app_config(session)
+        if not admin or admin.id is None or not app_config:
+            raise ValueError(
+                "The first admin was not found, run `app.init_data` first."
+            )
+
+        token = create_jwt_token(
+            admin.id,
+            expires_delta=timedelta(minutes=10),
+            claims=users_crud.get_token_claims(admin),
+        )
+        now = datetime.now(ZoneInfo(app_config.zone_info))
+        shift = Shift(
+            weekday=WeekdayEnum(now.weekday()),
+            start_time=time(0),
+            end_time=time(23, 59),
+            user_id=admin.id,
+        )
+        session.add(shift)
+        session.commit()
+        session.refresh(shift)
+
+        try:
+            headers = {"Authorization": f"Bearer {token}"}
+            asyncio.run(run(args, shift.id, headers))  # type: ignore[arg-type]
+        finally:
+            # Also deletes the attendances
+            session.delete(shift)
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of the login throughput at various bcrypt costs.
+
+Each login verifies a password, as `POST /users/login` does, in the password
+hashing pool. No database is needed:
+
+    python -m app.benchmarks.password_hashing --logins 64 --rounds 10 11 12 13
+
+The same logins are also verified one at a time in the calling thread, as they
+were before the pool, for reference. `--processes` overrides
+`PASSWORD_HASHING_PROCESSES`.
+"""
+
+import argparse
+import asyncio
+import time as timer
+
+from app.core import security
+from app.core.config import settings
+
+PASSWORD = "benchmark-password"
+
+
+async def measure_pool(hashed_password: str, logins: int):
+    """
+    Returns the number of logins per second.
+    """
+    start = timer.perf_counter()
+    await asyncio.gather(
+        *(
+            security.verify_password_async(PASSWORD, hashed_password)
+            for _ in range(logins)
+        )
+    )
+    return logins / (timer.perf_counter() - start)
+
+
+def measure_inline(hashed_password: str, logins: int):
+    start = timer.perf_counter()
+    for _ in range(logins):
+        security._check_password(PASSWORD, hashed_password)
+    return logins / (timer.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace):
+    if args.processes:
+        settings.PASSWORD_HASHING_PROCESSES = args.processes
+
+    # Starts the processes before measuring
+    await security.verify_password_async(PASSWORD, security._hash_password(PASSWORD, 4))
+
+    print(f"{'rounds':>6} {'inline logins/s':>16} {'pool logins/s':>14}")
+    for rounds in args.rounds:
+        hashed_password = security._hash_password(PASSWORD, rounds)
+        inline_rate = measure_inline(hashed_password, max(args.logins // 8, 1))
+        pool_rate = await measure_pool(hashed_password, args.logins)
+        print(f"{rounds:>6} {inline_rate:>16.1f} {pool_rate:>14.1f}")
+
+    security.shutdown_hashing_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--processes", type=int, default=None)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark of the serialization of a page of attendances.
+
+The page is built in memory from ORM objects, as `GET /records/attendances`
+returns it, so no database is needed:
+
+    python -m app.benchmarks.serialization --items 100 1000 --repeat 200
+
+FastAPI's default path (`serialize_response`, then `JSONResponse`) is compared
+with `app.core.responses.serialize_model`. If orjson is installed, the default
+path with orjson instead of `json.dumps` is also measured, for reference. Costs
+are reported in milliseconds per 100 items.
+"""
+
+import argparse
+import asyncio
+import json
+import time as timer
+from collections.abc import Callable
+from datetime import datetime, time, timedelta
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.api.records.schemas import AttendanceResponse
+from app.core.models import Attendance, AttendanceType, Role, Shift, User
+from app.core.responses import get_type_adapter, serialize_model
+from app.core.schemas import Page
+
+try:
+    import orjson  # type: ignore[import-not-found, unused-ignore]
+except ImportError:
+    orjson = None
+
+RESPONSE_TYPE = Page[AttendanceResponse]
+
+# Runs `serialize_response` as the app does, without a new event loop per call
+loop = asyncio.new_event_loop()
+
+
+def build_page(items: int):
+    role = Role(id=1, name="Professor")
+    attendances: list[Attendance] = []
+    start = datetime(2025, 3, 3, 8)
+    for user_id in range(1, items // 10 + 2):
+        user = User(
+            id=user_id,
+            email=f"user{user_id}@example.com",
+            password="",
+            name=f"User {user_id}",
+            role_id=role.id,
+            created_at=start - timedelta(days=365),
+        )
+        user.role = role
+        shift = Shift(
+            id=user_id,
+            weekday=0,
+            start_time=time(8),
+            end_time=time(12),
+            user_id=user_id,
+        )
+        shift.user = user
+        for day in range(10):
+            attendance = Attendance(
+                id=len(attendances) + 1,
+                timestamp=start + timedelta(days=day),
+                minutes_late=day % 3 * 10,
+                attendance_type=AttendanceType(day % 2),
+                shift_id=shift.id,
+            )
+            attendance.shift = shift
+            attendances.append(attendance)
+
+    attendances = attendances[:items]
+    return Page[Attendance](
+        items=attendances,
+        total_items=len(attendances),
+        total_pages=1,
+        current_page=1,
+        current_page_size=len(attendances),
+    )
+
+
+def serialize_default(page: Any) -> bytes:
+    field = create_model_field(
+        name="Response_list_attendances", type_=RESPONSE_TYPE, mode="serialization"
+    )
+    content = loop.run_until_complete(
+        serialize_response(field=field, response_content=page, is_coroutine=True)
+    )
+    return JSONResponse(content).body
+
+
+def serialize_orjson(page: Any) -> bytes:
+    assert orjson is not None
+    adapter = get_type_adapter(RESPONSE_TYPE)
+    value = adapter.validate_python(page, from_attributes=True)
+    return orjson.dumps(adapter.dump_python(value, mode="json", by_alias=True))
+
+
+def measure(serialize: Callable[[Any], bytes], page: Any, repeat: int) -> float:
+    """
+    Returns the milliseconds spent per 100 items.
+    """
+    start = timer.perf_counter()
+    for _ in range(repeat):
+        serialize(page)
+    elapsed = (timer.perf_counter() - start) / repeat
+    return elapsed * 1000 * 100 / max(len(page.items), 1)
+
+
+def run(args: argparse.Namespace):
+    methods: dict[str, Callable[[Any], bytes]] = {
+        "default": serialize_default,
+        "dump_json": lambda page: serialize_model(RESPONSE_TYPE, page),
+    }
+    if orjson is not None:
+        methods["orjson"] = serialize_orjson
+
+    print(f"{'items':>6} " + " ".join(f"{name + ' ms':>13}" for name in methods))
+    for items in args.items:
+        page = build_page(items)
+        outputs = {name: serialize(page) for name, serialize in methods.items()}
+        expected = json.loads(outputs["default"])
+        for name, output in outputs.items():
+            assert json.loads(output) == expected, f"{name} differs from default"
+
+        costs = [
+            measure(serialize, page, args.repeat) for serialize in methods.values()
+        ]
+        print(f"{items:>6} " + " ".join(f"{cost:>13.3f}" for cost in costs))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
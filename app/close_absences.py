@@ -0,0 +1,33 @@
+import argparse
+import logging
+from datetime import date
+
+from sqlmodel import Session
+
+from app.api.records import ledger
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Close the absences of the days up to yesterday."
+    )
+    parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        default=None,
+        help="Rebuild the absence ledger from this date (YYYY-MM-DD).",
+    )
+    args = parser.parse_args()
+
+    logger.info("Closing absences")
+    with Session(engine) as session:
+        closed_until = ledger.close_absences(session, start_date=args.start)
+    logger.info(f"Absences closed until {closed_until}")
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,16 @@ class Settings(BaseSettings):
     JWT_SECRET: str = secrets.token_urlsafe(32)
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_MINUTES: int = 60 * 24 * 8
+    # Seconds the token version of a user is cached by each process. Tokens
+    # revoked through the API are rejected immediately, this is only a fallback.
+    TOKEN_VERSION_CACHE_SECONDS: int = 300
+
+    # Passwords
+    # Cost of the new bcrypt hashes. Passwords hashed with another cost are
+    # rehashed when their users log in.
+    BCRYPT_ROUNDS: int = 12
+    # Processes that hash and verify passwords, half of the CPUs by default
+    PASSWORD_HASHING_PROCESSES: int | None = None
 
     # First admin settings
     ADMIN_ROLE_NAME: str = "admin"
@@ -50,6 +60,35 @@ class Settings(BaseSettings):
     DEFAULT_MINUTES_EARLY: int = 15
     DEFAULT_MINUTES_LATE: int = 15
 
+    # Absences
+    # "python" computes absences in the application from the loaded shifts and
+    # attendances, "sql" computes them in a single PostgreSQL query and "ledger"
+    # reads the days closed by `app.close_absences` from the `absence` table.
+    ABSENCES_BACKEND: Literal["python", "sql", "ledger"] = "python"
+    # Maximum number of days between the dates of an absences request
+    ABSENCES_MAX_DAYS: int = 90
+    ABSENCES_LEDGER_MAX_DAYS: int = 366
+    # Number of absence results cached by each process, and of absence rows in all
+    # of them. Results with more rows are not cached.
+    ABSENCES_CACHE_SIZE: int = 128
+    ABSENCES_CACHE_MAX_ROWS: int = 50_000
+
+    # Number of rows written to each chunk of the CSV exports
+    CSV_CHUNK_SIZE: int = 1000
+
+    # Seconds the app config is cached by each process. Changes made through the
+    # API are propagated immediately, this is only a fallback.
+    APP_CONFIG_CACHE_SECONDS: int = 300
+
+    # Number of monthly attendance partitions created ahead of the current month
+    ATTENDANCE_PARTITION_MONTHS_AHEAD: int = 3
+    # Inserts the attendances created by concurrent requests together, waiting up
+    # to ATTENDANCE_GROUP_COMMIT_WINDOW seconds for more of them, in batches of at
+    # most ATTENDANCE_GROUP_COMMIT_MAX_SIZE attendances.
+    ATTENDANCE_GROUP_COMMIT: bool = False
+    ATTENDANCE_GROUP_COMMIT_WINDOW: float = 0.005
+    ATTENDANCE_GROUP_COMMIT_MAX_SIZE: int = 500
+
     # Postgres
     POSTGRES_SERVER: str
     POSTGRES_PORT: int
@@ -57,6 +96,24 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
 
+    # Connection pools of the sync and the async engines. Each process opens up to
+    # the sum of the four limits, 20 by default, plus one connection for the
+    # notification listener, so 4 workers stay below the 100 max_connections of a
+    # default Postgres. Sync routes beyond the limit wait for a connection.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_ASYNC_POOL_SIZE: int = 5
+    DB_ASYNC_MAX_OVERFLOW: int = 5
+    # Seconds to wait for a connection before failing the request
+    DB_POOL_TIMEOUT: float = 30.0
+    # Seconds after which a connection is replaced, -1 to keep them forever
+    DB_POOL_RECYCLE: int = 1800
+    # Tests each connection on checkout, discarding those closed by the server
+    DB_POOL_PRE_PING: bool = True
+    # Disables prepared statements, which PgBouncer can't route in transaction
+    # pooling mode
+    DB_PGBOUNCER: bool = False
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
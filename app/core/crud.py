@@ -1,18 +1,36 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
 from typing import Any
 
-from sqlmodel import Session, SQLModel, func, select
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import object_mapper
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlmodel import Session, SQLModel, asc, desc, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.sql.expression import SelectOfScalar
 
 from app.core.config import settings
+from app.core.exceptions import BadRequest
 from app.core.models import AppConfig, Role, User
-from app.core.schemas import Page, T
+from app.core.schemas import CountMode, Page, T
 from app.core.security import get_password_hash
 
 
 def db_insert(session: Session, instance: SQLModel):
+    # The values generated by the database are loaded by the INSERT itself, from
+    # its RETURNING clause (see `ModelBase`)
     session.add(instance)
     session.commit()
-    session.refresh(instance)
+
+
+async def db_insert_async(session: AsyncSession, instance: SQLModel):
+    session.add(instance)
+    await session.commit()
 
 
 def db_update(session: Session, instance: SQLModel, data: dict[str, Any]):
@@ -20,6 +38,16 @@ def db_update(session: Session, instance: SQLModel, data: dict[str, Any]):
         setattr(instance, key, value)
     db_insert(session, instance)
 
+    # Instances are not expired on commit, so the relationships of the changed
+    # foreign keys are expired to be loaded again when accessed
+    relationships = [
+        relationship.key
+        for relationship in object_mapper(instance).relationships
+        if any(column.key in data for column in relationship.local_columns)
+    ]
+    if relationships:
+        session.expire(instance, relationships)
+
 
 def db_delete(session: Session, instance: SQLModel):
     session.delete(instance)
@@ -71,43 +99,164 @@ def populate_app_config(session: Session):
     return app_config
 
 
+def encode_cursor(item: Any, keyset: Sequence[Any]) -> str:
+    """
+    Encodes the keyset values of an item as an opaque cursor.
+    """
+    values = [getattr(item, column.key) for column in keyset]
+    data = TypeAdapter(list[Any]).dump_json(values)
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor: str, keyset: Sequence[Any]) -> list[Any]:
+    """
+    Decodes a cursor created by `encode_cursor`, validating each value against the
+    type of its keyset column.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list):
+            raise ValueError
+        return [
+            TypeAdapter(column.type.python_type).validate_python(value)
+            for column, value in zip(keyset, values, strict=True)
+        ]
+    except (binascii.Error, UnicodeError, ValueError, ValidationError):
+        raise BadRequest("Cursor inválido.") from None
+
+
+class Explain(Executable, ClauseElement):
+    """
+    `EXPLAIN (FORMAT JSON)` of a statement, compiled with the statement's own
+    bind parameters.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: Any):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element: Explain, compiler: SQLCompiler, **kw: Any):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def estimate_items(session: Session, query: SelectOfScalar[Any]) -> int:
+    """
+    Returns the number of rows the planner expects the query to return. It is
+    cheap and accurate enough for unfiltered lists, but can be far off for
+    selective filters.
+    """
+    plan = session.connection().execute(Explain(query)).scalar_one()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_items(
+    session: Session, query: SelectOfScalar[Any], count: CountMode = "exact"
+) -> int | None:
+    if count == "none":
+        return None
+    if count == "estimated":
+        return estimate_items(session, query)
+
+    total_items = session.scalar(select(func.count()).select_from(query.subquery()))
+    assert isinstance(total_items, int), (
+        "A database error occurred when getting `total_items`"
+    )
+    return total_items
+
+
 def paginate(
     query: SelectOfScalar[T],  # SQLModel select query
     session: Session,
     page: int | None = None,
     page_size: int | None = None,
+    cursor: str | None = None,
+    keyset: Sequence[Any] | None = None,
+    descending: bool = False,
+    count: CountMode = "exact",
+    filtered: bool = False,
 ) -> Page[T]:
-    total_items = session.scalar(select(func.count()).select_from(query.subquery()))
-    assert isinstance(total_items, int), (
-        "A database error occurred when getting `total_items`"
-    )
+    """
+    Paginates a query using `OFFSET/LIMIT` or, when a `cursor` is given, the
+    `keyset` columns. The keyset must uniquely identify each row (e.g. end with the
+    primary key) and the query is ordered by it.
+
+    `count` chooses how `total_items` is computed:
+    - "exact": a separate `count(*)` query.
+    - "exact-single-trip": `count(*) OVER ()` in the page query. Cursor pages and
+      out-of-bounds pages fall back to "exact".
+    - "estimated": the planner row estimate. It can be far off for selective
+      filters, so `filtered` queries fall back to "exact".
+    - "none": not computed, `total_items` and `total_pages` are null.
+    """
+    if count == "estimated" and filtered:
+        count = "exact"
+
+    if keyset:
+        direction = desc if descending else asc
+        query = query.order_by(*(direction(column) for column in keyset))
 
     if not (page and page_size):
         # Fetch the all items
-        items = list(session.exec(query).all())
+        all_items = list(session.exec(query).all())
         return Page[T](
-            items=items,
-            total_items=total_items,
+            items=all_items,
+            total_items=len(all_items),
             total_pages=1,
-            current_page_size=len(items),
+            current_page_size=len(all_items),
             current_page=1,
         )
 
-    # Handle out-of-bounds page requests by going to the last page instead of displaying
-    # empty data.
-    total_pages = (total_items + page_size - 1) // page_size
-    # we don't want to have 0 page even if there is no item.
-    total_pages = max(total_pages, 1)
-    current_page = min(page, total_pages)
+    seeking = bool(keyset and cursor)
+    offset = (page - 1) * page_size
+    items: list[T] | None = None
+
+    if count == "exact-single-trip" and not seeking:
+        windowed = query.add_columns(func.count().over()).offset(offset)
+        # Fetch one extra item to know whether there is a next page
+        rows = session.execute(windowed.limit(page_size + 1)).all()
+        if rows:
+            items = [row[0] for row in rows]
+            total_items = rows[0][1]
+        else:
+            total_items = count_items(session, query)
+    else:
+        total_items = count_items(
+            session, query, "exact" if count == "exact-single-trip" else count
+        )
 
-    # Calculate the offset for pagination
-    offset = (current_page - 1) * page_size
+    total_pages = None
+    current_page: int | None = page
+    if total_items is not None:
+        # we don't want to have 0 page even if there is no item.
+        total_pages = max((total_items + page_size - 1) // page_size, 1)
+        if count != "estimated":
+            # Handle out-of-bounds page requests by going to the last page instead of
+            # displaying empty data.
+            current_page = min(page, total_pages)
 
-    # Apply limit and offset to the query
-    result = session.exec(query.offset(offset).limit(page_size))
+    if seeking:
+        assert keyset and cursor
+        # Seek past the last item of the previous page instead of skipping rows, so
+        # every page costs the same as the first one.
+        values = decode_cursor(cursor, keyset)
+        key = tuple_(*keyset)
+        query = query.where(key < tuple(values) if descending else key > tuple(values))
+        items = list(session.exec(query.limit(page_size + 1)).all())
+        current_page = None  # unknown when seeking by cursor
+    elif items is None or current_page != page:
+        assert current_page is not None
+        offset = (current_page - 1) * page_size
+        result = session.exec(query.offset(offset).limit(page_size + 1))
+        items = list(result.all())
 
-    # Fetch the paginated items
-    items = list(result.all())
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        if keyset:
+            next_cursor = encode_cursor(items[-1], keyset)
 
     # Return the paginated response using the Page model
     return Page[T](
@@ -116,4 +265,5 @@ def paginate(
         total_pages=total_pages,
         current_page_size=len(items),  # can differ from the requested page_size
         current_page=current_page,  # can differ from the requested page
+        next_cursor=next_cursor,
     )
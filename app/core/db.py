@@ -1,13 +1,53 @@
+from typing import Any
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
 from app.core.crud import create_admin_role, create_first_admin, populate_app_config
+from app.core.metrics import PoolStats, instrumented_pool
+from app.core.partitions import create_attendance_partitions
+
+
+def engine_options(pool_size: int, max_overflow: int) -> dict[str, Any]:
+    options: dict[str, Any] = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.DB_PGBOUNCER:
+        options["connect_args"] = {"prepare_threshold": None}
+    return options
+
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=instrumented_pool(QueuePool, PoolStats()),
+    **engine_options(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+)
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=instrumented_pool(AsyncAdaptedQueuePool, PoolStats()),
+    **engine_options(settings.DB_ASYNC_POOL_SIZE, settings.DB_ASYNC_MAX_OVERFLOW),
+)
 
 
 def get_session():
-    with Session(engine) as session:
+    # Instances are not expired on commit, so returning them after a write doesn't
+    # reload them. Their generated values come from RETURNING (see `ModelBase`),
+    # and writes expire the relationships they replace (see `db_update`).
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_session():
+    # Attributes can't be lazy loaded with an async session, so instances are not
+    # expired on commit and relationships must be loaded explicitly.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
 
 
@@ -15,3 +55,4 @@ def init_db(session: Session):
     create_admin_role(session)
     create_first_admin(session=session)
     populate_app_config(session=session)
+    create_attendance_partitions(session=session)
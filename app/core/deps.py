@@ -1,26 +1,37 @@
 from typing import Annotated
 
 import jwt
-from fastapi import Depends
+from fastapi import Depends, Query, Request
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import ValidationError
-from sqlmodel import Session
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core import token_versions
 from app.core.config import settings
-from app.core.db import get_session
-from app.core.exceptions import Forbidden, Unauthorized
+from app.core.db import get_async_session, get_session
+from app.core.exceptions import Forbidden, NotModified, Unauthorized
 from app.core.models import User
-from app.core.schemas import PaginationParams, TokenPayload
+from app.core.responses import is_not_modified
+from app.core.schemas import PaginationParams, TokenPayload, TokenUser
+from app.core.table_versions import TableVersions, get_table_versions
 
 PaginationDep = Annotated[PaginationParams, Depends()]
+FieldsQuery = Annotated[
+    str | None,
+    Query(
+        description="Comma separated fields of the items to return, e.g. "
+        "`id,name`. Only those fields are loaded. All fields by default."
+    ),
+]
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login/swagger", auto_error=False)
 
 
-def get_current_user(
-    session: SessionDep, token: Annotated[str, Depends(oauth2_scheme)]
-):
+def decode_token(token: str | None) -> TokenPayload:
     if not token:
         raise Unauthorized()
     try:
@@ -30,20 +41,96 @@ def get_current_user(
         token_data = TokenPayload(**payload)
     except (jwt.InvalidTokenError, ValidationError):
         raise Unauthorized("Não foi possível validar as credenciais")
+
+    if token_data.sub is None or token_data.ver is None:
+        raise Unauthorized("Não foi possível validar as credenciais")
+    if not token_data.active:
+        raise Forbidden("Usuário inativo.")
+    return token_data
+
+
+def check_token_version(token_data: TokenPayload, version: int):
+    # The user changed since the token was created, so its claims are outdated
+    if version != token_data.ver:
+        raise Unauthorized("Não foi possível validar as credenciais")
+
+
+async def get_token_user(
+    session: AsyncSessionDep, token: Annotated[str, Depends(oauth2_scheme)]
+):
+    """
+    Authenticates the user from the claims of their token, without loading the
+    user. Only the token version is checked, usually from the cache.
+    """
+    token_data = decode_token(token)
+    try:
+        user_id = int(token_data.sub)  # type: ignore[arg-type]
+    except ValueError:
+        raise Unauthorized("Não foi possível validar as credenciais")
+
+    version = await token_versions.get_token_version(session, user_id)
+    if version is None:
+        raise Unauthorized("Usuário não encontrado.")
+    check_token_version(token_data, version)
+    return TokenUser(id=user_id, is_admin=token_data.admin)
+
+
+def get_current_user(
+    session: SessionDep, token: Annotated[str, Depends(oauth2_scheme)]
+):
+    token_data = decode_token(token)
     user = session.get(User, token_data.sub)
     if not user:
         raise Unauthorized("Usuário não encontrado.")
+    check_token_version(token_data, user.token_version)
     return user
 
 
+async def get_current_user_async(
+    session: AsyncSessionDep, token: Annotated[str, Depends(oauth2_scheme)]
+):
+    """
+    Same as `get_current_user`, for async routes. The role and the shifts of the
+    user are loaded with it.
+    """
+    token_data = decode_token(token)
+    user = await session.get(
+        User,
+        token_data.sub,
+        options=[
+            selectinload(User.role),  # type: ignore[arg-type]
+            selectinload(User.shifts),  # type: ignore[arg-type]
+        ],
+    )
+    if not user:
+        raise Unauthorized("Usuário não encontrado.")
+    check_token_version(token_data, user.token_version)
+    return user
+
+
+TokenUserDep = Annotated[TokenUser, Depends(get_token_user)]
 CurrentUserDep = Annotated[User, Depends(get_current_user)]
+CurrentUserAsyncDep = Annotated[User, Depends(get_current_user_async)]
 
 
-def check_admin(current_user: CurrentUserDep):
-    if (
-        current_user.role is not None
-        and current_user.role.name == settings.ADMIN_ROLE_NAME
-    ):
+async def check_admin(token_user: TokenUserDep):
+    if token_user.is_admin:
         return True
 
     raise Forbidden()
+
+
+def check_not_modified(*models: type[SQLModel]):
+    """
+    Returns a dependency that answers a conditional GET with 304, before the route
+    loads anything, if none of the tables of the models changed. Otherwise it
+    returns their versions, whose headers the response should carry.
+    """
+
+    def dependency(request: Request, session: SessionDep) -> TableVersions:
+        versions = get_table_versions(session, models)
+        if is_not_modified(request, versions.etag, versions.last_modified):
+            raise NotModified(versions.headers())
+        return versions
+
+    return dependency
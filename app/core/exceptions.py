@@ -1,4 +1,4 @@
-from fastapi import status
+from fastapi import HTTPException, status
 
 
 class BaseHTTPException(Exception):
@@ -51,3 +51,14 @@ class BadRequest(BaseHTTPException):
     def __init__(self, message: str = "Usuário não autenticado"):
         """Bad request (HTTP 400)."""
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, message=message)
+
+
+class NotModified(HTTPException):
+    """
+    Exception for a conditional GET of a representation the client already has.
+    FastAPI answers it without a body.
+    """
+
+    def __init__(self, headers: dict[str, str]):
+        """Not modified (HTTP 304)."""
+        super().__init__(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
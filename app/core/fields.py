@@ -0,0 +1,99 @@
+"""
+Sparse fieldsets, selected with the `fields` query parameter of list endpoints.
+
+`fields` is a comma separated list of the fields of the items, e.g.
+`fields=id,timestamp,attendanceType`. The crud functions load only the columns
+and relationships of the selected fields (see `load_fields`), and the items are
+validated and serialized with a copy of the response model restricted to them
+(see `partial_model`), so the other attributes are never read.
+"""
+
+import functools
+from collections.abc import Collection, Mapping, Sequence
+from typing import Any
+
+from pydantic import create_model, field_serializer
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.interfaces import ORMOption
+
+from app.core.exceptions import BadRequest
+from app.core.schemas import BaseSchema
+
+
+def select_fields(model: type[BaseSchema], fields: str | None) -> frozenset[str] | None:
+    """
+    Returns the names of the model fields selected by their aliases, or None if
+    every field should be returned.
+    """
+    if not fields:
+        return None
+
+    names = {field.alias or name: name for name, field in model.model_fields.items()}
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in names]
+    if unknown:
+        raise BadRequest(f"Campos inválidos: {', '.join(unknown)}.")
+    return frozenset(names[field] for field in selected)
+
+
+@functools.cache
+def partial_model(
+    model: type[BaseSchema], names: frozenset[str] | None
+) -> type[BaseSchema]:
+    """
+    Returns a copy of the model with only the given fields, keeping their field
+    serializers.
+    """
+    if names is None:
+        return model
+
+    fields: dict[str, Any] = {
+        name: (field.annotation, field)
+        for name, field in model.model_fields.items()
+        if name in names
+    }
+    serializers = {}
+    for name, decorator in model.__pydantic_decorators__.field_serializers.items():
+        info = decorator.info
+        selected = [field for field in info.fields if field in names]
+        if selected:
+            serializers[name] = field_serializer(
+                *selected,
+                mode=info.mode,
+                return_type=info.return_type,
+                when_used=info.when_used,
+            )(decorator.func)
+
+    return create_model(
+        model.__name__,
+        __base__=BaseSchema,
+        __validators__=serializers,
+        **fields,
+    )
+
+
+def load_fields(
+    entity: Any,
+    names: Collection[str] | None,
+    relationships: Mapping[str, ORMOption],
+    required: Sequence[Any] = (),
+) -> list[ORMOption]:
+    """
+    Returns the loader options of an entity for the selected fields: only their
+    columns and the options of the selected relationships. The `required`
+    columns, e.g. the keyset of the pagination, are always loaded. Without a
+    selection, every column and relationship is loaded.
+    """
+    if names is None:
+        return list(relationships.values())
+
+    columns = [
+        getattr(entity, column.key)
+        for column in inspect(entity).column_attrs
+        if column.key in names
+    ]
+    return [
+        load_only(*columns, *required),
+        *(option for name, option in relationships.items() if name in names),
+    ]
@@ -0,0 +1,303 @@
+"""
+Connection pool, cache and group commit metrics, exported in the Prometheus text
+format by `GET /metrics`.
+
+The engines in `app.core.db` use the pool classes returned by `instrumented_pool`,
+which record how long each checkout waited for a connection and how many timed
+out. The checked out connections and the overflow are read from the pools when
+the metrics are rendered. Caches record their hits, misses and evictions in a
+`CacheStats`, and group commits their batches and latencies in a
+`GroupCommitStats`.
+"""
+
+import bisect
+import threading
+import time as timer
+from dataclasses import dataclass, field
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds, in seconds, of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+# Upper bounds of the group commit batch size and latency histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def record_bucket(buckets: list[int], bounds: tuple[float, ...], value: float):
+    index = bisect.bisect_left(bounds, value)
+    if index < len(bounds):
+        buckets[index] += 1
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+    wait_buckets: list[int] = field(default_factory=lambda: [0] * len(WAIT_BUCKETS))
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_checkout(self, wait: float):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds += wait
+            record_bucket(self.wait_buckets, WAIT_BUCKETS, wait)
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self.lock:
+            self.misses += 1
+
+
+@dataclass
+class GroupCommitStats:
+    batches: int = 0
+    failures: int = 0
+    size_buckets: list[int] = field(
+        default_factory=lambda: [0] * len(BATCH_SIZE_BUCKETS)
+    )
+    # Number of rows inserted through the batches, the sum of their sizes
+    rows: int = 0
+    # Number of attendances queued, whose latency was recorded
+    queued: int = 0
+    latency_seconds: float = 0.0
+    latency_buckets: list[int] = field(
+        default_factory=lambda: [0] * len(LATENCY_BUCKETS)
+    )
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_batch(self, size: int):
+        with self.lock:
+            self.batches += 1
+            self.rows += size
+            record_bucket(self.size_buckets, BATCH_SIZE_BUCKETS, size)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def record_latency(self, latency: float):
+        with self.lock:
+            self.queued += 1
+            self.latency_seconds += latency
+            record_bucket(self.latency_buckets, LATENCY_BUCKETS, latency)
+
+
+def format_metric(name: str, kind: str, description: str, samples: list[str]):
+    return [f"# HELP {name} {description}", f"# TYPE {name} {kind}", *samples]
+
+
+def format_histogram(
+    name: str,
+    labels: str,
+    bounds: tuple[float, ...],
+    buckets: list[int],
+    total: float,
+    count: int,
+):
+    """
+    Returns the samples of a histogram, from the non-cumulative counts of its
+    buckets. Values above the last bound are only included in `count`.
+    """
+    bucket_labels = f"{labels}," if labels else ""
+    labels = f"{{{labels}}}" if labels else ""
+    samples = []
+    cumulative = 0
+    for bound, bucket in zip(bounds, buckets, strict=True):
+        cumulative += bucket
+        samples.append(f'{name}_bucket{{{bucket_labels}le="{bound}"}} {cumulative}')
+    samples.append(f'{name}_bucket{{{bucket_labels}le="+Inf"}} {count}')
+    samples.append(f"{name}_sum{labels} {total}")
+    samples.append(f"{name}_count{labels} {count}")
+    return samples
+
+
+def instrumented_pool(base: type[QueuePool], stats: PoolStats) -> type[QueuePool]:
+    """
+    Returns a subclass of `base` that records its checkouts in `stats`. The stats
+    are kept in the class, so they survive the pool being recreated on `dispose`.
+    """
+
+    class InstrumentedPool(base):  # type: ignore[valid-type,misc]
+        pool_stats = stats
+
+        def connect(self):
+            start = timer.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                self.pool_stats.record_timeout()
+                raise
+            self.pool_stats.record_checkout(timer.perf_counter() - start)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def render_pool_metrics(pools: dict[str, QueuePool]) -> str:
+    """
+    Renders the metrics of the given pools, labeled by their names.
+    """
+    lines = []
+
+    def metric(name: str, kind: str, description: str, samples: list[str]):
+        lines.extend(format_metric(name, kind, description, samples))
+
+    pools_stats = {
+        name: pool.pool_stats  # type: ignore[attr-defined]
+        for name, pool in pools.items()
+    }
+
+    metric(
+        "db_pool_size",
+        "gauge",
+        "Number of connections kept open by the pool.",
+        [
+            f'db_pool_size{{pool="{name}"}} {pool.size()}'
+            for name, pool in pools.items()
+        ],
+    )
+    metric(
+        "db_pool_checked_out",
+        "gauge",
+        "Number of connections currently checked out.",
+        [
+            f'db_pool_checked_out{{pool="{name}"}} {pool.checkedout()}'
+            for name, pool in pools.items()
+        ],
+    )
+    metric(
+        "db_pool_overflow",
+        "gauge",
+        "Number of connections open beyond the pool size.",
+        [
+            f'db_pool_overflow{{pool="{name}"}} {max(pool.overflow(), 0)}'
+            for name, pool in pools.items()
+        ],
+    )
+    metric(
+        "db_pool_timeouts_total",
+        "counter",
+        "Number of checkouts that timed out waiting for a connection.",
+        [
+            f'db_pool_timeouts_total{{pool="{name}"}} {stats.timeouts}'
+            for name, stats in pools_stats.items()
+        ],
+    )
+
+    samples = []
+    for name, stats in pools_stats.items():
+        with stats.lock:
+            samples.extend(
+                format_histogram(
+                    "db_pool_checkout_wait_seconds",
+                    f'pool="{name}"',
+                    WAIT_BUCKETS,
+                    stats.wait_buckets,
+                    stats.wait_seconds,
+                    stats.checkouts,
+                )
+            )
+    metric(
+        "db_pool_checkout_wait_seconds",
+        "histogram",
+        "Time waited to check out a connection.",
+        samples,
+    )
+
+    return "\n".join(lines) + "\n"
+
+
+def render_cache_metrics(caches: dict[str, CacheStats]) -> str:
+    """
+    Renders the metrics of the given caches, labeled by their names.
+    """
+    lines = []
+    for name, kind, description, attribute in (
+        ("cache_hits_total", "counter", "Number of lookups served.", "hits"),
+        ("cache_misses_total", "counter", "Number of lookups computed.", "misses"),
+        ("cache_evictions_total", "counter", "Number of entries evicted.", "evictions"),
+        ("cache_size", "gauge", "Number of entries in the cache.", "size"),
+    ):
+        samples = [
+            f'{name}{{cache="{cache}"}} {getattr(stats, attribute)}'
+            for cache, stats in caches.items()
+        ]
+        lines.extend(format_metric(name, kind, description, samples))
+
+    return "\n".join(lines) + "\n"
+
+
+def render_group_commit_metrics(stats: GroupCommitStats) -> str:
+    """
+    Renders the metrics of the attendance group commit.
+    """
+    lines = []
+    with stats.lock:
+        lines.extend(
+            format_metric(
+                "attendance_group_commit_batches_total",
+                "counter",
+                "Number of batches inserted.",
+                [f"attendance_group_commit_batches_total {stats.batches}"],
+            )
+        )
+        lines.extend(
+            format_metric(
+                "attendance_group_commit_failures_total",
+                "counter",
+                "Number of attendances whose insert failed.",
+                [f"attendance_group_commit_failures_total {stats.failures}"],
+            )
+        )
+        lines.extend(
+            format_metric(
+                "attendance_group_commit_batch_size",
+                "histogram",
+                "Number of attendances inserted by each batch.",
+                format_histogram(
+                    "attendance_group_commit_batch_size",
+                    "",
+                    BATCH_SIZE_BUCKETS,
+                    stats.size_buckets,
+                    stats.rows,
+                    stats.batches,
+                ),
+            )
+        )
+        lines.extend(
+            format_metric(
+                "attendance_group_commit_latency_seconds",
+                "histogram",
+                "Time from queuing an attendance to its batch being committed.",
+                format_histogram(
+                    "attendance_group_commit_latency_seconds",
+                    "",
+                    LATENCY_BUCKETS,
+                    stats.latency_buckets,
+                    stats.latency_seconds,
+                    stats.queued,
+                ),
+            )
+        )
+
+    return "\n".join(lines) + "\n"
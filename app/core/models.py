@@ -1,15 +1,24 @@
-from datetime import UTC, date, datetime, time
+from datetime import date, datetime, time
 from enum import IntEnum
+from typing import Any, ClassVar
 
 from pydantic import EmailStr
-from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import DateTime, func, text
+from sqlmodel import Field, Index, Relationship, SQLModel
 
 
 class ModelBase(SQLModel):
+    # Loads the values generated by the database, like the timestamps below, from
+    # the RETURNING clause of the INSERT or UPDATE that writes them
+    __mapper_args__: ClassVar[dict[str, Any]] = {"eager_defaults": True}
+
     id: int | None = Field(default=None, primary_key=True)
-    created_at: datetime = Field(default=datetime.now(UTC))
+    # Set by the database when the row is inserted
+    created_at: datetime = Field(
+        default=None, sa_column_kwargs={"server_default": func.now()}
+    )
     updated_at: datetime | None = Field(
-        default=None, sa_column_kwargs={"onupdate": datetime.now(UTC)}
+        default=None, sa_column_kwargs={"onupdate": func.now()}
     )
     deleted_at: datetime | None = Field(default=None)
 
@@ -26,6 +35,8 @@ class User(ModelBase, table=True):
     name: str = Field(index=True)
     active: bool = Field(default=True)
     updated_shifts_at: datetime | None = Field(default=None)
+    # Incremented to revoke the user's tokens, whose claims became outdated
+    token_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     role_id: int | None = Field(
         default=None, foreign_key="role.id", nullable=True, ondelete="SET NULL"
     )
@@ -45,6 +56,8 @@ class WeekdayEnum(IntEnum):
 
 
 class Shift(ModelBase, table=True):
+    __table_args__ = (Index("ix_shift_user_id_weekday", "user_id", "weekday"),)
+
     weekday: WeekdayEnum
     start_time: time
     end_time: time
@@ -62,7 +75,24 @@ class AttendanceType(IntEnum):
 
 
 class Attendance(ModelBase, table=True):
-    timestamp: datetime
+    __table_args__ = (
+        Index("ix_attendance_shift_id_timestamp", "shift_id", "timestamp"),
+        # Attendances are inserted in timestamp order, so a BRIN index covers range
+        # scans on the whole table with a tiny footprint.
+        Index("ix_attendance_timestamp_brin", "timestamp", postgresql_using="brin"),
+        # Matches the keyset order of the pages, so each page reads only its rows
+        Index("ix_attendance_timestamp_id", text("timestamp DESC"), text("id DESC")),
+        # Partitioned by month, see `app.core.partitions`
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+    # The partition key must be part of the primary key, but attendances are still
+    # identified by their id alone.
+    __mapper_args__ = {**ModelBase.__mapper_args__, "primary_key": ["id"]}
+
+    id: int | None = Field(
+        default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}
+    )
+    timestamp: datetime = Field(primary_key=True)
     minutes_late: int
     attendance_type: AttendanceType
     shift_id: int = Field(foreign_key="shift.id", nullable=False, ondelete="CASCADE")
@@ -71,7 +101,7 @@ class Attendance(ModelBase, table=True):
 
 
 class DayOff(ModelBase, table=True):
-    day: date
+    day: date = Field(unique=True, index=True)
     description: str
 
 
@@ -80,3 +110,32 @@ class AppConfig(ModelBase, table=True):
     minutes_late: int
     minutes_early: int
     zone_info: str = Field(default="UTC")
+    absences_closed_from: date | None = Field(default=None)
+    absences_closed_until: date | None = Field(default=None)
+
+
+class Absence(ModelBase, table=True):
+    __table_args__ = (Index("ix_absence_user_id_day", "user_id", "day"),)
+
+    day: date = Field(index=True)
+    absence_type: AttendanceType
+    minutes_late: int | None = Field(default=None)
+    attendance_timestamp: datetime | None = Field(default=None)
+    shift_id: int = Field(foreign_key="shift.id", nullable=False, ondelete="CASCADE")
+    user_id: int = Field(foreign_key="user.id", nullable=False, ondelete="CASCADE")
+
+    shift: Shift = Relationship()
+
+
+class TableVersion(SQLModel, table=True):
+    """
+    Version of a table, incremented by a trigger on every statement that writes
+    to it (see `app.core.table_versions`).
+    """
+
+    table_name: str = Field(primary_key=True)
+    version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    updated_at: datetime = Field(
+        sa_type=DateTime(timezone=True),  # type: ignore[call-overload]
+        sa_column_kwargs={"server_default": text("now()")},
+    )
@@ -0,0 +1,80 @@
+"""
+Invalidation of in-process caches across workers, with Postgres `LISTEN/NOTIFY`.
+
+A process that changes cached data sends a notification on the cache's channel,
+delivered when its transaction commits. `NotificationListener` receives the
+notifications of every channel in a background thread and calls their handlers.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+
+import psycopg
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds waited before reconnecting a listener that lost its connection
+RECONNECT_SECONDS = 5.0
+
+# Receives the payload of a notification, or None when notifications may have
+# been missed, e.g. after reconnecting.
+NotificationHandler = Callable[[str | None], None]
+
+
+def notify(session: Session, channel: str, payload: str = ""):
+    """
+    Sends a notification when the session's transaction is committed.
+    """
+    session.connection().execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel, "payload": payload},
+    )
+
+
+class NotificationListener(threading.Thread):
+    """
+    Listens to the given channels with its own connection.
+    """
+
+    def __init__(self, handlers: dict[str, NotificationHandler]):
+        super().__init__(name="notification-listener", daemon=True)
+        self.handlers = handlers
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.listen()
+            except psycopg.Error as e:
+                logger.warning(f"Notification listener disconnected: {e}")
+                self.stopped.wait(RECONNECT_SECONDS)
+
+    def listen(self):
+        with psycopg.connect(
+            host=settings.POSTGRES_SERVER,
+            port=settings.POSTGRES_PORT,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            dbname=settings.POSTGRES_DB,
+            autocommit=True,
+        ) as connection:
+            for channel in self.handlers:
+                connection.execute(f"LISTEN {channel}")
+            # Notifications may have been missed while disconnected
+            for handler in self.handlers.values():
+                handler(None)
+
+            while not self.stopped.is_set():
+                for notification in connection.notifies(timeout=1.0):
+                    handler = self.handlers.get(notification.channel)
+                    if handler:
+                        handler(notification.payload)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
@@ -0,0 +1,153 @@
+"""
+Monthly range partitions of the `attendance` table.
+
+Each month is stored in its own `attendance_YYYY_MM` partition, so queries filtered
+by `timestamp` only scan the months they need and old months can be detached
+instead of deleted. Rows outside every monthly partition go to
+`attendance_default`; creating a partition moves its rows out of the default one.
+
+Upcoming partitions are created by `init_db` and by `app.manage_partitions`.
+"""
+
+import re
+from collections.abc import Iterable
+from datetime import date, timedelta
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.models import Attendance
+from app.core.table_versions import increment_table_version
+
+PARTITIONED_TABLE = "attendance"
+DEFAULT_PARTITION = "attendance_default"
+PARTITION_NAME_PATTERN = re.compile(r"^attendance_(\d{4})_(\d{2})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return month_start(month_start(month) + timedelta(days=32))
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITIONED_TABLE}_{month:%Y_%m}"
+
+
+def list_partitions(session: Session) -> dict[date, str]:
+    """
+    Returns the monthly partitions attached to the attendance table, by month.
+    """
+    names = (
+        session.connection()
+        .exec_driver_sql(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %(table)s::regclass",
+            {"table": PARTITIONED_TABLE},
+        )
+        .scalars()
+        .all()
+    )
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def create_partition(session: Session, month: date):
+    """
+    Creates and attaches the partition of a month, moving the rows of that month
+    out of the default partition.
+    """
+    name = partition_name(month)
+    start, end = month_start(month), next_month(month)
+
+    connection = session.connection()
+    connection.exec_driver_sql(
+        f"CREATE TABLE {name} "
+        f"(LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    connection.exec_driver_sql(
+        f"WITH moved AS ("
+        f"DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE timestamp >= %(start)s AND timestamp < %(end)s RETURNING *"
+        f") INSERT INTO {name} SELECT * FROM moved",
+        {"start": start, "end": end},
+    )
+    connection.exec_driver_sql(
+        f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return name
+
+
+def lock_partitions(session: Session):
+    """
+    Locks the creation of partitions until the end of the transaction.
+    """
+    session.connection().exec_driver_sql(
+        "SELECT pg_advisory_xact_lock(hashtext(%(table)s))",
+        {"table": PARTITIONED_TABLE},
+    )
+
+
+def create_attendance_partitions(
+    session: Session, start: date | None = None, months_ahead: int | None = None
+) -> list[str]:
+    """
+    Creates the missing partitions from the month of `start` (today by default)
+    up to `months_ahead` months later.
+    """
+    if months_ahead is None:
+        months_ahead = settings.ATTENDANCE_PARTITION_MONTHS_AHEAD
+
+    months = []
+    month = month_start(start or date.today())
+    for _ in range(months_ahead + 1):
+        months.append(month)
+        month = next_month(month)
+    return create_partitions(session, months)
+
+
+def create_partitions(session: Session, months: Iterable[date]) -> list[str]:
+    """
+    Creates the missing partitions of the given months and commits them.
+    """
+    # Serializes concurrent calls, e.g. from several app instances starting at once
+    lock_partitions(session)
+    partitions = list_partitions(session)
+
+    created = []
+    for month in sorted({month_start(month) for month in months}):
+        if month not in partitions:
+            created.append(create_partition(session, month))
+
+    session.commit()
+    return created
+
+
+def detach_attendance_partitions(session: Session, before: date) -> list[str]:
+    """
+    Detaches the partitions of the months before `before`. The detached tables are
+    kept, so they can be archived or dropped without touching the live table.
+    """
+    detached = []
+    for month, name in sorted(list_partitions(session).items()):
+        if month >= month_start(before):
+            break
+        session.connection().exec_driver_sql(
+            f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}"
+        )
+        detached.append(name)
+
+    # Their attendances are no longer read, so cached results must be recomputed
+    if detached:
+        increment_table_version(session, Attendance)
+    session.commit()
+    return detached
@@ -0,0 +1,98 @@
+import functools
+import hashlib
+from collections.abc import Mapping
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+
+
+@functools.cache
+def get_type_adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def serialize_model(response_type: Any, content: Any) -> bytes:
+    """
+    Validates the content, e.g. ORM objects, as the response type and serializes it
+    straight to JSON bytes.
+    """
+    adapter = get_type_adapter(response_type)
+    value = adapter.validate_python(content, from_attributes=True)
+    return adapter.dump_json(value, by_alias=True)
+
+
+def model_json_response(
+    response_type: Any,
+    content: Any,
+    status_code: int = status.HTTP_200_OK,
+    headers: Mapping[str, str] | None = None,
+) -> Response:
+    """
+    Returns the content serialized as the response type.
+
+    FastAPI serializes the `response_model` of a route to Python objects, encodes
+    them with `jsonable_encoder` and then with `json.dumps`. This skips the
+    intermediate objects, which is most of the cost of large responses. The route
+    should keep its `response_model`, which is still used by the OpenAPI schema.
+    """
+    return Response(
+        serialize_model(response_type, content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def make_etag(content: bytes) -> str:
+    return f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks the `If-None-Match` header of the request against an ETag, with the
+    weak comparison.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """
+    Checks whether the client already has the current representation. As in
+    RFC 9110, `If-Modified-Since` is only used without `If-None-Match`.
+    """
+    if "if-none-match" in request.headers:
+        return etag_matches(request, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    # HTTP dates have no fraction of seconds
+    return last_modified.replace(microsecond=0) <= since
+
+
+def cached_json_response(
+    request: Request, content: bytes, etag: str, max_age: int
+) -> Response:
+    """
+    Returns already serialized JSON with its `ETag`, so clients and proxies can
+    cache it for `max_age` seconds and then revalidate it. If the client already
+    has the same content, only a 304 is returned.
+    """
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content, media_type="application/json", headers=headers)
@@ -1,8 +1,12 @@
-from typing import Any, TypeVar
+from typing import Annotated, Any, Literal, TypeVar
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, WithJsonSchema
 from pydantic.alias_generators import to_camel
 
+# Email of a response. Emails are validated when stored, so responses only
+# document the format instead of validating every email they return again.
+ResponseEmail = Annotated[str, WithJsonSchema({"type": "string", "format": "email"})]
+
 
 class BaseSchema(BaseModel):
     model_config = ConfigDict(
@@ -56,17 +60,44 @@ class Token(BaseSchema):
 
 class TokenPayload(BaseSchema):
     sub: str | None = None
+    admin: bool = False
+    active: bool = True
+    ver: int | None = None
+
+
+class TokenUser(BaseSchema):
+    """
+    The authenticated user, as described by the claims of their token.
+    """
+
+    id: int
+    is_admin: bool
 
 
 class Message(BaseSchema):
     message: str
 
 
+CountMode = Literal["exact", "exact-single-trip", "estimated", "none"]
+
+
 class PaginationParams(BaseSchema):
     page_size: int = Field(
         100, ge=1, le=100, description="Requested number of items per page"
     )
     page: int = Field(1, ge=1, description="Requested page number")
+    cursor: str | None = Field(
+        None,
+        description="Cursor returned in `nextCursor` by the previous page. "
+        "When given, `page` is ignored and the items after the cursor are returned.",
+    )
+    count: CountMode = Field(
+        "exact",
+        description="How `totalItems` is computed. `exact` runs a separate count, "
+        "`exact-single-trip` counts in the page query, `estimated` uses the "
+        "database planner estimate (exact when filters are given) and `none` "
+        "skips the count",
+    )
 
 
 T = TypeVar("T", bound=BaseModel)
@@ -74,10 +105,20 @@ T = TypeVar("T", bound=BaseModel)
 
 class Page[T](BaseSchema):
     items: list[T] = Field(description="List of items on this Page")
-    total_items: int = Field(description="Number of total items")
-    total_pages: int = Field(description="Total number of pages")
-    current_page: int = Field(description="Page number")
+    total_items: int | None = Field(
+        description="Number of total items. Null when the count was skipped"
+    )
+    total_pages: int | None = Field(
+        description="Total number of pages. Null when the count was skipped"
+    )
+    current_page: int | None = Field(
+        description="Page number. Null when the page was requested by cursor"
+    )
     current_page_size: int = Field(description="Number of items per page")
+    next_cursor: str | None = Field(
+        default=None,
+        description="Cursor to request the next page. Null on the last page",
+    )
 
 
 class ApiErrorDetail(BaseSchema):
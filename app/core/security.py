@@ -1,4 +1,19 @@
+"""
+Password hashing and access tokens.
+
+bcrypt is slow on purpose, so passwords are hashed and verified in a dedicated
+pool of `PASSWORD_HASHING_PROCESSES` processes. A burst of logins then queues on
+the pool instead of occupying the threads that serve every other request, and
+async routes don't occupy a thread at all while waiting.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import UTC, datetime, timedelta
+from itertools import repeat
+from multiprocessing import get_context
+from threading import Lock
 from typing import Any
 
 import bcrypt
@@ -6,22 +21,92 @@ import jwt
 
 from app.core.config import settings
 
+_hashing_pool: ProcessPoolExecutor | None = None
+_hashing_pool_lock = Lock()
+
 
-def verify_password(plain_password: str, hashed_password: str):
+def _check_password(plain_password: str, hashed_password: str):
     return bcrypt.checkpw(
         bytes(plain_password, encoding="utf-8"),
         bytes(hashed_password, encoding="utf-8"),
     )
 
 
-def get_password_hash(password: str):
-    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+def _hash_password(password: str, rounds: int):
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds))
     return hashed.decode("utf-8")
 
 
-def create_jwt_token(subject: str | Any, expires_delta: timedelta):
+def get_hashing_pool() -> ProcessPoolExecutor:
+    global _hashing_pool
+
+    with _hashing_pool_lock:
+        if _hashing_pool is None:
+            processes = settings.PASSWORD_HASHING_PROCESSES or max(
+                (os.cpu_count() or 1) // 2, 1
+            )
+            # Forking a process with threads, such as the app's, is unsafe
+            _hashing_pool = ProcessPoolExecutor(
+                max_workers=processes, mp_context=get_context("spawn")
+            )
+        return _hashing_pool
+
+
+def shutdown_hashing_pool():
+    global _hashing_pool
+
+    with _hashing_pool_lock:
+        if _hashing_pool is not None:
+            _hashing_pool.shutdown()
+            _hashing_pool = None
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    future = get_hashing_pool().submit(_check_password, plain_password, hashed_password)
+    return future.result()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    future = get_hashing_pool().submit(_check_password, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
+
+
+def get_password_hash(password: str) -> str:
+    future = get_hashing_pool().submit(_hash_password, password, settings.BCRYPT_ROUNDS)
+    return future.result()
+
+
+async def get_password_hash_async(password: str) -> str:
+    future = get_hashing_pool().submit(_hash_password, password, settings.BCRYPT_ROUNDS)
+    return await asyncio.wrap_future(future)
+
+
+def get_password_hashes(passwords: list[str]) -> list[str]:
+    """
+    Hashes many passwords in parallel.
+    """
+    return list(
+        get_hashing_pool().map(
+            _hash_password, passwords, repeat(settings.BCRYPT_ROUNDS)
+        )
+    )
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Checks if a password was hashed with a cost other than `BCRYPT_ROUNDS`.
+    """
+    # bcrypt hashes are formatted as $<version>$<cost>$<salt and hash>
+    return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+
+
+def create_jwt_token(
+    subject: str | Any,
+    expires_delta: timedelta,
+    claims: dict[str, Any] | None = None,
+):
     expire = datetime.now(UTC) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(
         to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM
     )
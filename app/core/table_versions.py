@@ -0,0 +1,79 @@
+"""
+Versions of the tables served with conditional GETs.
+
+A statement-level trigger increments the version of a table in `tableversion`,
+and sets its `updated_at`, whenever a statement writes to it. The ETag of a
+response is derived from the versions of the tables it is read from, so a
+client that already has the current representation gets a 304 after reading a
+single row per table, without loading or serializing the response.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import format_datetime
+
+from sqlmodel import Session, SQLModel, col, func, select, update
+
+from app.core.config import settings
+from app.core.models import TableVersion
+from app.core.responses import make_etag
+
+
+@dataclass(frozen=True)
+class TableVersions:
+    etag: str
+    last_modified: datetime
+
+    def headers(self) -> dict[str, str]:
+        """
+        Returns the validators of the response. Clients must revalidate it before
+        reusing it, as it may change at any time.
+        """
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(
+                self.last_modified.astimezone(UTC), usegmt=True
+            ),
+            "Cache-Control": "private, no-cache",
+        }
+
+
+def get_table_versions(
+    session: Session, models: Sequence[type[SQLModel]]
+) -> TableVersions:
+    table_names = [model.__table__.name for model in models]  # type: ignore[attr-defined]
+    statement = (
+        select(TableVersion)
+        .where(col(TableVersion.table_name).in_(table_names))
+        .order_by(col(TableVersion.table_name))
+    )
+    table_versions = session.exec(statement).all()
+    if len(table_versions) != len(table_names):
+        raise ValueError(f"Some of the tables {table_names} are not versioned.")
+
+    # The representation also changes with the API version
+    tag = ",".join(
+        [settings.VERSION]
+        + [f"{version.table_name}:{version.version}" for version in table_versions]
+    )
+    return TableVersions(
+        etag=f"W/{make_etag(tag.encode())}",
+        last_modified=max(version.updated_at for version in table_versions),
+    )
+
+
+def increment_table_version(session: Session, model: type[SQLModel]) -> None:
+    """
+    Increments the version of a table changed without a statement that fires its
+    trigger, e.g. by detaching a partition. Like the trigger, the version row is
+    locked until the end of the transaction.
+    """
+    session.exec(
+        update(TableVersion)  # type: ignore[call-overload]
+        .where(col(TableVersion.table_name) == model.__table__.name)  # type: ignore[attr-defined]
+        .values(
+            version=TableVersion.version + 1,
+            updated_at=func.greatest(TableVersion.updated_at, func.clock_timestamp()),
+        )
+    )
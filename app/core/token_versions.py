@@ -0,0 +1,95 @@
+"""
+Versions of the users' tokens.
+
+Access tokens carry the claims needed to authorize a request (the user's id,
+whether they are an admin and whether they are active) and the user's
+`token_version` when the token was created. Changing any of those claims
+increments the version, revoking the outdated tokens.
+
+Each process caches the versions it reads for `TOKEN_VERSION_CACHE_SECONDS`, so
+most requests are authorized without a query. Revocations invalidate the version
+in the process that made them and, through a notification on the
+`token_version` channel, in every other process (see `app.core.notifications`).
+"""
+
+import threading
+import time as timer
+
+from sqlmodel import Session, col, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import notifications
+from app.core.config import settings
+from app.core.models import User
+
+CHANNEL = "token_version"
+
+# Token version and expiration of each user id
+_versions: dict[int, tuple[int, float]] = {}
+# Incremented by every invalidation, so that a load that started before an
+# invalidation doesn't store a revoked version
+_generation = 0
+_lock = threading.Lock()
+
+
+async def get_token_version(session: AsyncSession, user_id: int) -> int | None:
+    """
+    Returns the current token version of a user, or None if the user doesn't
+    exist.
+    """
+    cached = _versions.get(user_id)
+    if cached and cached[1] > timer.monotonic():
+        return cached[0]
+
+    generation = _generation
+    statement = select(User.token_version).where(User.id == user_id)
+    version = (await session.exec(statement)).first()
+    if version is None:
+        return None
+
+    with _lock:
+        if generation == _generation:
+            expires_at = timer.monotonic() + settings.TOKEN_VERSION_CACHE_SECONDS
+            _versions[user_id] = (version, expires_at)
+    return version
+
+
+def invalidate(user_id: int | None = None):
+    """
+    Invalidates the cached version of a user, or of every user.
+    """
+    global _generation
+
+    with _lock:
+        _generation += 1
+        if user_id is None:
+            _versions.clear()
+        else:
+            _versions.pop(user_id, None)
+
+
+def revoke_user_tokens(session: Session, user: User):
+    """
+    Revokes the tokens of a user when the session is committed. `invalidate` must
+    be called after the commit.
+    """
+    user.token_version += 1
+    notifications.notify(session, CHANNEL, str(user.id))
+
+
+def revoke_role_tokens(session: Session, role_id: int):
+    """
+    Revokes the tokens of every user of a role when the session is committed.
+    `invalidate` must be called after the commit.
+    """
+    statement = (
+        update(User)
+        .where(col(User.role_id) == role_id)
+        .values(token_version=col(User.token_version) + 1)
+    )
+    session.exec(statement)  # type: ignore[call-overload]
+    notifications.notify(session, CHANNEL)
+
+
+def handle_notification(payload: str | None):
+    invalidate(int(payload) if payload else None)
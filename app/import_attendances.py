@@ -0,0 +1,36 @@
+import argparse
+import logging
+from pathlib import Path
+
+from sqlmodel import Session
+
+from app.api.records import imports
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Import attendances from a CSV file with the columns of the "
+        "attendances export."
+    )
+    parser.add_argument("path", type=Path, help="Path of the CSV file.")
+    args = parser.parse_args()
+
+    with (
+        Session(engine) as session,
+        args.path.open(encoding="utf-8-sig", newline="") as file,
+    ):
+        result = imports.import_attendances(session, file)
+
+    logger.info(
+        f"Attendances imported: {result.imported}, lines rejected: {result.rejected}"
+    )
+    for rejected_line in result.rejected_lines:
+        logger.warning(f"Line {rejected_line.line}: {rejected_line.error}")
+
+
+if __name__ == "__main__":
+    main()
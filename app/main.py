@@ -1,22 +1,57 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 from fastapi.routing import APIRoute
 
 from app.api import app_config, records, shifts, users
+from app.api.app_config import cache as app_config_cache
+from app.api.records import cache as absences_cache
+from app.api.records import group_commit
+from app.core import token_versions
 from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.deps import check_admin
 from app.core.exceptions import BaseHTTPException
+from app.core.metrics import (
+    render_cache_metrics,
+    render_group_commit_metrics,
+    render_pool_metrics,
+)
+from app.core.notifications import NotificationListener
+from app.core.responses import model_json_response
 from app.core.schemas import ApiError, ApiErrorDetail, GlobalConfig
+from app.core.security import shutdown_hashing_pool
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    listener = NotificationListener(
+        {
+            app_config_cache.CHANNEL: app_config_cache.handle_notification,
+            token_versions.CHANNEL: token_versions.handle_notification,
+        }
+    )
+    listener.start()
+    yield
+    listener.stop()
+    shutdown_hashing_pool()
+    await group_commit.drain()
+    # The async connections belong to the event loop of the app, which is closed
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title=settings.TITLE,
     version=settings.VERSION,
     description=settings.DESCRIPTION,
     responses={500: {"model": ApiError}},
+    lifespan=lifespan,
 )
 
 if settings.cors_origins:
@@ -34,8 +69,8 @@ async def generic_exception_handler(request: Request, _: Exception):
     detail = ApiErrorDetail(message="Erro interno no servidor", metadata=None)
     content = ApiError(detail=detail)
 
-    response = JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content=content.model_dump()
+    response = model_json_response(
+        ApiError, content, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
     )
 
     # Since the CORSMiddleware is not executed when an unhandled server exception
@@ -80,7 +115,7 @@ async def generic_exception_handler(request: Request, _: Exception):
 async def custom_http_exception_handler(_, exc: BaseHTTPException):
     detail = ApiErrorDetail(message=exc.message, metadata=exc.metadata)
     content = ApiError(detail=detail)
-    return JSONResponse(status_code=exc.status_code, content=content.model_dump())
+    return model_json_response(ApiError, content, status_code=exc.status_code)
 
 
 @app.exception_handler(RequestValidationError)
@@ -90,9 +125,8 @@ async def validation_exception_handler(_, exc: RequestValidationError):
         metadata=jsonable_encoder(exc.errors()),
     )
     content = ApiError(detail=detail)
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content=content.model_dump(),
+    return model_json_response(
+        ApiError, content, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
     )
 
 
@@ -113,6 +147,26 @@ def health_check() -> bool:
     return True
 
 
+@app.get(
+    "/metrics",
+    tags=["main"],
+    response_class=PlainTextResponse,
+    dependencies=[Depends(check_admin)],
+)
+def metrics() -> str:
+    """
+    Connection pool, cache and group commit metrics, in the Prometheus text format.
+    """
+    pool_metrics = render_pool_metrics(
+        {"sync": engine.pool, "async": async_engine.pool}  # type: ignore[dict-item]
+    )
+    return (
+        pool_metrics
+        + render_cache_metrics({"absences": absences_cache.stats})
+        + render_group_commit_metrics(group_commit.stats)
+    )
+
+
 app.include_router(users.router)
 app.include_router(app_config.router)
 app.include_router(shifts.router)
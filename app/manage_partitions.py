@@ -0,0 +1,47 @@
+import argparse
+import logging
+from datetime import date
+
+from sqlmodel import Session
+
+from app.core import partitions
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Create the upcoming monthly partitions of the attendances."
+    )
+    parser.add_argument(
+        "--months-ahead",
+        type=int,
+        default=None,
+        help="Number of months to create ahead of the current one.",
+    )
+    parser.add_argument(
+        "--detach-before",
+        type=date.fromisoformat,
+        default=None,
+        help="Detach the partitions of the months before this date (YYYY-MM-DD). "
+        "The detached tables are kept and can be archived or dropped.",
+    )
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        created = partitions.create_attendance_partitions(
+            session, months_ahead=args.months_ahead
+        )
+        logger.info(f"Partitions created: {', '.join(created) or 'none'}")
+
+        if args.detach_before:
+            detached = partitions.detach_attendance_partitions(
+                session, args.detach_before
+            )
+            logger.info(f"Partitions detached: {', '.join(detached) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, delete
 
 from app.api.app_config import crud as app_config_crud
+from app.api.app_config.schemas import RoleCreate
+from app.api.shifts import crud as shifts_crud
+from app.api.users import crud as users_crud
 from app.core.db import engine, init_db
 from app.core.deps import get_current_user
 from app.core.models import AppConfig, Attendance, DayOff, Role, Shift, User
 from app.main import app
-from app.tests.utils import CORRECT_LOGIN_DATA
+from app.tests.utils import (
+    CORRECT_LOGIN_DATA,
+    new_shift_create,
+    random_lower_string,
+    random_user_create,
+)
 
 
 @pytest.fixture(scope="module")
@@ -58,3 +69,19 @@ def app_config(db: Session):
             "Ocorreu um erro no servidor e não foi possível encontrar as configurações."
         )
     return app_config
+
+
+@pytest.fixture
+def users_shifts(db: Session, app_config: AppConfig):
+    """
+    Creates 5 users, each with their own role and a shift starting now, for tests
+    that need list pages with items of different users and roles.
+    """
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    shifts = []
+    for _ in range(5):
+        role = app_config_crud.create_role(db, RoleCreate(name=random_lower_string()))
+        user = users_crud.create_user(db, random_user_create(role.id))
+        assert user.id is not None
+        shifts.append(shifts_crud.create_shift(db, new_shift_create(user.id, now)))
+    return shifts
@@ -1,17 +1,33 @@
+import time as timer
+from datetime import UTC, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
-from app.api.app_config import crud
+from app.api.app_config import cache, crud, timezones
 from app.api.app_config.schemas import AppConfigUpdate, DayOffCreate, RoleCreate
+from app.api.users import crud as users_crud
 from app.core.config import settings
+from app.core.db import engine
 from app.core.models import DayOff, Role
-from app.tests.utils import random_date, random_lower_string
+from app.tests.utils import (
+    count_queries,
+    random_date,
+    random_lower_string,
+    random_user_create,
+)
+
 
+def random_day_off_create(db: Session):
+    day = random_date()
+    while crud.get_day_off_by_day(db, day):
+        day = random_date()
 
-def random_day_off_create():
-    day_off_create = DayOffCreate(day=random_date(), description=random_lower_string())
+    day_off_create = DayOffCreate(day=day, description=random_lower_string())
     return day_off_create
 
 
@@ -21,9 +37,12 @@ def random_role_create():
 
 
 def test_create_new_day_off(
-    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
 ):
-    day_off_create = random_day_off_create()
+    day_off_create = random_day_off_create(db)
     data = jsonable_encoder(day_off_create, exclude_unset=True)
 
     response = client.post("/config/days-off", json=data)
@@ -41,6 +60,15 @@ def test_create_new_day_off(
     assert day_off_db.day == day_off_create.day
     assert day_off_db.description == day_off_create.description
 
+    response = client.post("/config/days-off", json=data, headers=admin_token_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # A day off created concurrently, after the day was checked, is rejected too
+    monkeypatch.setattr(crud, "get_day_off_by_day", lambda *args: None)
+    response = client.post("/config/days-off", json=data, headers=admin_token_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"]["message"] == "Já existe um dia livre nesta data."
+
 
 def test_create_new_role(
     client: TestClient, db: Session, admin_token_headers: dict[str, str]
@@ -99,6 +127,9 @@ def test_update_app_config(
     client: TestClient, db: Session, admin_token_headers: dict[str, str]
 ):
     last_app_config = crud.get_last_app_config(db)
+    # Caches the app config
+    response = client.get("/config", headers=admin_token_headers)
+    assert response.status_code == status.HTTP_200_OK
 
     update = AppConfigUpdate(minutes_late=10)
 
@@ -117,11 +148,31 @@ def test_update_app_config(
     db.refresh(last_app_config)
     assert last_app_config.minutes_late == update.minutes_late
 
+    response = client.get("/config", headers=admin_token_headers)
+    assert response.json()["minutesLate"] == update.minutes_late
+
+
+@pytest.mark.usefixtures("client")
+def test_app_config_cache(db: Session):
+    cached = cache.get_app_config(db)
+    assert cached
+    assert cache.get_app_config(db) is cached
+
+    # A change notified by another process invalidates the cache, once the
+    # listener started by the app receives it
+    deadline = timer.monotonic() + 10
+    while cache.get_app_config(db) is cached:
+        assert timer.monotonic() < deadline
+        with Session(engine) as session:
+            cache.notify_change(session)
+            session.commit()
+        timer.sleep(0.1)
+
 
 def test_delete_day_off(
     client: TestClient, db: Session, admin_token_headers: dict[str, str]
 ):
-    day_off_create = random_day_off_create()
+    day_off_create = random_day_off_create(db)
     day_off = crud.create_day_off(db, day_off_create)
 
     response = client.delete(f"/config/days-off/{day_off.id}")
@@ -165,7 +216,7 @@ def test_get_app_config(client: TestClient, admin_token_headers: dict[str, str])
 def test_get_days_off(
     client: TestClient, db: Session, admin_token_headers: dict[str, str]
 ):
-    day_off_create = random_day_off_create()
+    day_off_create = random_day_off_create(db)
     crud.create_day_off(db, day_off_create)
 
     response = client.get("/config/days-off", headers=admin_token_headers)
@@ -189,3 +240,93 @@ def test_get_roles(client: TestClient, admin_token_headers: dict[str, str]):
     for item in result:
         assert "id" in item
         assert "name" in item
+
+
+def test_get_roles_not_modified(
+    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+):
+    response = client.get("/config/roles", headers=admin_token_headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert etag.startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    # Answered before the roles are loaded
+    with count_queries() as statements:
+        response = client.get(
+            "/config/roles", headers={**admin_token_headers, "If-None-Match": etag}
+        )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert not [s for s in statements if "FROM role" in s]
+
+    response = client.get(
+        "/config/roles",
+        headers={**admin_token_headers, "If-Modified-Since": last_modified},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Checked after the authentication
+    response = client.get("/config/roles", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    crud.create_role(db, random_role_create())
+    response = client.get(
+        "/config/roles", headers={**admin_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+
+def test_list_timezones(client: TestClient):
+    response = client.get("/config/timezones")
+    assert response.status_code == status.HTTP_200_OK
+    assert {"zoneInfo": "UTC", "offset": "+00:00"} in response.json()
+
+    etag = response.headers["etag"]
+    assert "max-age=" in response.headers["cache-control"]
+
+    response = client.get("/config/timezones", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+
+
+def test_timezone_transitions():
+    zone = ZoneInfo("America/New_York")
+    start = datetime(2026, 10, 31, 12, tzinfo=UTC)
+    end = datetime(2026, 11, 1, 12, tzinfo=UTC)
+
+    transition = timezones.next_transition(zone, start, end)
+    assert transition
+    assert abs(transition - datetime(2026, 11, 1, 6, tzinfo=UTC)).total_seconds() < 1
+
+    assert timezones.next_transition(ZoneInfo("UTC"), start, end) is None
+    assert timezones.build_catalogue(start).expires_at <= transition
+
+
+def test_token_revoked_on_role_rename(
+    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+):
+    role = crud.create_role(db, random_role_create())
+    user_create = random_user_create(role.id)
+    users_crud.create_user(db, user_create)
+
+    response = client.post(
+        "/users/login",
+        data={"username": user_create.email, "password": user_create.password},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['accessToken']}"}
+    response = client.get("/config", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    # Renaming a role may change which users are admins
+    response = client.patch(
+        f"/config/roles/{role.id}",
+        headers=admin_token_headers,
+        json={"name": random_lower_string()},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get("/config", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -1,16 +1,51 @@
-from datetime import datetime
+import asyncio
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
 from zoneinfo import ZoneInfo
 
+import pytest
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
-from sqlmodel import Session, delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, delete, func, select
 
-from app.api.records import crud
-from app.api.records.schemas import AttendanceCreate
+from app.api.app_config import crud as app_config_crud
+from app.api.app_config.schemas import AppConfigUpdate, DayOffCreate
+from app.api.records import cache as absences_cache
+from app.api.records import crud, group_commit, imports, ledger
+from app.api.records.schemas import (
+    AbsenceCsvLine,
+    AbsenceRow,
+    AttendanceCreate,
+    AttendanceCsvLine,
+    AttendanceEvent,
+    AttendanceUpdate,
+)
 from app.api.shifts import crud as shifts_crud
-from app.core.models import AppConfig, Attendance, AttendanceType, DayOff, User
-from app.tests.test_shifts import new_shift_create
+from app.api.shifts.schemas import ShiftCreate, ShiftUpdate
+from app.api.users import crud as users_crud
+from app.api.users.schemas import UserUpdate
+from app.core import partitions
+from app.core.config import settings
+from app.core.exceptions import BadRequest
+from app.core.models import (
+    AppConfig,
+    Attendance,
+    AttendanceType,
+    DayOff,
+    Shift,
+    User,
+    WeekdayEnum,
+)
+from app.tests.utils import (
+    assert_constant_queries,
+    count_queries,
+    new_shift_create,
+    random_user_create,
+)
 
 
 def test_create_new_attendance(
@@ -54,6 +89,259 @@ def test_create_new_attendance(
     assert attendance_db.timestamp == datetime.fromisoformat(result["timestamp"])
 
 
+def test_create_new_attendance_group_commit(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    assert admin_user.id is not None
+
+    monkeypatch.setattr(settings, "ATTENDANCE_GROUP_COMMIT", True)
+    monkeypatch.setattr(settings, "ATTENDANCE_GROUP_COMMIT_WINDOW", 0.2)
+    shift_create = new_shift_create(
+        admin_user.id, datetime.now(ZoneInfo(app_config.zone_info))
+    )
+    shift = shifts_crud.create_shift(db, shift_create)
+    data = {"attendanceType": AttendanceType.CLOCK_IN, "shiftId": shift.id}
+    batches = group_commit.stats.batches
+
+    def create_attendance(_: int):
+        return client.post(
+            "/records/attendances", json=data, headers=admin_token_headers
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(create_attendance, range(8)))
+
+    assert [response.status_code for response in responses] == [status.HTTP_200_OK] * 8
+    results = [response.json() for response in responses]
+    assert len({result["id"] for result in results}) == 8
+    assert group_commit.stats.batches - batches < 8
+    for result in results:
+        assert result["shift"]["id"] == shift.id
+        attendance_db = db.get(Attendance, result["id"])
+        assert attendance_db
+        assert attendance_db.timestamp == datetime.fromisoformat(result["timestamp"])
+
+    # Attendances that can't be inserted only fail their own request
+    values = {
+        "timestamp": datetime.now(ZoneInfo(app_config.zone_info)),
+        "minutes_late": 0,
+        "attendance_type": AttendanceType.CLOCK_OUT,
+    }
+
+    async def insert_attendances(shift_ids: list[int]):
+        return await asyncio.gather(
+            *(
+                group_commit.insert_attendance(values | {"shift_id": shift_id})
+                for shift_id in shift_ids
+            ),
+            return_exceptions=True,
+        )
+
+    assert client.portal is not None
+    failures = group_commit.stats.failures
+    first, failed, last = client.portal.call(
+        insert_attendances, [shift.id, 0, shift.id]
+    )
+    assert isinstance(failed, IntegrityError)
+    assert group_commit.stats.failures == failures + 1
+    for row in (first, last):
+        assert not isinstance(row, BaseException)
+        assert db.get(Attendance, row.id)
+
+    response = client.get("/metrics", headers=admin_token_headers)
+    assert "attendance_group_commit_batch_size_count" in response.text
+
+
+def test_group_commit_failed_batch(
+    client: TestClient,
+    db: Session,
+    admin_user: User,
+    app_config: AppConfig,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    assert admin_user.id is not None
+
+    monkeypatch.setattr(settings, "ATTENDANCE_GROUP_COMMIT_WINDOW", 0.2)
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    shift = shifts_crud.create_shift(db, new_shift_create(admin_user.id, now))
+    values = {
+        "timestamp": now,
+        "minutes_late": 0,
+        "attendance_type": AttendanceType.CLOCK_OUT,
+    }
+    insert_rows = group_commit.insert_rows
+    calls: list[int] = []
+
+    async def count_insert_rows(rows):
+        calls.append(len(rows))
+        return await insert_rows(rows)
+
+    monkeypatch.setattr(group_commit, "insert_rows", count_insert_rows)
+
+    async def insert_attendances(shift_ids: list[int]):
+        return await asyncio.gather(
+            *(
+                group_commit.insert_attendance(values | {"shift_id": shift_id})
+                for shift_id in shift_ids
+            ),
+            return_exceptions=True,
+        )
+
+    # The batch is bisected around the attendance that can't be inserted
+    assert client.portal is not None
+    shift_ids = [shift.id] * 8
+    shift_ids[5] = 0
+    results = client.portal.call(insert_attendances, shift_ids)
+    assert calls == [8, 4, 4, 2, 1, 1, 2]
+    assert isinstance(results.pop(5), IntegrityError)
+    for row in results:
+        assert not isinstance(row, BaseException)
+        assert db.get(Attendance, row.id)
+
+    # Errors that aren't caused by the attendances fail the whole batch at once
+    async def fail_insert_rows(rows):
+        calls.append(len(rows))
+        raise ConnectionError
+
+    monkeypatch.setattr(group_commit, "insert_rows", fail_insert_rows)
+    calls.clear()
+    results = client.portal.call(insert_attendances, [shift.id] * 4)
+    assert calls == [4]
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_create_new_attendances(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    app_config: AppConfig,
+):
+    user_create = random_user_create()
+    user_create.shifts = []
+    user = users_crud.create_user(db, user_create)
+    assert user.id is not None
+
+    zone_info = ZoneInfo(app_config.zone_info)
+    day = datetime.now(zone_info).date() - timedelta(days=7)
+    weekday = WeekdayEnum(day.weekday())
+    morning = shifts_crud.create_shift(
+        db,
+        ShiftCreate(
+            weekday=weekday, start_time=time(8), end_time=time(12), user_id=user.id
+        ),
+    )
+    afternoon = shifts_crud.create_shift(
+        db,
+        ShiftCreate(
+            weekday=weekday, start_time=time(14), end_time=time(18), user_id=user.id
+        ),
+    )
+
+    def at(hour: int, minute: int = 0, days: int = 0):
+        dt = datetime.combine(day + timedelta(days=days), time(hour, minute), zone_info)
+        return dt.isoformat()
+
+    late = app_config.minutes_late + 5
+    early = app_config.minutes_early + 5
+    events = [
+        {
+            "attendanceType": AttendanceType.CLOCK_IN,
+            "timestamp": at(8, late),
+            "userId": user.id,
+        },
+        {
+            "attendanceType": AttendanceType.CLOCK_OUT,
+            "timestamp": datetime.fromisoformat(at(11, 60 - early))
+            .astimezone(timezone(timedelta(hours=5, minutes=30)))
+            .isoformat(),
+            "userId": user.id,
+        },
+        {
+            "attendanceType": AttendanceType.CLOCK_IN,
+            "timestamp": at(13, 50),
+            "userId": user.id,
+        },
+        {
+            "attendanceType": AttendanceType.CLOCK_OUT,
+            "timestamp": at(18),
+            "shiftId": afternoon.id,
+        },
+        {"attendanceType": AttendanceType.CLOCK_IN, "timestamp": at(8), "shiftId": 0},
+        {
+            "attendanceType": AttendanceType.CLOCK_IN,
+            "timestamp": at(8, days=1),
+            "userId": user.id,
+        },
+        {
+            "attendanceType": AttendanceType.CLOCK_IN,
+            "timestamp": at(8, days=8),
+            "userId": user.id,
+        },
+    ]
+
+    response = client.post("/records/attendances/batch", json=events)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post(
+        "/records/attendances/batch", json=events, headers=admin_token_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()
+    assert len(results) == len(events)
+
+    # Stored as the wall time in the zone of the app config, whatever the offset
+    expected = [
+        (morning.id, late, time(8, late)),
+        (morning.id, early, time(11, 60 - early)),
+        (afternoon.id, 0, time(13, 50)),
+        (afternoon.id, 0, time(18)),
+    ]
+    for result, event, (shift_id, minutes_late, wall_time) in zip(
+        results[:4], events[:4], expected, strict=True
+    ):
+        assert result["error"] is None
+        attendance = result["attendance"]
+        assert attendance["shiftId"] == shift_id
+        assert attendance["minutesLate"] == minutes_late
+        assert attendance["attendanceType"] == event["attendanceType"]
+
+        attendance_db = db.get(Attendance, attendance["id"])
+        assert attendance_db
+        assert attendance_db.shift_id == shift_id
+        assert attendance_db.minutes_late == minutes_late
+        assert attendance_db.timestamp == datetime.combine(day, wall_time)
+        assert attendance["timestamp"] == attendance_db.timestamp.isoformat()
+
+    assert [result["attendance"] for result in results[4:]] == [None] * 3
+    assert results[4]["error"] == "Turno não encontrado."
+    assert results[5]["error"] == "O usuário não tem turno no dia do registro."
+    assert results[6]["error"] == "O horário do registro não pode estar no futuro."
+
+    for event in (
+        {"attendanceType": AttendanceType.CLOCK_IN, "timestamp": at(8)},
+        {
+            "attendanceType": AttendanceType.CLOCK_IN,
+            "timestamp": at(8),
+            "userId": user.id,
+            "shiftId": morning.id,
+        },
+        {
+            "attendanceType": AttendanceType.CLOCK_IN,
+            "timestamp": at(8)[:19],
+            "userId": user.id,
+        },
+    ):
+        response = client.post(
+            "/records/attendances/batch", json=[event], headers=admin_token_headers
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 def test_update_attendance(
     client: TestClient,
     db: Session,
@@ -95,6 +383,37 @@ def test_update_attendance(
     assert attendance_db.minutes_late == attendance.minutes_late
     assert attendance_db.timestamp == attendance.timestamp
 
+    # Timestamps with an offset are stored as wall time in the app config's zone
+    zone_info = app_config.zone_info
+    tokyo = AppConfigUpdate(zone_info=ZoneInfo("Asia/Tokyo"))
+    app_config_crud.update_app_config(db, app_config, tokyo)
+    try:
+        timestamp = datetime.combine(
+            date(2020, 1, 6), time(8, 30), timezone(timedelta(hours=5, minutes=30))
+        )
+        response = client.patch(
+            f"/records/attendances/{attendance.id}",
+            headers=admin_token_headers,
+            json={"timestamp": timestamp.isoformat()},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        db.refresh(attendance_db)
+        assert attendance_db.timestamp == datetime(2020, 1, 6, 12)
+    finally:
+        restore = AppConfigUpdate(zone_info=ZoneInfo(zone_info))
+        app_config_crud.update_app_config(db, app_config, restore)
+
+    # The response has the new shift of the attendance
+    other_shift = shifts_crud.create_shift(db, shift_create)
+    response = client.patch(
+        f"/records/attendances/{attendance.id}",
+        headers=admin_token_headers,
+        json={"shiftId": other_shift.id},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["shiftId"] == other_shift.id
+    assert response.json()["shift"]["id"] == other_shift.id
+
 
 def test_delete_attendance(
     client: TestClient,
@@ -156,6 +475,133 @@ def test_get_attendances(
         assert "minutesLate" in item
 
 
+def test_get_attendances_by_cursor(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    shift_create = new_shift_create(
+        admin_user.id, datetime.now(ZoneInfo(app_config.zone_info))
+    )
+    shift = shifts_crud.create_shift(db, shift_create)
+
+    for _ in range(3):
+        crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+
+    params = {"user_id": admin_user.id, "pageSize": 1}
+    response = client.get(
+        "/records/attendances", params=params, headers=admin_token_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    expected_ids = [item["id"] for item in result["items"]]
+
+    ids = [item["id"] for item in result["items"]]
+    cursor = result["nextCursor"]
+    while cursor:
+        response = client.get(
+            "/records/attendances",
+            params={**params, "cursor": cursor},
+            headers=admin_token_headers,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        result = response.json()
+        assert result["currentPage"] is None
+        ids.extend(item["id"] for item in result["items"])
+        cursor = result["nextCursor"]
+
+    for page in range(2, result["totalPages"] + 1):
+        response = client.get(
+            "/records/attendances",
+            params={**params, "page": page},
+            headers=admin_token_headers,
+        )
+        expected_ids.extend(item["id"] for item in response.json()["items"])
+
+    assert len(ids) == result["totalItems"]
+    assert ids == expected_ids
+
+    response = client.get(
+        "/records/attendances",
+        params={**params, "cursor": "invalid"},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_attendances_count_modes(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    shift_create = new_shift_create(
+        admin_user.id, datetime.now(ZoneInfo(app_config.zone_info))
+    )
+    shift = shifts_crud.create_shift(db, shift_create)
+
+    for _ in range(3):
+        crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+
+    params = {"user_id": admin_user.id, "pageSize": 2}
+    response = client.get(
+        "/records/attendances", params=params, headers=admin_token_headers
+    )
+    expected = response.json()
+
+    response = client.get(
+        "/records/attendances",
+        params={**params, "count": "exact-single-trip"},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected
+
+    # Out-of-bounds pages still go to the last page
+    response = client.get(
+        "/records/attendances",
+        params={**params, "count": "exact-single-trip", "page": 1000},
+        headers=admin_token_headers,
+    )
+    result = response.json()
+    assert result["currentPage"] == expected["totalPages"]
+    assert result["totalItems"] == expected["totalItems"]
+
+    response = client.get(
+        "/records/attendances",
+        params={**params, "count": "none"},
+        headers=admin_token_headers,
+    )
+    result = response.json()
+    assert result["totalItems"] is None
+    assert result["totalPages"] is None
+    assert result["items"] == expected["items"]
+    assert result["nextCursor"] == expected["nextCursor"]
+
+    # Estimates of filtered lists can be far off, so they are counted exactly
+    response = client.get(
+        "/records/attendances",
+        params={**params, "count": "estimated"},
+        headers=admin_token_headers,
+    )
+    assert response.json() == expected
+
+    response = client.get(
+        "/records/attendances",
+        params={"pageSize": 2, "count": "estimated"},
+        headers=admin_token_headers,
+    )
+    result = response.json()
+    assert isinstance(result["totalItems"], int)
+
+
 def test_get_absences(
     client: TestClient,
     db: Session,
@@ -196,3 +642,656 @@ def test_get_absences(
         assert "absenceType" in item
         assert "minutesLate" in item
         assert "attendanceTimestamp" in item
+
+
+def test_get_absences_with_attendance(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    shift_create = new_shift_create(admin_user.id, now)
+    shift = shifts_crud.create_shift(db, shift_create)
+
+    db.exec(delete(DayOff))  # type: ignore
+    db.commit()
+
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+
+    params = {
+        "start_date": now.date().isoformat(),
+        "end_date": (now.date() + timedelta(days=1)).isoformat(),
+    }
+    response = client.get(
+        "/records/absences", headers=admin_token_headers, params=params
+    )
+    result = response.json()
+
+    assert response.status_code == status.HTTP_200_OK
+    shift_absences = [
+        item
+        for item in result
+        if item["shift"]["id"] == shift.id and item["minutesLate"] is None
+    ]
+    assert [item["absenceType"] for item in shift_absences] == [
+        AttendanceType.CLOCK_OUT
+    ]
+    assert shift_absences[0]["day"] == now.date().isoformat()
+
+
+def test_get_attendances_fields(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    shift_create = new_shift_create(
+        admin_user.id, datetime.now(ZoneInfo(app_config.zone_info))
+    )
+    shift = shifts_crud.create_shift(db, shift_create)
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+
+    params = {"fields": "id,timestamp,attendanceType"}
+    client.get("/records/attendances", headers=admin_token_headers, params=params)
+    with count_queries() as statements:
+        response = client.get(
+            "/records/attendances", headers=admin_token_headers, params=params
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    items = response.json()["items"]
+    assert len(items) > 0
+    for item in items:
+        assert set(item) == {"id", "timestamp", "attendanceType"}
+
+    # Only the selected columns are loaded, without the shifts, users and roles
+    page_statement = next(s for s in statements if "LIMIT" in s)
+    assert "minutes_late" not in page_statement
+    assert "role" not in page_statement
+
+    params = {"fields": "id,unknown"}
+    response = client.get(
+        "/records/attendances", headers=admin_token_headers, params=params
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    params = {"fields": "id", "compact": "true"}
+    response = client.get(
+        "/records/attendances", headers=admin_token_headers, params=params
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def expand_compact(result: dict, item_fields: list[str]):
+    """
+    Rebuilds the nested items of a compact response.
+    """
+    included = result["included"]
+    items = []
+    for item in result["items"]:
+        shift = dict(included["shifts"][str(item["shiftId"])])
+        user = dict(included["users"][str(shift.pop("userId"))])
+        role_id = user.pop("roleId")
+        user["role"] = included["roles"][str(role_id)] if role_id else None
+        shift["user"] = user
+        items.append({**{field: item[field] for field in item_fields}, "shift": shift})
+    return items
+
+
+def test_get_attendances_compact(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    shift_create = new_shift_create(
+        admin_user.id, datetime.now(ZoneInfo(app_config.zone_info))
+    )
+    shift = shifts_crud.create_shift(db, shift_create)
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_OUT)
+
+    params = {"user_id": admin_user.id, "page_size": 50}
+    response = client.get(
+        "/records/attendances", headers=admin_token_headers, params=params
+    )
+    expected = response.json()
+
+    response = client.get(
+        "/records/attendances",
+        headers=admin_token_headers,
+        params={**params, "compact": True},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+
+    assert len(result["included"]["users"]) == 1
+    assert {key: value for key, value in result.items() if key != "included"} == {
+        **expected,
+        "items": [
+            {key: value for key, value in item.items() if key != "shift"}
+            for item in expected["items"]
+        ],
+    }
+    fields = ["id", "attendanceType", "shiftId", "timestamp", "minutesLate"]
+    assert expand_compact(result, fields) == expected["items"]
+
+
+def test_get_absences_compact(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    shifts_crud.create_shift(db, new_shift_create(admin_user.id, now))
+
+    params = {
+        "start_date": (now.date() - timedelta(days=14)).isoformat(),
+        "end_date": now.date().isoformat(),
+    }
+    response = client.get(
+        "/records/absences", headers=admin_token_headers, params=params
+    )
+    expected = response.json()
+    nested_size = len(response.content)
+
+    response = client.get(
+        "/records/absences",
+        headers=admin_token_headers,
+        params={**params, "compact": True},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+
+    assert len(result["included"]["shifts"]) < len(result["items"])
+    fields = ["day", "absenceType", "minutesLate", "attendanceTimestamp"]
+    assert expand_compact(result, fields) == expected
+    assert len(response.content) < nested_size
+
+
+def test_absences_backends_match(
+    db: Session,
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    shift = shifts_crud.create_shift(db, new_shift_create(admin_user.id, now))
+    shifts_crud.create_shift(
+        db, new_shift_create(admin_user.id, now - timedelta(days=1))
+    )
+
+    db.exec(delete(DayOff))  # type: ignore
+    db.commit()
+
+    attendance = crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+    crud.update_attendance(db, attendance, AttendanceUpdate(minutes_late=20))
+
+    start_date = now.date() - timedelta(days=7)
+    end_date = now.date() + timedelta(days=1)
+
+    for absence_type in (None, *AttendanceType):
+        python_absences = list(
+            crud.iter_absences_python(
+                db, start_date, end_date, admin_user.id, absence_type
+            )
+        )
+        sql_absences = list(
+            crud.iter_absences_sql(
+                db, start_date, end_date, admin_user.id, absence_type
+            )
+        )
+
+        def sort_key(absence: AbsenceRow):
+            return (
+                absence.day,
+                absence.shift.id,
+                absence.absence_type,
+                absence.minutes_late or 0,
+            )
+
+        assert len(python_absences) > 0
+        assert sorted(python_absences, key=sort_key) == sorted(
+            sql_absences, key=sort_key
+        )
+
+
+def test_absence_ledger(
+    db: Session,
+    admin_user: User,
+    app_config: AppConfig,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    assert admin_user.id is not None
+    monkeypatch.setattr(settings, "ABSENCES_BACKEND", "ledger")
+
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    yesterday = now.date() - timedelta(days=1)
+    shift = shifts_crud.create_shift(
+        db, new_shift_create(admin_user.id, now - timedelta(days=1))
+    )
+
+    week_ago = yesterday - timedelta(days=7)
+    db.exec(delete(DayOff))  # type: ignore
+    admin_user.created_at = datetime.combine(week_ago, time())
+    admin_user.updated_shifts_at = datetime.combine(week_ago, time())
+    db.add(admin_user)
+    app_config.absences_closed_from = app_config.absences_closed_until = None
+    db.add(app_config)
+    db.commit()
+
+    ledger.close_absences(db, start_date=yesterday)
+    assert ledger.get_closed_period(db) == (yesterday, yesterday)
+
+    # Days before the first closed day are still computed on demand
+    absences = crud.list_absences(db, week_ago, yesterday, admin_user.id)
+    assert sorted(
+        (absence.day, absence.absence_type)
+        for absence in absences
+        if absence.shift.id == shift.id
+    ) == [
+        (week_ago, AttendanceType.CLOCK_IN),
+        (week_ago, AttendanceType.CLOCK_OUT),
+        (yesterday, AttendanceType.CLOCK_IN),
+        (yesterday, AttendanceType.CLOCK_OUT),
+    ]
+
+    def shift_absences():
+        absences = crud.list_absences(db, yesterday, now.date(), admin_user.id)
+        return [
+            (absence.day, absence.absence_type, absence.minutes_late)
+            for absence in absences
+            if absence.shift.id == shift.id
+        ]
+
+    assert shift_absences() == [
+        (yesterday, AttendanceType.CLOCK_IN, None),
+        (yesterday, AttendanceType.CLOCK_OUT, None),
+    ]
+
+    attendance = crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+    crud.update_attendance(
+        db,
+        attendance,
+        AttendanceUpdate(
+            timestamp=datetime.combine(yesterday, shift.start_time), minutes_late=5
+        ),
+    )
+    assert shift_absences() == [
+        (yesterday, AttendanceType.CLOCK_OUT, None),
+        (yesterday, AttendanceType.CLOCK_IN, 5),
+    ]
+
+    # Like the other backends, the missed clock-ins and clock-outs come first by
+    # day, then the late ones, the last first, on closed and open days alike
+    other_attendance = crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+    crud.update_attendance(
+        db,
+        other_attendance,
+        AttendanceUpdate(
+            timestamp=datetime.combine(week_ago, shift.start_time), minutes_late=3
+        ),
+    )
+    expected = [
+        (week_ago, AttendanceType.CLOCK_OUT, None),
+        (yesterday, AttendanceType.CLOCK_OUT, None),
+        (yesterday, AttendanceType.CLOCK_IN, 5),
+        (week_ago, AttendanceType.CLOCK_IN, 3),
+    ]
+    for backend in ("python", "ledger"):
+        monkeypatch.setattr(settings, "ABSENCES_BACKEND", backend)
+        absences = crud.list_absences(db, week_ago, now.date(), admin_user.id)
+        assert [
+            (absence.day, absence.absence_type, absence.minutes_late)
+            for absence in absences
+            if absence.shift.id == shift.id
+        ] == expected
+    crud.delete_attendance(db, other_attendance)
+
+    crud.delete_attendance(db, attendance)
+    assert shift_absences() == [
+        (yesterday, AttendanceType.CLOCK_IN, None),
+        (yesterday, AttendanceType.CLOCK_OUT, None),
+    ]
+
+    # Only changing the shifts of the user refreshes their history
+    users_crud.update_user(db, admin_user, UserUpdate(name=admin_user.name))
+    assert shift_absences() == [
+        (yesterday, AttendanceType.CLOCK_IN, None),
+        (yesterday, AttendanceType.CLOCK_OUT, None),
+    ]
+
+    day_off = app_config_crud.create_day_off(
+        db, DayOffCreate(day=yesterday, description="Feriado")
+    )
+    assert shift_absences() == []
+
+    app_config_crud.delete_day_off(db, day_off)
+    assert len(shift_absences()) == 2
+
+    # The changed shifts are only expected from today on
+    shifts_crud.update_shift(db, shift, ShiftUpdate(end_time=time(23, 59)))
+    assert shift_absences() == []
+
+    # The other tests don't expect closed days
+    app_config.absences_closed_from = app_config.absences_closed_until = None
+    db.add(app_config)
+    db.commit()
+
+
+def test_absence_ledger_refreshes_wait_for_each_other(db: Session, admin_user: User):
+    assert admin_user.id is not None
+    user_id = admin_user.id
+    day = date(1991, 3, 4)
+
+    def sync_absences(user_id: int | None):
+        with Session(db.get_bind()) as session:
+            ledger.sync_absences(session, day, day, user_id)
+
+    with (
+        Session(db.get_bind()) as other_session,
+        ThreadPoolExecutor(max_workers=1) as executor,
+    ):
+        # A refresh of the user waits for a refresh of every user
+        ledger.lock_absences(other_session)
+        future = executor.submit(sync_absences, user_id)
+        with pytest.raises(TimeoutError):
+            future.result(timeout=0.5)
+        other_session.commit()
+        future.result(timeout=5)
+
+        # Refreshes of other users don't wait for a refresh of the user
+        ledger.lock_absences(other_session, user_id)
+        executor.submit(sync_absences, user_id + 1).result(timeout=5)
+        future = executor.submit(sync_absences, None)
+        with pytest.raises(TimeoutError):
+            future.result(timeout=0.5)
+        other_session.commit()
+        future.result(timeout=5)
+
+
+def test_export_attendances_to_csv(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    shift_create = new_shift_create(
+        admin_user.id, datetime.now(ZoneInfo(app_config.zone_info))
+    )
+    shift = shifts_crud.create_shift(db, shift_create)
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_OUT)
+
+    params = {"user_id": admin_user.id}
+    response = client.post(
+        "/records/attendances/csv", headers=admin_token_headers, params=params
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+
+    lines = list(csv.reader(io.StringIO(response.text)))
+    assert lines[0] == [
+        field.alias for field in AttendanceCsvLine.model_fields.values()
+    ]
+    assert len(lines) > 2
+    for line in lines[1:]:
+        assert line[0] == admin_user.name
+
+
+def test_import_attendances_from_csv(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    app_config: AppConfig,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    user_create = random_user_create()
+    user_create.shifts = []
+    user = users_crud.create_user(db, user_create)
+    assert user.id is not None
+
+    day = date(1991, 3, 4)
+    shift = shifts_crud.create_shift(
+        db,
+        ShiftCreate(
+            weekday=WeekdayEnum(day.weekday()),
+            start_time=time(8),
+            end_time=time(12),
+            user_id=user.id,
+        ),
+    )
+    late = app_config.minutes_late + 5
+    future = datetime.now(ZoneInfo(app_config.zone_info)) + timedelta(days=1)
+
+    def line(*values: object):
+        return [user.name, day.weekday(), "08:00:00", "12:00:00", *values]
+
+    rows = [
+        line(AttendanceType.CLOCK_IN, 7, f"{day} 08:07:00"),
+        line(AttendanceType.CLOCK_IN, "", f"{day} 08:{late:02}:00"),
+        [user.name, day.weekday(), "09:00:00", "12:00:00", 0, 0, f"{day} 09:00:00"],
+        line(5, 0, f"{day} 08:00:00"),
+        line(AttendanceType.CLOCK_OUT, 0, ""),
+        line(AttendanceType.CLOCK_OUT, 0, future.isoformat()),
+        line(AttendanceType.CLOCK_OUT, 0),
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(field.alias for field in AttendanceCsvLine.model_fields.values())
+    writer.writerows(rows)
+    files = {"file": ("attendances.csv", buffer.getvalue().encode(), "text/csv")}
+
+    try:
+        response = client.post(
+            "/records/attendances/import", files=files, headers=admin_token_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "imported": 2,
+            "rejected": 5,
+            "rejectedLines": [
+                {"line": 4, "error": "Turno não encontrado."},
+                {"line": 5, "error": "Valores inválidos: Tipo."},
+                {"line": 6, "error": "A data/hora da presença é obrigatória."},
+                {
+                    "line": 7,
+                    "error": "O horário do registro não pode estar no futuro.",
+                },
+                {"line": 8, "error": "A linha deve ter 7 colunas."},
+            ],
+        }
+
+        attendances = db.exec(
+            select(Attendance)
+            .where(Attendance.shift_id == shift.id)
+            .order_by(col(Attendance.timestamp))
+        ).all()
+        assert [
+            (attendance.timestamp, attendance.minutes_late)
+            for attendance in attendances
+        ] == [
+            (datetime.combine(day, time(8, 7)), 7),
+            (datetime.combine(day, time(8, late)), late),
+        ]
+        assert date(1991, 3, 1) in partitions.list_partitions(db)
+
+        # A file failing after its first chunks imports none of their lines
+        monkeypatch.setattr(settings, "CSV_CHUNK_SIZE", 1)
+
+        def failing_lines():
+            yield from buffer.getvalue().splitlines(keepends=True)[:2]
+            raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+        with pytest.raises(BadRequest):
+            imports.import_attendances(db, failing_lines())
+        db.rollback()
+        count = db.exec(
+            select(func.count())
+            .select_from(Attendance)
+            .where(Attendance.shift_id == shift.id)
+        )
+        assert count.one() == 2
+
+        files = {"file": ("attendances.csv", b"Nome,Tipo\n", "text/csv")}
+        response = client.post(
+            "/records/attendances/import", files=files, headers=admin_token_headers
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    finally:
+        # Also deletes the imported attendances and their absences in the ledger
+        db.exec(delete(User).where(col(User.id) == user.id))  # type: ignore
+        db.connection().exec_driver_sql("DROP TABLE IF EXISTS attendance_1991_03")
+        db.commit()
+
+
+def test_export_absences_to_csv(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+):
+    assert admin_user.id is not None
+
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    shifts_crud.create_shift(db, new_shift_create(admin_user.id, now))
+
+    db.exec(delete(DayOff))  # type: ignore
+    db.commit()
+
+    params = {"start_date": now.date().isoformat(), "end_date": now.date().isoformat()}
+
+    response = client.post("/records/absences/csv", params=params)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post(
+        "/records/absences/csv", headers=admin_token_headers, params=params
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    absences = client.get(
+        "/records/absences", headers=admin_token_headers, params=params
+    ).json()
+    lines = list(csv.reader(io.StringIO(response.text)))
+    assert lines[0] == [field.alias for field in AbsenceCsvLine.model_fields.values()]
+    assert len(lines) == len(absences) + 1
+    assert lines[1][:2] == [absences[0]["shift"]["user"]["name"], absences[0]["day"]]
+
+
+def test_get_attendances_query_count(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    users_shifts: list[Shift],
+):
+    for shift in users_shifts:
+        crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+
+    assert_constant_queries(client, "/records/attendances", admin_token_headers)
+
+
+def test_absences_cache(
+    client: TestClient,
+    db: Session,
+    admin_token_headers: dict[str, str],
+    admin_user: User,
+    app_config: AppConfig,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    assert admin_user.id is not None
+
+    now = datetime.now(ZoneInfo(app_config.zone_info))
+    shift = shifts_crud.create_shift(db, new_shift_create(admin_user.id, now))
+    params = {
+        "start_date": (now.date() - timedelta(days=7)).isoformat(),
+        "end_date": now.date().isoformat(),
+        "user_id": str(admin_user.id),
+    }
+
+    def get_absences():
+        hits, misses = absences_cache.stats.hits, absences_cache.stats.misses
+        response = client.get(
+            "/records/absences", headers=admin_token_headers, params=params
+        )
+        assert response.status_code == status.HTTP_200_OK
+        served = absences_cache.stats.hits - hits
+        assert served + absences_cache.stats.misses - misses == 1
+        return response.json(), bool(served)
+
+    # Results with more rows than the cache holds are not cached
+    monkeypatch.setattr(settings, "ABSENCES_CACHE_MAX_ROWS", 1)
+    absences, cached = get_absences()
+    assert not cached
+    assert len(absences) > 1
+    assert get_absences() == (absences, False)
+
+    monkeypatch.setattr(settings, "ABSENCES_CACHE_MAX_ROWS", len(absences))
+    assert get_absences() == (absences, False)
+    assert get_absences() == (absences, True)
+
+    # The export streams the absences instead of using the cache
+    hits, misses = absences_cache.stats.hits, absences_cache.stats.misses
+    response = client.post(
+        "/records/absences/csv", headers=admin_token_headers, params=params
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.text.splitlines()) == len(absences) + 1
+    assert absences_cache.stats.hits == hits
+    assert absences_cache.stats.misses == misses
+
+    # Writes to the tables of the absences invalidate the results
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_IN)
+    _, cached = get_absences()
+    assert not cached
+
+    # Clock-ins don't invalidate the results of earlier days
+    params["end_date"] = (now.date() - timedelta(days=2)).isoformat()
+    _, cached = get_absences()
+    assert not cached
+    crud.create_attendance(db, shift, AttendanceType.CLOCK_OUT)
+    _, cached = get_absences()
+    assert cached
+
+    # Attendances recorded for earlier days do
+    week_ago = now.date() - timedelta(days=7)
+    partitions.create_attendance_partitions(db, start=week_ago, months_ahead=0)
+    event = AttendanceEvent(
+        attendance_type=AttendanceType.CLOCK_IN,
+        timestamp=datetime.combine(week_ago, shift.start_time, now.tzinfo),
+        shift_id=shift.id,
+    )
+    crud.create_attendances(db, [event])
+    _, cached = get_absences()
+    assert not cached
+
+    monkeypatch.setattr(settings, "ABSENCES_CACHE_SIZE", 1)
+    evictions = absences_cache.stats.evictions
+    params["absence_type"] = str(AttendanceType.CLOCK_OUT.value)
+    _, cached = get_absences()
+    assert not cached
+    assert absences_cache.stats.evictions > evictions
+    assert absences_cache.stats.size == 1
+
+    metrics = client.get("/metrics", headers=admin_token_headers).text
+    assert f'cache_hits_total{{cache="absences"}} {absences_cache.stats.hits}' in (
+        metrics
+    )
@@ -0,0 +1,211 @@
+from collections.abc import Iterator
+from datetime import UTC, date, datetime, time, timedelta
+from typing import Any
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, col, create_engine, select, update
+
+from app.api.shifts import crud as shifts_crud
+from app.core import partitions
+from app.core.config import settings
+from app.core.crud import Explain, db_insert
+from app.core.metrics import PoolStats, instrumented_pool
+from app.core.models import (
+    Attendance,
+    AttendanceType,
+    DayOff,
+    Shift,
+    TableVersion,
+    User,
+    WeekdayEnum,
+)
+from app.core.table_versions import get_table_versions
+from app.tests.utils import new_shift_create
+
+
+@pytest.fixture
+def explain_db(db: Session, admin_user: User) -> Iterator[Session]:
+    """
+    Fills the attendance table with a year of attendances spread over a shift per
+    weekday, so the planner sees realistic statistics, and disables sequential
+    scans, since the other tables are tiny. Everything is rolled back after the
+    test.
+    """
+    shifts = [
+        Shift(
+            weekday=weekday,
+            start_time=time(8),
+            end_time=time(12),
+            user_id=admin_user.id,
+        )
+        for weekday in WeekdayEnum
+    ]
+    db.add_all(shifts)
+    db.flush()
+
+    connection = db.connection()
+    connection.exec_driver_sql(
+        "INSERT INTO attendance "
+        "(created_at, timestamp, minutes_late, attendance_type, shift_id) "
+        "SELECT now(), timestamp, 0, 'CLOCK_IN', "
+        "(%(shift_ids)s::int[])[1 + n %% 7] "
+        "FROM generate_series("
+        "now() - interval '365 days', now(), interval '10 minutes'"
+        ") WITH ORDINALITY AS t(timestamp, n)",
+        {"shift_ids": [shift.id for shift in shifts]},
+    )
+    connection.exec_driver_sql("ANALYZE attendance")
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+    yield db
+    db.rollback()
+
+
+def plan_indexes(session: Session, statement: Any) -> set[str]:
+    plan = session.connection().execute(Explain(statement)).scalar_one()
+
+    indexes = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        nodes.extend(node.get("Plans", []))
+
+    # Scans of partitions use the partition indexes, named after the partition
+    parents = session.connection().exec_driver_sql(
+        "SELECT parent.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE child.relname = ANY(%(names)s)",
+        {"names": list(indexes)},
+    )
+    return indexes | set(parents.scalars())
+
+
+def test_attendances_of_shift_use_index(explain_db: Session, admin_user: User):
+    shift = explain_db.exec(select(Shift).where(Shift.user_id == admin_user.id)).first()
+    assert shift
+
+    # The recorded attendances of a shift in a day, as checked for absences
+    start = datetime.combine(date.today(), time())
+    statement = select(Attendance).where(
+        Attendance.shift_id == shift.id,
+        Attendance.timestamp >= start,
+        Attendance.timestamp < start + timedelta(days=1),
+    )
+    assert "ix_attendance_shift_id_timestamp" in plan_indexes(explain_db, statement)
+
+
+def test_attendances_window_uses_brin_index(explain_db: Session):
+    # A window over the attendances of every shift
+    start = datetime.combine(date.today(), time())
+    statement = select(Attendance).where(
+        Attendance.timestamp >= start - timedelta(days=30),
+        Attendance.timestamp <= start,
+    )
+    assert "ix_attendance_timestamp_brin" in plan_indexes(explain_db, statement)
+
+
+def test_shifts_of_user_use_index(explain_db: Session, admin_user: User):
+    statement = select(Shift).where(Shift.user_id == admin_user.id)
+    assert "ix_shift_user_id_weekday" in plan_indexes(explain_db, statement)
+
+
+def test_days_off_window_uses_index(explain_db: Session):
+    statement = select(DayOff).where(
+        DayOff.day >= date.today() - timedelta(days=30), DayOff.day <= date.today()
+    )
+    assert "ix_dayoff_day" in plan_indexes(explain_db, statement)
+
+
+def attendance_partition(session: Session, attendance: Attendance) -> str:
+    return (
+        session.connection()
+        .exec_driver_sql(
+            "SELECT tableoid::regclass::text FROM attendance WHERE id = %(id)s",
+            {"id": attendance.id},
+        )
+        .scalar_one()
+    )
+
+
+def test_attendance_partitions(db: Session, admin_user: User):
+    assert admin_user.id is not None
+
+    month = date(1990, 1, 1)
+    shift = shifts_crud.create_shift(
+        db, new_shift_create(admin_user.id, datetime.combine(month, time(8)))
+    )
+    attendance = Attendance(
+        timestamp=datetime.combine(month, time(8)),
+        minutes_late=0,
+        attendance_type=AttendanceType.CLOCK_IN,
+        shift_id=shift.id,
+    )
+    db_insert(db, attendance)
+    attendance_id = attendance.id
+    assert attendance_partition(db, attendance) == partitions.DEFAULT_PARTITION
+
+    try:
+        created = partitions.create_attendance_partitions(db, month, months_ahead=0)
+        assert created == ["attendance_1990_01"]
+        assert attendance_partition(db, attendance) == "attendance_1990_01"
+        assert db.get(Attendance, attendance_id) is not None
+
+        versions = get_table_versions(db, [Attendance])
+        detached = partitions.detach_attendance_partitions(db, date(1990, 2, 1))
+        assert detached == ["attendance_1990_01"]
+        # Detaching changes the version of the attendances, like a delete
+        assert get_table_versions(db, [Attendance]).etag != versions.etag
+        db.expunge(attendance)
+        assert db.get(Attendance, attendance_id) is None
+    finally:
+        db.connection().exec_driver_sql("DROP TABLE IF EXISTS attendance_1990_01")
+        db.commit()
+
+
+def test_pool_stats():
+    stats = PoolStats()
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=instrumented_pool(QueuePool, stats),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    try:
+        with engine.connect():
+            assert stats.checkouts == 1
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        assert stats.timeouts == 1
+
+        # The stats are kept when the pool is recreated
+        engine.dispose()
+        with engine.connect():
+            assert stats.checkouts == 2
+        assert sum(stats.wait_buckets) == 2
+    finally:
+        engine.dispose()
+
+
+def test_table_version_updated_at_never_decreases(db: Session):
+    # As set by a transaction that started later but committed first
+    future = datetime.now(UTC) + timedelta(hours=1)
+    db.exec(
+        update(TableVersion)  # type: ignore[call-overload]
+        .where(col(TableVersion.table_name) == "dayoff")
+        .values(updated_at=future)
+    )
+    try:
+        db.add(DayOff(day=date(1990, 1, 1), description="Feriado"))
+        db.flush()
+        updated_at = db.exec(
+            select(TableVersion.updated_at).where(TableVersion.table_name == "dayoff")
+        ).one()
+        assert updated_at == future
+    finally:
+        db.rollback()
@@ -10,3 +10,50 @@ def test_health_check(client: TestClient):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json()
+
+
+def metric_value(metrics: str, sample: str) -> float:
+    for line in metrics.splitlines():
+        if line.startswith(f"{sample} "):
+            return float(line.split()[-1])
+    raise KeyError(sample)
+
+
+def test_metrics(client: TestClient, admin_token_headers: dict[str, str]):
+    response = client.get("/users/me", headers=admin_token_headers)
+    assert response.status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 401
+
+    response = client.get("/metrics", headers=admin_token_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    metrics = response.text
+    for pool in ("sync", "async"):
+        count = metric_value(
+            metrics, f'db_pool_checkout_wait_seconds_count{{pool="{pool}"}}'
+        )
+        inf_bucket = metric_value(
+            metrics,
+            f'db_pool_checkout_wait_seconds_bucket{{pool="{pool}",le="+Inf"}}',
+        )
+        assert count == inf_bucket
+        assert metric_value(metrics, f'db_pool_checked_out{{pool="{pool}"}}') >= 0
+    assert metric_value(metrics, 'db_pool_checkout_wait_seconds_count{pool="async"}')
+
+
+def test_error_responses(client: TestClient, admin_token_headers: dict[str, str]):
+    response = client.get("/users/0", headers=admin_token_headers)
+    assert response.status_code == 404
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {
+        "detail": {"message": "Usuário não encontrado.", "metadata": None}
+    }
+
+    response = client.get("/users/abc", headers=admin_token_headers)
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail["message"] == "Os dados enviados são inválidos"
+    assert detail["metadata"][0]["loc"] == ["path", "user_id"]
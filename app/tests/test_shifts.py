@@ -1,7 +1,8 @@
 import random
-from datetime import datetime, time, timedelta
+from datetime import datetime
 from zoneinfo import ZoneInfo
 
+import pytest
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
@@ -9,8 +10,14 @@ from sqlmodel import Session, select
 
 from app.api.shifts import crud
 from app.api.shifts.schemas import ShiftCreate
+from app.api.users import crud as users_crud
 from app.core.models import AppConfig, Shift, User, WeekdayEnum
-from app.tests.utils import random_time
+from app.tests.utils import (
+    assert_constant_queries,
+    new_shift_create,
+    random_time,
+    random_user_create,
+)
 
 
 def random_shift_create(user_id: int):
@@ -23,24 +30,6 @@ def random_shift_create(user_id: int):
     return shift_create
 
 
-def new_shift_create(user_id: int, start_datetime: datetime):
-    end_datetime = start_datetime + timedelta(hours=1)
-
-    start_time = start_datetime.time().replace(microsecond=0)
-    end_time = end_datetime.time().replace(microsecond=0)
-
-    if end_datetime.date() > start_datetime.date():
-        end_time = time(23, 59, 59)
-
-    shift_create = ShiftCreate(
-        weekday=WeekdayEnum(start_datetime.weekday()),
-        start_time=start_time,
-        end_time=end_time,
-        user_id=user_id,
-    )
-    return shift_create
-
-
 def test_create_new_shift(
     client: TestClient,
     db: Session,
@@ -195,3 +184,44 @@ def test_get_current_shift(
     assert shift_result["weekday"] == shift["weekday"]
     assert shift_result["startTime"] == shift["start_time"]
     assert shift_result["endTime"] == shift["end_time"]
+
+
+@pytest.mark.usefixtures("users_shifts")
+def test_get_shifts_query_count(
+    client: TestClient, admin_token_headers: dict[str, str]
+):
+    assert_constant_queries(client, "/shifts", admin_token_headers)
+
+
+def test_get_shifts_fields(
+    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+):
+    user = users_crud.create_user(db, random_user_create())
+    assert user.id is not None
+    crud.create_shift(db, random_shift_create(user.id))
+    shifts = crud.list_shifts(db, user.id)
+
+    params = {"fields": "id,startTime", "user_id": user.id}
+    response = client.get("/shifts", headers=admin_token_headers, params=params)
+    assert response.status_code == status.HTTP_200_OK
+    expected = [
+        {
+            "id": shift.id,
+            "startTime": shift.start_time.replace(microsecond=0).isoformat(),
+        }
+        for shift in shifts
+    ]
+    assert sorted(response.json()["items"], key=lambda item: item["id"]) == sorted(
+        expected, key=lambda item: item["id"]
+    )
+
+    response = client.get(
+        f"/users/{user.id}/shifts",
+        headers=admin_token_headers,
+        params={"fields": "weekday"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(item["weekday"] for item in response.json()) == sorted(
+        shift.weekday for shift in shifts
+    )
+    assert all(set(item) == {"weekday"} for item in response.json())
@@ -1,42 +1,26 @@
-import random
-
+import pytest
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
+from app.api.shifts import crud as shifts_crud
+from app.api.shifts.schemas import ShiftCreate
 from app.api.users import crud
-from app.api.users.schemas import UserCreate, UserShiftCreate
 from app.core.config import settings
 from app.core.deps import get_current_user
 from app.core.models import User, WeekdayEnum
-from app.core.security import verify_password
+from app.core.security import password_needs_rehash, verify_password
 from app.tests.utils import (
     CORRECT_LOGIN_DATA,
     INCORRECT_LOGIN_DATA,
-    random_email,
-    random_lower_string,
+    assert_constant_queries,
+    count_queries,
     random_time,
+    random_user_create,
 )
 
 
-def random_user_create(role_id: int | None = None):
-    email = random_email()
-    password = random_lower_string()
-    name = random_lower_string()
-    shifts = [
-        UserShiftCreate(
-            weekday=WeekdayEnum(random.randint(0, 6)),
-            start_time=random_time(),
-            end_time=random_time(),
-        )
-    ]
-    user = UserCreate(
-        email=email, name=name, password=password, shifts=shifts, role_id=role_id
-    )
-    return user
-
-
 def assert_all_user_fields(
     user,
     id: int | None = None,
@@ -196,6 +180,17 @@ def test_update_user(
     assert user_db.name == data["name"]
     assert verify_password(data["password"], user_db.password)
 
+    # The response has the new shifts, not the deleted ones
+    shift = {"weekday": WeekdayEnum.FRIDAY, "startTime": "08:00", "endTime": "12:00"}
+    response = client.patch(
+        f"/users/{user.id}", headers=admin_token_headers, json={"shifts": [shift]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    shifts = response.json()["shifts"]
+    assert len(shifts) == 1
+    assert shifts[0]["weekday"] == WeekdayEnum.FRIDAY
+    assert shifts[0]["startTime"] == "08:00:00"
+
 
 def test_delete_user(
     client: TestClient,
@@ -218,3 +213,153 @@ def test_delete_user(
 
     user_db = db.exec(select(User).where(User.id == user.id)).first()
     assert user_db is None
+
+
+def test_token_revoked_on_update(
+    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+):
+    user_create = random_user_create()
+    user = crud.create_user(db, user_create)
+    login_data = {"username": user_create.email, "password": user_create.password}
+
+    response = client.post("/users/login", data=login_data)
+    headers = {"Authorization": f"Bearer {response.json()['accessToken']}"}
+    response = client.get(
+        f"/shifts/current?user_id={user.id}&attendance_type=0", headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    # Updates that keep the claims keep the token
+    response = client.patch(
+        f"/users/{user.id}", headers=admin_token_headers, json={"name": "renamed"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.patch(
+        f"/users/{user.id}", headers=admin_token_headers, json={"active": False}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get(
+        f"/shifts/current?user_id={user.id}&attendance_type=0", headers=headers
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # Inactive users can't log in again
+    response = client.post("/users/login", data=login_data)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = client.patch(
+        f"/users/{user.id}", headers=admin_token_headers, json={"active": True}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = client.post("/users/login", data=login_data)
+    headers = {"Authorization": f"Bearer {response.json()['accessToken']}"}
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_create_users(
+    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+):
+    user_creates = [random_user_create() for _ in range(3)]
+    data = jsonable_encoder(user_creates, exclude_unset=True)
+
+    response = client.post("/users/batch", json=data)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post("/users/batch", headers=admin_token_headers, json=data)
+    result = response.json()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(result) == len(user_creates)
+    for user, user_create in zip(result, user_creates, strict=True):
+        assert_all_user_fields(user, email=user_create.email, name=user_create.name)
+        user_db = db.get(User, user["id"])
+        assert user_db
+        assert verify_password(user_create.password, user_db.password)
+
+    # The emails are already used
+    response = client.post("/users/batch", headers=admin_token_headers, json=data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    user_create = random_user_create()
+    data = jsonable_encoder([user_create, user_create], exclude_unset=True)
+    response = client.post("/users/batch", headers=admin_token_headers, json=data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_login_rehashes_password(
+    client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch
+):
+    user_create = random_user_create()
+    user = crud.create_user(db, user_create)
+    assert not password_needs_rehash(user.password)
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    assert password_needs_rehash(user.password)
+
+    login_data = {"username": user_create.email, "password": user_create.password}
+    response = client.post("/users/login", data=login_data)
+    assert response.status_code == status.HTTP_200_OK
+
+    db.refresh(user)
+    assert not password_needs_rehash(user.password)
+    assert verify_password(user_create.password, user.password)
+
+
+@pytest.mark.usefixtures("users_shifts")
+def test_get_users_query_count(client: TestClient, admin_token_headers: dict[str, str]):
+    assert_constant_queries(client, "/users", admin_token_headers)
+
+
+def test_get_users_fields(
+    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+):
+    crud.create_user(db, random_user_create())
+
+    params = {"fields": "id,name", "pageSize": "5"}
+    client.get("/users", headers=admin_token_headers, params=params)
+    with count_queries() as statements:
+        response = client.get("/users", headers=admin_token_headers, params=params)
+
+    assert response.status_code == status.HTTP_200_OK
+    items = response.json()["items"]
+    assert len(items) > 0
+    for item in items:
+        assert set(item) == {"id", "name"}
+    # Only the selected columns are loaded, without the roles and shifts
+    page_statement = next(s for s in statements if "LIMIT" in s)
+    assert "email" not in page_statement
+    assert "role" not in page_statement
+    assert not [s for s in statements if "FROM shift" in s]
+
+
+def test_get_user_not_modified(
+    client: TestClient, db: Session, admin_token_headers: dict[str, str]
+):
+    user = crud.create_user(db, random_user_create())
+    assert user.id is not None
+
+    response = client.get(f"/users/{user.id}", headers=admin_token_headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+
+    headers = {**admin_token_headers, "If-None-Match": etag}
+    response = client.get(f"/users/{user.id}", headers=headers)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # The response includes the user's shifts
+    shift_create = ShiftCreate(
+        user_id=user.id,
+        weekday=WeekdayEnum.MONDAY,
+        start_time=random_time(),
+        end_time=random_time(),
+    )
+    shifts_crud.create_shift(db, shift_create)
+    response = client.get(f"/users/{user.id}", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["shifts"]) == 2
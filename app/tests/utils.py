@@ -1,8 +1,19 @@
 import random
 import string
-from datetime import date, time, timedelta
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from typing import Any
 
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api.shifts.schemas import ShiftCreate
+from app.api.users.schemas import UserCreate, UserShiftCreate
 from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.models import WeekdayEnum
 
 CORRECT_LOGIN_DATA = {
     "username": settings.FIRST_ADMIN_EMAIL,
@@ -34,3 +45,83 @@ def random_time():
     minute = random.randint(0, 59)
     second = random.randint(0, 59)
     return time(hour=hour, minute=minute, second=second)
+
+
+def random_user_create(role_id: int | None = None):
+    email = random_email()
+    password = random_lower_string()
+    name = random_lower_string()
+    shifts = [
+        UserShiftCreate(
+            weekday=WeekdayEnum(random.randint(0, 6)),
+            start_time=random_time(),
+            end_time=random_time(),
+        )
+    ]
+    user = UserCreate(
+        email=email, name=name, password=password, shifts=shifts, role_id=role_id
+    )
+    return user
+
+
+def new_shift_create(user_id: int, start_datetime: datetime):
+    end_datetime = start_datetime + timedelta(hours=1)
+
+    start_time = start_datetime.time().replace(microsecond=0)
+    end_time = end_datetime.time().replace(microsecond=0)
+
+    if end_datetime.date() > start_datetime.date():
+        end_time = time(23, 59, 59)
+
+    shift_create = ShiftCreate(
+        weekday=WeekdayEnum(start_datetime.weekday()),
+        start_time=start_time,
+        end_time=end_time,
+        user_id=user_id,
+    )
+    return shift_create
+
+
+@contextmanager
+def count_queries() -> Iterator[list[str]]:
+    """
+    Records the statements run by both engines inside the block.
+    """
+    statements: list[str] = []
+
+    def before_cursor_execute(_conn, _cursor, statement: str, *_: Any):
+        statements.append(statement)
+
+    engines = [engine, async_engine.sync_engine]
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+def assert_constant_queries(
+    client: TestClient,
+    url: str,
+    headers: dict[str, str],
+    page_sizes: tuple[int, ...] = (1, 5),
+):
+    """
+    Asserts that a paginated endpoint runs the same number of queries for every
+    page size, so the relationships of its items are not lazy loaded one by one.
+    The pages must be full, ideally with items of different users.
+    """
+    # Fills the caches of the app config and token versions
+    client.get(url, headers=headers, params={"pageSize": page_sizes[0]})
+
+    query_counts = []
+    for page_size in page_sizes:
+        with count_queries() as statements:
+            response = client.get(url, headers=headers, params={"pageSize": page_size})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()["items"]) == page_size
+        query_counts.append(len(statements))
+
+    assert len(set(query_counts)) == 1, query_counts